@@ -0,0 +1,387 @@
+"""Benchmarks do pipeline de OCR (não executa o modelo PaddleOCR)"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import shutil
+import string
+import sys
+import tempfile
+import time
+
+from teste_ocr import (
+    COLUMNAR_FILENAME, PDF_REPORT_CHUNK_EDITAIS, ColumnarStore, ColumnarWriter, StubEngine, build_edital_summary, calculate_edital_stats, discover_documents, find_matches_in_text,
+    generate_pdf_report, group_results_by_edital, iter_documents, normalize_text, pdf_available, similarity,
+    write_document_jsons, write_txt_report
+)
+
+# Tamanhos (documentos no corpus) medidos por padrão na suíte
+SUITE_SIZES = (10, 100, 1000)
+# Editais do relatório PDF medido à parte na suíte: acima de
+# PDF_REPORT_CHUNK_EDITAIS, o relatório vai pelo caminho paralelo
+SUITE_REPORT_EDITAIS = 3 * PDF_REPORT_CHUNK_EDITAIS
+
+# Piora relativa tolerada em relação à baseline antes de acusar regressão
+REGRESSION_TOLERANCE = 0.2
+# Etapas mais rápidas que isso (segundos) ficam fora da comparação: o ruído domina
+REGRESSION_MIN_SECONDS = 0.05
+
+# Subcomandos (sem subcomando, assume matcher)
+COMMANDS = ('matcher', 'suite', 'corpus')
+
+def find_matches_in_text_reference(extracted_texts, search_values, threshold=0.7):
+    """Implementação original (força bruta) usada como referência de resultado e de tempo"""
+    matches = {}
+
+    for field, search_value in search_values.items():
+        if search_value is None or search_value == "" or search_value == "null":
+            continue
+
+        best_match = None
+        best_similarity = 0
+        best_confidence = 0
+
+        search_value_normalized = normalize_text(str(search_value))
+
+        if not search_value_normalized.strip():
+            continue
+
+        for text_info in extracted_texts:
+            text = text_info['text']
+            confidence = text_info['confidence']
+            text_normalized = normalize_text(text)
+
+            sim_score = similarity(text_normalized, search_value_normalized)
+
+            contains_score = 0
+            if search_value_normalized in text_normalized:
+                contains_score = 0.9
+
+            final_score = max(sim_score, contains_score)
+
+            if final_score > threshold and final_score > best_similarity:
+                best_similarity = final_score
+                best_match = text
+                best_confidence = confidence
+
+        if best_match:
+            matches[field] = {
+                'found': True,
+                'expected': search_value,
+                'extracted': best_match,
+                'similarity': best_similarity,
+                'ocr_confidence': best_confidence
+            }
+        else:
+            matches[field] = {
+                'found': False,
+                'expected': search_value,
+                'extracted': None,
+                'similarity': 0,
+                'ocr_confidence': 0
+            }
+
+    return matches
+
+def random_words(rng, count):
+    """Gera palavras aleatórias com cara de texto de edital"""
+    alphabet = string.ascii_letters + string.digits + 'áéíóúçãõ'
+    return ' '.join(''.join(rng.choice(alphabet) for _ in range(rng.randint(2, 10))) for _ in range(count))
+
+def synthetic_document(rng, num_lines, num_fields):
+    """Gera linhas de OCR e valores esperados; parte dos campos aparece (com ruído) no texto"""
+    extracted_texts = [
+        {'text': random_words(rng, rng.randint(1, 8)), 'confidence': round(rng.uniform(0.5, 1.0), 4)}
+        for _ in range(num_lines)
+    ]
+
+    search_values = {}
+    for i in range(num_fields):
+        value = random_words(rng, rng.randint(1, 4))
+        search_values[f"campo_{i:02d}"] = value
+        if rng.random() < 0.7:
+            # Insere o valor em uma linha, às vezes com um caractere trocado pelo "OCR"
+            noisy = list(value)
+            if rng.random() < 0.5:
+                noisy[rng.randrange(len(noisy))] = rng.choice(string.ascii_letters)
+            line = rng.randrange(num_lines)
+            extracted_texts[line]['text'] = f"{random_words(rng, 1)} {''.join(noisy)}"
+
+    return extracted_texts, search_values
+
+def bench(function, *args, repeat=3):
+    """Retorna o melhor tempo (segundos) entre `repeat` execuções e o último resultado"""
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def bench_matcher(num_lines=400, num_fields=20, num_documents=5, repeat=3, seed=42):
+    """Compara find_matches_in_text com a implementação de referência"""
+    rng = random.Random(seed)
+    documents = [synthetic_document(rng, num_lines, num_fields) for _ in range(num_documents)]
+
+    def run(function):
+        return [function(extracted_texts, search_values) for extracted_texts, search_values in documents]
+
+    reference_time, reference_result = bench(run, find_matches_in_text_reference, repeat=repeat)
+    matcher_time, matcher_result = bench(run, find_matches_in_text, repeat=repeat)
+
+    # O matcher pode encontrar mais (valores quebrados entre linhas), nunca menos
+    identical = 0
+    total = 0
+    for reference_matches, matcher_matches in zip(reference_result, matcher_result):
+        for field, reference_match in reference_matches.items():
+            total += 1
+            matcher_match = matcher_matches[field]
+            if reference_match['found'] and matcher_match['similarity'] < reference_match['similarity']:
+                raise AssertionError(f"find_matches_in_text perdeu o campo {field} em relação à referência")
+            # A chave 'matcher' (método que encontrou o campo) não existe na referência
+            identical += {key: value for key, value in matcher_match.items() if key != 'matcher'} == reference_match
+
+    print(f"=== find_matches_in_text: {num_documents} docs x {num_lines} linhas x {num_fields} campos ===")
+    print(f"  Referência: {reference_time * 1000:.1f} ms")
+    print(f"  Matcher:    {matcher_time * 1000:.1f} ms")
+    print(f"  Speedup:    {reference_time / matcher_time:.1f}x ({identical}/{total} matches idênticos, nenhum perdido)")
+
+def render_text_image(lines, path):
+    """Desenha as linhas em uma imagem PNG (requer Pillow)"""
+    from PIL import Image, ImageDraw
+    
+    image = Image.new('RGB', (1240, 40 + 28 * len(lines)), 'white')
+    draw = ImageDraw.Draw(image)
+    for i, line in enumerate(lines):
+        draw.text((40, 20 + 28 * i), line, fill='black')
+    image.save(path)
+
+def generate_corpus(root, num_editais=2, num_documents=10, num_lines=40, num_fields=8, render=False, seed=42):
+    """Gera uma árvore input_docs sintética: root/edital_NNN/doc_NNNNN.png + JSON esperado.
+
+    Os documentos são distribuídos entre os editais. Com `render`, cada PNG
+    contém as linhas desenhadas (para medir o PaddleOCR de verdade); sem ele,
+    o arquivo só carrega o texto e serve para o motor stub, que gera as
+    linhas de OCR a partir do hash do arquivo e do JSON esperado.
+    """
+    rng = random.Random(seed)
+    os.makedirs(root, exist_ok=True)
+    
+    for doc_index in range(num_documents):
+        edital_dir = os.path.join(root, f"edital_{doc_index % num_editais:03d}")
+        os.makedirs(edital_dir, exist_ok=True)
+        
+        json_data = {f"campo_{i:02d}": random_words(rng, rng.randint(1, 4)) for i in range(num_fields)}
+        lines = [random_words(rng, rng.randint(1, 8)) for _ in range(num_lines)]
+        for value in json_data.values():
+            lines[rng.randrange(num_lines)] = value
+        
+        base_path = os.path.join(edital_dir, f"doc_{doc_index:05d}")
+        with open(f"{base_path}.json", 'w', encoding='utf-8') as f:
+            json.dump(json_data, f, ensure_ascii=False, indent=2)
+        if render:
+            render_text_image(lines, f"{base_path}.png")
+        else:
+            with open(f"{base_path}.png", 'w', encoding='utf-8') as f:
+                f.write('\n'.join(lines))
+    
+    return root
+
+def timed_call(function, *args):
+    """Executa a função com a saída do console suprimida; retorna (segundos, resultado)"""
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = function(*args)
+    return time.perf_counter() - start, result
+
+def write_columnar(results, path):
+    """Grava os resultados no formato colunar e retorna o caminho"""
+    writer = ColumnarWriter(path)
+    for result in results:
+        writer.add(result)
+    return writer.close()
+
+def read_columnar(path):
+    """Reconstrói todos os resultados do arquivo colunar"""
+    with ColumnarStore(path) as store:
+        return sum(1 for _ in store)
+
+def bench_size(work_dir, num_documents, num_editais, num_lines, num_fields, engine_options, seed):
+    """Mede cada etapa do pipeline para um corpus de `num_documents` documentos"""
+    input_dir = generate_corpus(os.path.join(work_dir, 'input_docs'), num_editais, num_documents,
+                                num_lines, num_fields, seed=seed)
+    output_dir = os.path.join(work_dir, 'resultados_json')
+    os.makedirs(output_dir, exist_ok=True)
+    
+    seconds = {}
+    seconds['descoberta'], (edital_names, tasks) = timed_call(discover_documents, input_dir)
+    seconds['pipeline_ocr_stub'], results = timed_call(
+        lambda: list(iter_documents(tasks, engine_options=engine_options))
+    )
+    seconds['find_matches_in_text'], _ = timed_call(
+        lambda: [find_matches_in_text(result['extracted_texts'], result['json_data']) for result in results]
+    )
+    seconds['calculate_edital_stats'], edital_stats = timed_call(
+        calculate_edital_stats, group_results_by_edital(edital_names, results)
+    )
+    seconds['escrita_txt'], _ = timed_call(
+        write_txt_report, edital_stats, results, os.path.join(work_dir, 'resultado_ocr_completo.txt')
+    )
+    seconds['escrita_json'], _ = timed_call(write_document_jsons, results, output_dir)
+    seconds['escrita_colunar'], columnar_path = timed_call(
+        write_columnar, results, os.path.join(output_dir, COLUMNAR_FILENAME)
+    )
+    seconds['leitura_colunar'], _ = timed_call(read_columnar, columnar_path)
+    if pdf_available():
+        summary = build_edital_summary(edital_stats, len(results))
+        seconds['generate_pdf_report'], _ = timed_call(
+            generate_pdf_report, summary, os.path.join(output_dir, 'resumo_por_edital_relatorio.pdf')
+        )
+    
+    shutil.rmtree(input_dir)
+    shutil.rmtree(output_dir)
+    return {stage: round(value, 6) for stage, value in seconds.items()}
+
+def bench_pdf_report(work_dir, num_editais, seed):
+    """Mede generate_pdf_report num resumo com `num_editais` editais, no caminho paralelo e no serial"""
+    rng = random.Random(seed)
+    edital_stats = {}
+    for i in range(num_editais):
+        total_fields = rng.randint(10, 200)
+        fields_found = rng.randint(0, total_fields)
+        edital_stats[f"edital_{i:05d}"] = {
+            'total_documents': rng.randint(1, 50), 'total_fields': total_fields,
+            'fields_found': fields_found, 'success_rate': fields_found / total_fields * 100
+        }
+    summary = build_edital_summary(edital_stats, sum(stats['total_documents'] for stats in edital_stats.values()))
+    output_path = os.path.join(work_dir, 'resumo_por_edital_relatorio.pdf')
+    
+    seconds = {}
+    seconds['generate_pdf_report'], _ = timed_call(generate_pdf_report, summary, output_path)
+    seconds['generate_pdf_report_serial'], _ = timed_call(generate_pdf_report, summary, output_path, 1)
+    os.remove(output_path)
+    return {stage: round(value, 6) for stage, value in seconds.items()}
+
+def bench_suite(sizes=SUITE_SIZES, num_editais=4, num_lines=40, num_fields=8, stub_latency=0.0, seed=42, repeat=3,
+                report_editais=SUITE_REPORT_EDITAIS):
+    """Mede o pipeline (motor stub) em cada tamanho de corpus; retorna {documentos: {etapa: segundos}}.
+
+    Cada tamanho é medido `repeat` vezes e fica o melhor tempo de cada etapa.
+    O relatório PDF de um resumo com `report_editais` editais (caminho
+    paralelo e serial) é medido à parte, na chave 'relatorio_<N>_editais'.
+    """
+    engine_options = {'engine': StubEngine.name, 'latency': stub_latency, 'num_lines': num_lines}
+    numbers = {}
+    
+    with tempfile.TemporaryDirectory(prefix='bench_ocr_') as work_dir:
+        for num_documents in sizes:
+            runs = [bench_size(work_dir, num_documents, num_editais, num_lines, num_fields, engine_options, seed)
+                    for _ in range(repeat)]
+            stages = numbers[str(num_documents)] = {stage: min(run[stage] for run in runs) for stage in runs[0]}
+            print(f"=== {num_documents} documentos ({num_editais} editais, {num_lines} linhas, {num_fields} campos) ===")
+            for stage, value in stages.items():
+                print(f"  {stage:<24} {value * 1000:10.1f} ms  ({num_documents / value if value else 0:,.0f} docs/s)")
+            if not pdf_available():
+                print("  generate_pdf_report      ignorado (reportlab não instalado)")
+        
+        if report_editais and pdf_available():
+            runs = [bench_pdf_report(work_dir, report_editais, seed) for _ in range(repeat)]
+            stages = numbers[f"relatorio_{report_editais}_editais"] = {
+                stage: min(run[stage] for run in runs) for stage in runs[0]
+            }
+            print(f"=== Relatório PDF com {report_editais} editais (blocos de {PDF_REPORT_CHUNK_EDITAIS}) ===")
+            for stage, value in stages.items():
+                print(f"  {stage:<28} {value * 1000:10.1f} ms  ({report_editais / value if value else 0:,.0f} editais/s)")
+    
+    return numbers
+
+def compare_with_baseline(numbers, baseline, tolerance=REGRESSION_TOLERANCE):
+    """Lista as etapas que ficaram mais lentas que a baseline além da tolerância"""
+    regressions = []
+    for size, stages in numbers.items():
+        for stage, value in stages.items():
+            reference = baseline.get(size, {}).get(stage)
+            if reference is None or max(reference, value) < REGRESSION_MIN_SECONDS:
+                continue
+            if value > reference * (1 + tolerance):
+                regressions.append((size, stage, reference, value))
+    return regressions
+
+def parse_args(argv=None):
+    """Lê os argumentos de linha de comando (sem subcomando, assume matcher)"""
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if not argv or argv[0] not in COMMANDS + ('-h', '--help'):
+        argv = ['matcher'] + argv
+    
+    parser = argparse.ArgumentParser(description="Benchmarks do pipeline de OCR")
+    subparsers = parser.add_subparsers(dest='command')
+    
+    matcher_parser = subparsers.add_parser('matcher', help="Compara find_matches_in_text com a referência (padrão)")
+    matcher_parser.add_argument('--lines', type=int, default=400, help="Linhas de OCR por documento")
+    matcher_parser.add_argument('--fields', type=int, default=20, help="Campos por JSON")
+    matcher_parser.add_argument('--documents', type=int, default=5, help="Documentos por medição")
+    matcher_parser.add_argument('--repeat', type=int, default=3, help="Repetições (usa o melhor tempo)")
+    matcher_parser.add_argument('--seed', type=int, default=42, help="Semente do gerador sintético")
+    
+    suite_parser = subparsers.add_parser('suite', help="Mede as etapas do pipeline em corpora sintéticos de vários tamanhos")
+    suite_parser.add_argument('--sizes', default=','.join(str(size) for size in SUITE_SIZES),
+                              help="Quantidades de documentos, separadas por vírgula (padrão: %(default)s)")
+    suite_parser.add_argument('--editais', type=int, default=4, help="Editais no corpus")
+    suite_parser.add_argument('--lines', type=int, default=40, help="Linhas de OCR por documento")
+    suite_parser.add_argument('--fields', type=int, default=8, help="Campos por JSON")
+    suite_parser.add_argument('--stub-latency', type=float, default=0.0, help="Latência simulada do OCR (s)")
+    suite_parser.add_argument('--seed', type=int, default=42, help="Semente do gerador sintético")
+    suite_parser.add_argument('--repeat', type=int, default=3, help="Repetições por tamanho (usa o melhor tempo)")
+    suite_parser.add_argument('--report-editais', type=int, default=SUITE_REPORT_EDITAIS,
+                              help="Editais do relatório PDF medido à parte, no caminho paralelo e no serial; "
+                                   "0 desativa (padrão: %(default)s)")
+    suite_parser.add_argument('--save-baseline', metavar='ARQUIVO', help="Grava os números medidos como baseline")
+    suite_parser.add_argument('--baseline', metavar='ARQUIVO',
+                              help="Compara com uma baseline gravada e sai com erro se houver regressão")
+    suite_parser.add_argument('--tolerance', type=float, default=REGRESSION_TOLERANCE,
+                              help="Piora relativa tolerada (padrão: %(default)s)")
+    
+    corpus_parser = subparsers.add_parser('corpus', help="Só gera um corpus sintético em disco")
+    corpus_parser.add_argument('--output-dir', default='input_docs_sintetico', help="Destino (padrão: %(default)s)")
+    corpus_parser.add_argument('--editais', type=int, default=4, help="Editais no corpus")
+    corpus_parser.add_argument('--documents', type=int, default=100, help="Documentos no corpus")
+    corpus_parser.add_argument('--lines', type=int, default=40, help="Linhas por documento")
+    corpus_parser.add_argument('--fields', type=int, default=8, help="Campos por JSON")
+    corpus_parser.add_argument('--render', action='store_true', help="Desenha o texto em PNGs reais (requer Pillow)")
+    corpus_parser.add_argument('--seed', type=int, default=42, help="Semente do gerador sintético")
+    
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    
+    if args.command == 'matcher':
+        bench_matcher(args.lines, args.fields, args.documents, args.repeat, args.seed)
+    elif args.command == 'corpus':
+        generate_corpus(args.output_dir, args.editais, args.documents, args.lines, args.fields, args.render, args.seed)
+        print(f"📁 Corpus sintético gerado em: {args.output_dir}")
+    else:
+        sizes = [int(size) for size in args.sizes.split(',')]
+        numbers = bench_suite(sizes, args.editais, args.lines, args.fields, args.stub_latency, args.seed, args.repeat,
+                              args.report_editais)
+        
+        if args.save_baseline:
+            with open(args.save_baseline, 'w', encoding='utf-8') as f:
+                json.dump(numbers, f, indent=2)
+            print(f"💾 Baseline salva em: {args.save_baseline}")
+        
+        if args.baseline:
+            with open(args.baseline, 'r', encoding='utf-8') as f:
+                baseline = json.load(f)
+            regressions = compare_with_baseline(numbers, baseline, args.tolerance)
+            for size, stage, reference, value in regressions:
+                print(f"❌ Regressão em {stage} ({size} docs): {reference * 1000:.1f} ms -> {value * 1000:.1f} ms")
+            if regressions:
+                sys.exit(1)
+            print(f"✅ Sem regressões acima de {args.tolerance:.0%} em relação a {args.baseline}")
+
+if __name__ == '__main__':
+    main()
@@ -1,23 +1,174 @@
-from paddleocr import PaddleOCR
 import pprint
+import base64
 import os
+import random
+import string
 import json
+import copy
 import re
+import math
+import sys
+import argparse
+import hashlib
+import heapq
+import array
+import mmap
+import shutil
+import time
+import cProfile
+import pstats
+import importlib.metadata
+import importlib.util
+import multiprocessing
+import multiprocessing.connection
+import queue
+import tempfile
+import threading
+import traceback
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from difflib import SequenceMatcher
-from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from socketserver import ThreadingUnixStreamServer
+from collections import Counter, defaultdict, deque
+from contextlib import contextmanager
+from datetime import datetime, date
+from decimal import Decimal, InvalidOperation
+from types import SimpleNamespace
 
-# Importações para geração de PDF
-try:
-    from reportlab.lib.pagesizes import A4
-    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak
-    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-    from reportlab.lib.units import inch
-    from reportlab.lib import colors
-    from reportlab.lib.enums import TA_CENTER, TA_LEFT
-    PDF_AVAILABLE = True
-except ImportError:
-    PDF_AVAILABLE = False
-    print("⚠️ Bibliotecas de PDF não encontradas. Instale com: pip install reportlab")
+# PaddleOCR e reportlab são importados só quando usados: os subcomandos
+# match e report não carregam o modelo de OCR
+
+# Configuração do OCR
+OCR_LANG = 'pt'
+OCR_USE_ANGLE_CLS = True
+
+# Cache persistente do texto extraído pelo OCR
+CACHE_DIR = '.ocr_cache'
+CACHE_MAX_MB = 1024
+
+# Busca de campos: linhas adjacentes unidas em janelas (valores quebrados em
+# mais de uma linha), fração mínima de trigramas do valor que uma linha
+# precisa compartilhar para ser pontuada e tamanho (normalizado) abaixo do
+# qual o valor é comparado com todas as linhas (poucos trigramas: um único
+# erro do OCR derruba todos os compartilhados)
+MATCH_WINDOW_LINES = 2
+MIN_TRIGRAM_OVERLAP = 0.3
+MIN_TRIGRAM_VALUE_LENGTH = 7
+# Números de documento com menos dígitos significativos que isso casariam com
+# números de página, trechos de CEP e quantidades: ficam com a busca aproximada
+MIN_NUMBER_DIGITS = 4
+
+# Renderização de PDFs página a página (modo streaming)
+PDF_RENDER_DPI = 144
+
+# Micro-batches de inferência (imagens e páginas de vários documentos por chamada)
+OCR_BATCH_SIZE = 8
+OCR_BATCH_MAX_WAIT = 0.5
+
+# Leitura antecipada: documentos lidos/decodificados à frente do OCR e
+# threads de E/S (também usadas para carregar os JSONs na descoberta)
+PREFETCH_DEPTH = 4
+IO_THREADS = 4
+
+# Guarda de memória dos workers: documentos por worker antes de reciclá-lo e
+# teto de RSS (MB) acima do qual ele se recicla após o documento atual (0 =
+# sem limite), intervalo (s) de amostragem do RSS e fator da resolução na nova
+# tentativa de um documento que derrubou o worker
+WORKER_MAX_DOCUMENTS = 0
+WORKER_MAX_RSS_MB = 0
+RSS_SAMPLE_INTERVAL = 0.05
+RETRY_RENDER_SCALE = 0.5
+
+# Orçamento de tempo do OCR: segundos por documento e por página (0 = sem
+# limite; com os dois, vale o menor), páginas reconhecidas no caminho
+# degradado de quem estourar o orçamento e quantos documentos mais lentos
+# aparecem no resumo da execução
+DOCUMENT_TIMEOUT = 0
+PAGE_TIMEOUT = 0
+DEGRADED_MAX_PAGES = 2
+SLOWEST_DOCUMENTS = 10
+
+# Manifesto dos documentos concluídos (retomada e execução incremental)
+MANIFEST_FILENAME = 'manifesto.jsonl'
+
+# Métricas de desempenho (gravadas ao lado de resumo_por_edital.json)
+METRICS_JSON_FILENAME = 'metrics.json'
+METRICS_PROM_FILENAME = 'metrics.prom'
+METRICS_QUANTILES = (0.5, 0.95, 0.99)
+
+# Saídas da execução
+OUTPUT_DIR = 'resultados_json'
+TXT_REPORT_PATH = 'resultado_ocr_completo.txt'
+
+# JSONs individuais gravados em lotes desse tamanho pelas threads de E/S
+JSON_WRITE_BATCH = 64
+
+# Formatos dos resultados por documento: um JSON por documento ou um único
+# arquivo colunar compacto (convertido em JSON sob demanda pelo subcomando convert)
+OUTPUT_FORMATS = ('json', 'colunar')
+COLUMNAR_FILENAME = 'resultados.colunar'
+
+# Similaridade mínima para um campo ser considerado encontrado
+MATCH_THRESHOLD = 0.7
+
+# Varredura de thresholds (subcomando sweep): thresholds avaliados por padrão
+# e arquivo com as taxas por edital de cada um
+SWEEP_THRESHOLDS = '0.5:0.95:0.05'
+SWEEP_FILENAME = 'varredura_thresholds.json'
+
+# Relatório PDF: com mais editais que PDF_REPORT_CHUNK_EDITAIS, as seções são
+# renderizadas em blocos desse tamanho por PDF_REPORT_WORKERS processos
+PDF_REPORT_WORKERS = 4
+PDF_REPORT_CHUNK_EDITAIS = 100
+
+# Subcomandos da linha de comando (sem subcomando, assume ocr)
+COMMANDS = ('ocr', 'match', 'report', 'serve', 'merge', 'convert', 'sweep')
+
+# Execução distribuída (--shard i/N): pasta dos resultados parciais de cada
+# parte (dentro de OUTPUT_DIR) e arquivo que descreve a parte para o merge
+SHARD_DIR_FORMAT = 'shard_{index}_de_{total}'
+SHARD_INFO_FILENAME = 'shard.json'
+
+# Serviço local (subcomando serve): modelos carregados uma vez e fila limitada
+SERVICE_HOST = '127.0.0.1'
+SERVICE_PORT = 8765
+SERVICE_QUEUE_SIZE = 32
+
+# Resolução adaptativa: fator de redução da primeira passagem, confiança
+# mínima do OCR abaixo da qual o campo é conferido na resolução original e
+# sobreposição (IoU) a partir da qual uma linha relida substitui a da primeira
+ADAPTIVE_DOWNSCALE = 0.5
+ADAPTIVE_MIN_CONFIDENCE = 0.85
+ADAPTIVE_DUPLICATE_IOU = 0.5
+
+# Triagem de páginas antes do OCR: nível de cinza abaixo do qual um pixel
+# conta como tinta, fração máxima de tinta de uma página em branco e quantas
+# páginas repetidas (hash dos pixels + texto) ficam guardadas por processo
+PAGE_INK_LEVEL = 200
+BLANK_PAGE_MAX_INK = 0.002
+DUPLICATE_PAGE_MEMORY = 10000
+
+# Política de orientação por edital: páginas amostradas com o classificador de
+# ângulo, fração máxima de linhas giradas por ele para o edital ser considerado
+# em pé (e seguir sem o classificador), confiança média dos matches abaixo da
+# qual o classificador volta e arquivo onde as decisões ficam salvas
+ORIENTATION_SAMPLE_PAGES = 5
+ORIENTATION_MAX_ROTATED = 0.01
+ORIENTATION_MIN_CONFIDENCE = 0.5
+ORIENTATION_FILENAME = 'orientacao_por_edital.json'
+
+# Modelos de layout por edital: documentos completos usados para aprender as
+# regiões dos campos, margem (fração da página) em volta de cada região e
+# arquivo onde os modelos ficam salvos entre execuções
+LAYOUT_LEARN_DOCUMENTS = 3
+LAYOUT_MARGIN = 0.01
+LAYOUTS_FILENAME = 'layouts_por_edital.json'
+
+# Largura da página sintética do motor stub (pixels)
+STUB_PAGE_WIDTH = 1240
+
+# Extensões de documentos suportadas
+SUPPORTED_EXTENSIONS = ('.pdf', '.jpeg', '.jpg', '.png')
 
 def similarity(a, b):
     """Calcula a similaridade entre duas strings"""
@@ -31,67 +182,359 @@ def normalize_text(text):
     text = re.sub(r'\s+', ' ', text).strip()
     return text
 
-def find_matches_in_text(extracted_texts, search_values, threshold=0.7):
-    """Encontra matches entre o texto extraído e os valores procurados"""
-    matches = {}
+def digits_only(text):
+    """Mantém apenas os dígitos de um texto"""
+    return re.sub(r'\D', '', text)
+
+def canonical_cnpj(text):
+    """CNPJ como 14 dígitos, ou None"""
+    digits = digits_only(text)
+    return digits if len(digits) == 14 else None
+
+def canonical_cpf(text):
+    """CPF como 11 dígitos, ou None"""
+    digits = digits_only(text)
+    return digits if len(digits) == 11 else None
+
+def canonical_number(text):
+    """Número de documento como dígitos sem zeros à esquerda, ou None (também se tiver menos de MIN_NUMBER_DIGITS)"""
+    digits = digits_only(text).lstrip('0')
+    return digits if len(digits) >= MIN_NUMBER_DIGITS else None
+
+def canonical_date(text):
+    """Data em ISO (AAAA-MM-DD) a partir de dd/mm/aaaa, dd-mm-aa, dd.mm.aaaa, ddmmaaaa ou aaaa-mm-dd"""
+    text = text.strip()
+    parts = re.split(r'[/.\-]', text)
+    if len(parts) == 3 and all(part.isdigit() for part in parts):
+        if len(parts[0]) == 4:
+            year, month, day = parts
+        else:
+            day, month, year = parts
+    elif re.fullmatch(r'\d{8}', text):
+        day, month, year = text[:2], text[2:4], text[4:]
+    else:
+        return None
     
-    for field, search_value in search_values.items():
-        # Pula campos com valores null, None ou string vazia
-        if search_value is None or search_value == "" or search_value == "null":
-            continue
-            
-        best_match = None
-        best_similarity = 0
-        best_confidence = 0
+    year = int(year)
+    if year < 100:
+        year += 2000
+    try:
+        return date(year, int(month), int(day)).isoformat()
+    except ValueError:
+        return None
+
+def canonical_currency(text):
+    """Valor monetário como decimal com 2 casas ('R$ 1.250,00' -> '1250.00'), ou None"""
+    value = re.sub(r'[^\d,.]', '', text)
+    if not re.search(r'\d', value):
+        return None
+    
+    # Um separador final seguido de 1 ou 2 dígitos separa os centavos; os demais são de milhar
+    decimal_part = re.fullmatch(r'(.*?)[,.](\d{1,2})', value)
+    if decimal_part:
+        integer, cents = digits_only(decimal_part.group(1)) or '0', decimal_part.group(2)
+    else:
+        integer, cents = digits_only(value), '0'
+    
+    try:
+        return str(Decimal(f"{integer}.{cents}").quantize(Decimal('0.01')))
+    except InvalidOperation:
+        return None
+
+# Registro de matchers tipados, na ordem de prioridade
+TYPED_MATCHERS = []
+
+def register_typed_matcher(name, canonicalize, token_pattern, field_pattern, value_pattern=None):
+    """Registra um matcher tipado.
+
+    O matcher é escolhido para um campo quando o nome do campo casa com
+    `field_pattern` ou, se nenhum casar pelo nome, quando o valor esperado
+    casa com `value_pattern`. Os dois lados são comparados na forma canônica
+    devolvida por `canonicalize`; no texto extraído, os candidatos são os
+    trechos que casam com `token_pattern`.
+    """
+    TYPED_MATCHERS.append({
+        'name': name,
+        'canonicalize': canonicalize,
+        'token_pattern': re.compile(token_pattern),
+        'field_pattern': re.compile(field_pattern, re.IGNORECASE),
+        'value_pattern': re.compile(value_pattern) if value_pattern else None
+    })
+
+register_typed_matcher(
+    'cnpj', canonical_cnpj,
+    token_pattern=r'(?<!\d)\d{2}[.\s]?\d{3}[.\s]?\d{3}[/\s]?\d{4}[-\s]?\d{2}(?!\d)',
+    field_pattern=r'cnpj',
+    value_pattern=r'^\s*\d{2}\.\d{3}\.\d{3}/\d{4}-\d{2}\s*$'
+)
+register_typed_matcher(
+    'cpf', canonical_cpf,
+    token_pattern=r'(?<!\d)\d{3}[.\s]?\d{3}[.\s]?\d{3}[-\s]?\d{2}(?!\d)',
+    field_pattern=r'cpf',
+    value_pattern=r'^\s*\d{3}\.\d{3}\.\d{3}-\d{2}\s*$'
+)
+register_typed_matcher(
+    'data', canonical_date,
+    token_pattern=r'(?<!\d)(?:\d{4}-\d{2}-\d{2}|\d{1,2}[/.\-]\d{1,2}[/.\-]\d{2,4}|\d{8})(?!\d)',
+    field_pattern=r'(^|_)(data|dt)(_|$)',
+    value_pattern=r'^\s*\d{1,2}/\d{1,2}/\d{2,4}\s*$'
+)
+register_typed_matcher(
+    'moeda', canonical_currency,
+    token_pattern=r'(?<![\d.,])(?:\d{1,3}(?:[.\s]\d{3})+|\d+)(?:[,.]\d{2})?(?![\d])',
+    field_pattern=r'(^|_)(valor|preco|preço|vlr|total)(_|$)',
+    value_pattern=r'^\s*(R\$\s*)?\d{1,3}(\.\d{3})*,\d{2}\s*$'
+)
+register_typed_matcher(
+    'numero', canonical_number,
+    token_pattern=r'(?<![\d.\-/])\d(?:[\d.\-/]*\d)?(?![\d])',
+    field_pattern=r'(^|_)(numero|número|num|nro)(_|$)'
+)
+
+def select_typed_matcher(field, search_value):
+    """Escolhe o matcher tipado de um campo (pelo nome ou pelo valor) e canoniza o valor.
+
+    Retorna (matcher, valor canônico) ou (None, None) quando o campo deve usar
+    a busca aproximada.
+    """
+    value = str(search_value)
+    candidates = [matcher for matcher in TYPED_MATCHERS if matcher['field_pattern'].search(field)]
+    if not candidates:
+        candidates = [matcher for matcher in TYPED_MATCHERS
+                      if matcher['value_pattern'] and matcher['value_pattern'].match(value)]
+    
+    for matcher in candidates:
+        canonical = matcher['canonicalize'](value)
+        if canonical is not None:
+            return matcher, canonical
+    
+    return None, None
+
+def text_trigrams(text):
+    """Conjunto de trigramas de caracteres de um texto"""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+def union_boxes(boxes):
+    """Menor caixa [x1, y1, x2, y2] que contém todas as caixas (None se alguma for desconhecida)"""
+    if not boxes or any(box is None for box in boxes):
+        return None
+    return [min(box[0] for box in boxes), min(box[1] for box in boxes),
+            max(box[2] for box in boxes), max(box[3] for box in boxes)]
+
+class TextMatcher:
+    """Motor de busca de campos pré-computado para um documento.
+
+    Cada linha extraída é normalizada e convertida para minúsculas uma única
+    vez. Além das linhas, são indexadas janelas de linhas adjacentes unidas
+    por espaço, o que permite encontrar valores quebrados pelo OCR (ex.: uma
+    razão social dividida em duas linhas).
+
+    Campos estruturados (CNPJ, CPF, datas, valores, números) são procurados
+    primeiro pelos matchers tipados de TYPED_MATCHERS, em um índice de valores
+    canônicos montado uma vez por documento; a busca aproximada abaixo fica
+    como alternativa para texto livre.
+
+    Um índice invertido de trigramas seleciona, para cada campo, apenas os
+    candidatos que compartilham trigramas suficientes com o valor procurado.
+    Entre eles, quem não pode superar o melhor score atual é descartado pelo
+    limite de tamanho e por quick_ratio antes do ratio() exato.
+    """
+    
+    def __init__(self, extracted_texts, window_lines=MATCH_WINDOW_LINES, min_trigram_overlap=MIN_TRIGRAM_OVERLAP):
+        self.min_trigram_overlap = min_trigram_overlap
+        self.texts = [text_info['text'] for text_info in extracted_texts]
+        self.confidences = [text_info['confidence'] for text_info in extracted_texts]
+        self.boxes = [text_info.get('box') for text_info in extracted_texts]
+        self.pages = [text_info.get('page') for text_info in extracted_texts]
+        self.num_lines = len(self.texts)
         
-        search_value_normalized = normalize_text(str(search_value))
+        # Janelas de linhas adjacentes vêm depois das linhas: em caso de empate vence a linha isolada
+        for size in range(2, window_lines + 1):
+            for start in range(self.num_lines - size + 1):
+                self.texts.append(' '.join(self.texts[start:start + size]))
+                self.confidences.append(min(self.confidences[start:start + size]))
+                self.boxes.append(union_boxes(self.boxes[start:start + size]))
+                self.pages.append(self.pages[start])
         
-        # Se após normalizar o valor ficar vazio, também pula
-        if not search_value_normalized.strip():
-            continue
+        self.normalized = [normalize_text(text) for text in self.texts]
+        self.lowered = [text.lower() for text in self.normalized]
+        self.lengths = [len(text) for text in self.lowered]
+        self._sequence_matcher = SequenceMatcher(None)
+        
+        # Índice invertido: trigrama -> candidatos (linhas e janelas) que o contêm
+        self._trigram_index = defaultdict(list)
+        for i, text_lower in enumerate(self.lowered):
+            for trigram in text_trigrams(text_lower):
+                self._trigram_index[trigram].append(i)
+        
+        # Índices dos matchers tipados (valor canônico -> primeira linha), montados sob demanda
+        self._typed_indexes = {}
+    
+    def typed_index(self, matcher):
+        """Índice valor canônico -> primeira linha onde aparece, para um matcher tipado"""
+        index = self._typed_indexes.get(matcher['name'])
+        if index is None:
+            index = {}
+            token_pattern = matcher['token_pattern']
+            canonicalize = matcher['canonicalize']
+            for i in range(self.num_lines):
+                for token in token_pattern.findall(self.texts[i]):
+                    canonical = canonicalize(token)
+                    if canonical is not None:
+                        index.setdefault(canonical, i)
+            self._typed_indexes[matcher['name']] = index
+        return index
+    
+    def candidates(self, search_lower):
+        """Índices (em ordem) dos candidatos que compartilham trigramas suficientes com o valor"""
+        if len(search_lower) < MIN_TRIGRAM_VALUE_LENGTH:
+            # Valores curtos têm poucos trigramas: compara com todas as linhas
+            return range(self.num_lines)
+        query_trigrams = text_trigrams(search_lower)
+        
+        shared = Counter()
+        for trigram in query_trigrams:
+            shared.update(self._trigram_index.get(trigram, ()))
+        
+        min_shared = max(1, math.ceil(self.min_trigram_overlap * len(query_trigrams)))
+        return sorted(i for i, count in shared.items() if count >= min_shared)
+    
+    def best_line(self, search_value_normalized, threshold=0.7):
+        """Retorna (índice do candidato, score) do melhor match acima do threshold, ou (None, 0)"""
+        search_lower = search_value_normalized.lower()
+        search_length = len(search_lower)
+        
+        # A sequência "b" (valor procurado) é fixa: o índice interno é montado uma vez por campo
+        matcher = self._sequence_matcher
+        matcher.set_seq2(search_lower)
+        
+        best_index = None
+        best_similarity = 0
         
-        for text_info in extracted_texts:
-            text = text_info['text']
-            confidence = text_info['confidence']
-            text_normalized = normalize_text(text)
+        for i in self.candidates(search_lower):
+            text_lower = self.lowered[i]
             
-            # Verifica similaridade completa
-            sim_score = similarity(text_normalized, search_value_normalized)
+            # O score final precisa superar o threshold e o melhor score atual
+            floor = max(threshold, best_similarity)
             
             # Verifica se o valor procurado está contido no texto extraído
-            contains_score = 0
-            if search_value_normalized in text_normalized:
-                contains_score = 0.9
+            contains_score = 0.9 if search_value_normalized in self.normalized[i] else 0
+            
+            # A similaridade só importa se puder superar floor e a pontuação de contenção
+            needed = max(floor, contains_score)
+            sim_score = 0
+            text_length = self.lengths[i]
+            if 2.0 * min(text_length, search_length) / (text_length + search_length) > needed:
+                matcher.set_seq1(text_lower)
+                if matcher.quick_ratio() > needed:
+                    sim_score = matcher.ratio()
             
             # Usa a maior pontuação entre similaridade e contenção
             final_score = max(sim_score, contains_score)
             
-            if final_score > threshold and final_score > best_similarity:
+            if final_score > floor:
                 best_similarity = final_score
-                best_match = text
-                best_confidence = confidence
-        
-        if best_match:
-            matches[field] = {
-                'found': True,
-                'expected': search_value,
-                'extracted': best_match,
-                'similarity': best_similarity,
-                'ocr_confidence': best_confidence
-            }
-        else:
-            matches[field] = {
-                'found': False,
-                'expected': search_value,
-                'extracted': None,
-                'similarity': 0,
-                'ocr_confidence': 0
-            }
+                best_index = i
+        
+        return best_index, best_similarity
     
-    return matches
+    def found(self, search_value, index, similarity, matcher):
+        """Monta o match de um campo encontrado no candidato `index` (com caixa e página, se conhecidas)"""
+        match = {
+            'found': True,
+            'expected': search_value,
+            'extracted': self.texts[index],
+            'similarity': similarity,
+            'ocr_confidence': self.confidences[index],
+            'matcher': matcher
+        }
+        if self.boxes[index] is not None:
+            match['box'] = self.boxes[index]
+        if self.pages[index] is not None:
+            match['page'] = self.pages[index]
+        return match
+    
+    @staticmethod
+    def searchable_fields(search_values):
+        """Campos que entram na busca: (campo, valor, valor normalizado), sem os valores vazios"""
+        for field, search_value in search_values.items():
+            # Pula campos com valores null, None ou string vazia
+            if search_value is None or search_value == "" or search_value == "null":
+                continue
+            
+            search_value_normalized = normalize_text(str(search_value))
+            
+            # Se após normalizar o valor ficar vazio, também pula
+            if not search_value_normalized.strip():
+                continue
+            
+            yield field, search_value, search_value_normalized
+    
+    def find_matches(self, search_values, threshold=0.7):
+        """Encontra matches entre as linhas do documento e os valores procurados"""
+        matches = {}
+        
+        for field, search_value, search_value_normalized in self.searchable_fields(search_values):
+            # Campos estruturados (CNPJ, CPF, datas, valores...): comparação exata na forma canônica
+            typed_matcher, canonical = select_typed_matcher(field, search_value)
+            if typed_matcher is not None:
+                line_index = self.typed_index(typed_matcher).get(canonical)
+                if line_index is not None:
+                    matches[field] = self.found(search_value, line_index, 1.0, typed_matcher['name'])
+                    continue
+            
+            # Texto livre (ou campo tipado não encontrado): busca aproximada
+            best_index, best_similarity = self.best_line(search_value_normalized, threshold)
+            
+            if best_index is not None:
+                matches[field] = self.found(search_value, best_index, best_similarity, 'aproximado')
+            else:
+                matches[field] = {
+                    'found': False,
+                    'expected': search_value,
+                    'extracted': None,
+                    'similarity': 0,
+                    'ocr_confidence': 0,
+                    'matcher': None
+                }
+        
+        return matches
+    
+    def best_scores(self, search_values):
+        """Melhor score de cada campo, independente do threshold, na ordem de find_matches.
+
+        Com qualquer threshold t, find_matches encontra o campo se e somente se
+        o score for maior que t. Campos tipados encontrados na forma canônica
+        valem infinito: são encontrados com qualquer threshold.
+        """
+        scores = []
+        for field, search_value, search_value_normalized in self.searchable_fields(search_values):
+            typed_matcher, canonical = select_typed_matcher(field, search_value)
+            if typed_matcher is not None and canonical in self.typed_index(typed_matcher):
+                scores.append(math.inf)
+                continue
+            
+            # Threshold 0: a poda continua valendo, só descarta quem não supera o melhor score atual
+            scores.append(self.best_line(search_value_normalized, 0.0)[1])
+        return scores
+
+def find_matches_in_text(extracted_texts, search_values, threshold=0.7):
+    """Encontra matches entre o texto extraído e os valores procurados"""
+    return TextMatcher(extracted_texts).find_matches(search_values, threshold)
+
+def bounding_box(points):
+    """Normaliza a caixa de uma linha para [x1, y1, x2, y2] (aceita retângulo ou polígono)"""
+    if points is None:
+        return None
+    points = [list(point) if hasattr(point, '__len__') else point for point in points]
+    if len(points) == 4 and not isinstance(points[0], list):
+        return [int(value) for value in points]
+    xs = [point[0] for point in points]
+    ys = [point[1] for point in points]
+    return [int(min(xs)), int(min(ys)), int(max(xs)), int(max(ys))]
 
 def extract_text_from_ocr_result(result):
-    """Extrai texto e confiança do resultado do OCR"""
+    """Extrai texto, confiança e caixa (quando houver) do resultado do PaddleOCR"""
     texto_extraido = []
     
     for res in result:
@@ -100,12 +543,16 @@ def extract_text_from_ocr_result(result):
         elif isinstance(res, list):
             linhas = res
         elif isinstance(res, dict) and 'rec_texts' in res:
+            caixas = res.get('rec_boxes')
             for i, texto in enumerate(res['rec_texts']):
                 confianca = res['rec_scores'][i] if 'rec_scores' in res else 0.0
-                texto_extraido.append({
+                linha = {
                     'text': texto,
                     'confidence': confianca
-                })
+                }
+                if caixas is not None and i < len(caixas):
+                    linha['box'] = bounding_box(caixas[i])
+                texto_extraido.append(linha)
             continue
         else:
             continue
@@ -117,183 +564,1555 @@ def extract_text_from_ocr_result(result):
                 'text': texto,
                 'confidence': confianca
             })
+            if linha.get('box') is not None:
+                texto_extraido[-1]['box'] = bounding_box(linha['box'])
     
     return texto_extraido
 
-def process_document(file_path, json_data, ocr, edital_name):
-    """Processa um documento e verifica matches com os dados do JSON"""
-    print(f"\n=== Processando: {file_path} (Edital: {edital_name}) ===")
+def count_rotated_lines(result):
+    """Linhas que o classificador de ângulo girou no resultado do PaddleOCR (textline_orientation_angles)"""
+    rotated = 0
+    for res in result:
+        if isinstance(res, dict):
+            rotated += sum(1 for angle in res.get('textline_orientation_angles', ()) if angle > 0)
+    return rotated
+
+def file_sha256(file_path, chunk_size=1024 * 1024):
+    """Calcula o hash SHA-256 do conteúdo de um arquivo"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def get_paddleocr_version():
+    """Retorna a versão instalada do PaddleOCR (define os modelos padrão usados)"""
+    try:
+        return importlib.metadata.version('paddleocr')
+    except importlib.metadata.PackageNotFoundError:
+        return 'desconhecida'
+
+def ocr_config_fingerprint():
+    """Configuração do OCR que influencia o texto extraído (faz parte da chave do cache)"""
+    return {
+        'lang': OCR_LANG,
+        'use_angle_cls': OCR_USE_ANGLE_CLS,
+        'paddleocr_version': get_paddleocr_version()
+    }
+
+class OCRCache:
+    """Cache em disco do resultado de extract_text_from_ocr_result.
+
+    A chave é o hash do conteúdo do arquivo combinado com a configuração do
+    motor de OCR, então renomear ou mover um documento não invalida o cache, mas trocar
+    idioma, classificador de ângulo ou versão do PaddleOCR sim. O tamanho total
+    é limitado a `max_bytes`; ao ultrapassar o limite, as entradas usadas há
+    mais tempo (mtime, atualizado a cada leitura) são removidas.
+    """
     
-    # Executa OCR
-    result = ocr.predict(file_path)
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=CACHE_MAX_MB * 1024 * 1024, refresh=False, config=None):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.refresh = refresh
+        # Configuração do motor de OCR (padrão: PaddleOCR); motores diferentes não compartilham entradas
+        self.config = config if config is not None else ocr_config_fingerprint()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._total_bytes = sum(size for _, _, size in self._entries())
+        self._file_hashes = {}
     
-    # Extrai texto e confiança
-    extracted_texts = extract_text_from_ocr_result(result)
+    def file_hash(self, file_path):
+        """Hash do conteúdo do arquivo, memorizado enquanto mtime e tamanho não mudarem"""
+        stat = os.stat(file_path)
+        memo_key = (file_path, stat.st_mtime_ns, stat.st_size)
+        digest = self._file_hashes.get(memo_key)
+        if digest is None:
+            digest = file_sha256(file_path)
+            self._file_hashes[memo_key] = digest
+        return digest
     
-    # Encontra matches
-    matches = find_matches_in_text(extracted_texts, json_data)
+    def with_config(self, config):
+        """O mesmo cache (diretório, limite e hashes memorizados) com outra configuração do motor nas chaves"""
+        view = copy.copy(self)
+        view.config = config
+        return view
     
-    return {
-        'file_path': file_path,
-        'edital': edital_name,
-        'json_data': json_data,
-        'extracted_texts': extracted_texts,
-        'matches': matches
-    }
+    def make_key(self, file_path, **extra):
+        """Gera a chave do cache para um documento (e parâmetros extras, se houver)"""
+        payload = {'file_sha256': self.file_hash(file_path), 'config': self.config}
+        payload.update(extra)
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()
+    
+    def document_key(self, file_path):
+        """Chave do texto do documento inteiro reconhecido pelo motor.
 
-def calculate_edital_stats(results_by_edital):
-    """Calcula estatísticas por edital"""
-    edital_stats = {}
+        PDFs inteiros vão ao motor, que renderiza as páginas do seu jeito; páginas
+        renderizadas pelo pypdfium2 têm chave própria, por página e dpi
+        (recognize_pdf_page), e nunca se misturam com esta.
+        """
+        if file_path.lower().endswith('.pdf'):
+            return self.make_key(file_path, render='motor')
+        return self.make_key(file_path)
     
-    for edital_name, results in results_by_edital.items():
-        total_documents = len(results)
-        total_fields = sum(len(result['matches']) for result in results)
-        total_found = sum(sum(1 for match in result['matches'].values() if match['found']) for result in results)
-        
-        success_rate = (total_found / total_fields * 100) if total_fields > 0 else 0
-        
-        edital_stats[edital_name] = {
-            'total_documents': total_documents,
-            'total_fields': total_fields,
-            'fields_found': total_found,
-            'success_rate': success_rate,
-            'results': results
-        }
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
     
-    return edital_stats
-
-def create_header_footer(canvas, doc):
-    """Cria cabeçalho e rodapé personalizados para o PDF"""
-    canvas.saveState()
+    def _entries(self):
+        """Lista (caminho, mtime, tamanho) de todas as entradas do cache"""
+        entries = []
+        for shard in os.scandir(self.cache_dir):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith('.json'):
+                    stat = entry.stat()
+                    entries.append((entry.path, stat.st_mtime, stat.st_size))
+        return entries
     
-    # Cabeçalho
-    canvas.setFont('Helvetica-Bold', 10)
-    canvas.setFillColor(colors.darkblue)
-    canvas.drawString(inch, A4[1] - 0.5*inch, "Relatório de Processamento OCR")
+    def has(self, key):
+        """Indica se há entrada para a chave (sem lê-la nem marcá-la como usada)"""
+        return not self.refresh and os.path.exists(self._path(key))
     
-    # Rodapé
-    canvas.setFont('Helvetica', 8)
-    canvas.setFillColor(colors.grey)
-    canvas.drawString(inch, 0.5*inch, f"Gerado em: {datetime.now().strftime('%d/%m/%Y às %H:%M:%S')}")
-    canvas.drawRightString(A4[0] - inch, 0.5*inch, f"Página {doc.page}")
+    def get(self, key):
+        """Retorna o texto extraído em cache ou None"""
+        if self.refresh:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        # Marca a entrada como usada recentemente (LRU)
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return data['extracted_texts']
     
-    canvas.restoreState()
+    def put(self, key, extracted_texts):
+        """Armazena o texto extraído e aplica o limite de tamanho"""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = {
+            'extracted_texts': [
+                {'text': text_info['text'], 'confidence': float(text_info['confidence']),
+                 **({'box': text_info['box']} if text_info.get('box') is not None else {}),
+                 **({'page': text_info['page']} if text_info.get('page') is not None else {})}
+                for text_info in extracted_texts
+            ]
+        }
+        # Escrita atômica: vários processos podem compartilhar o mesmo cache
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        self._total_bytes += os.path.getsize(path)
+        
+        if self._total_bytes > self.max_bytes:
+            self.evict()
+    
+    def evict(self):
+        """Remove as entradas menos usadas até ficar abaixo de 90% do limite"""
+        entries = sorted(self._entries(), key=lambda entry: entry[1])
+        total = sum(size for _, _, size in entries)
+        target = self.max_bytes * 0.9
+        
+        for path, _, size in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        
+        self._total_bytes = total
 
-def generate_pdf_report(json_data, output_path):
-    """Gera relatório PDF completo baseado nos dados do JSON"""
-    if not PDF_AVAILABLE:
-        print("❌ Não foi possível gerar PDF - bibliotecas não instaladas")
+@contextmanager
+def timed(timings, stage):
+    """Soma em timings[stage] o tempo (segundos) gasto no bloco"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - start
+
+def current_rss_mb():
+    """RSS atual do processo em MB (Linux: /proc/self/statm; demais Unix: pico via getrusage; senão None)"""
+    try:
+        with open('/proc/self/statm', 'rb') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+    except ImportError:
         return None
+    # ru_maxrss vem em KB no Linux e em bytes no macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 1024
+
+class PeakRSSMonitor:
+    """Pico de RSS do processo durante um bloco `with` (thread amostrando a cada `interval` segundos)"""
     
-    # Configura estilos
-    styles = getSampleStyleSheet()
+    def __init__(self, interval=RSS_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.peak = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample_until_stopped, daemon=True)
     
-    # Estilos customizados
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Title'],
-        fontSize=24,
-        spaceAfter=30,
-        alignment=TA_CENTER,
-        textColor=colors.darkblue
-    )
+    def _sample(self):
+        rss = current_rss_mb()
+        if rss is not None and (self.peak is None or rss > self.peak):
+            self.peak = rss
     
-    subtitle_style = ParagraphStyle(
-        'CustomSubtitle',
-        parent=styles['Heading1'],
-        fontSize=18,
-        spaceAfter=20,
-        alignment=TA_CENTER,
-        textColor=colors.darkgreen
-    )
+    def _sample_until_stopped(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
     
-    section_style = ParagraphStyle(
-        'SectionHeader',
-        parent=styles['Heading2'],
-        fontSize=14,
-        spaceAfter=12,
-        spaceBefore=20,
-        textColor=colors.darkblue,
-        borderWidth=1,
-        borderColor=colors.darkblue,
-        borderPadding=5
-    )
+    def __enter__(self):
+        self._sample()
+        self._thread.start()
+        return self
     
-    normal_style = ParagraphStyle(
-        'CustomNormal',
-        parent=styles['Normal'],
-        fontSize=11,
-        spaceAfter=6,
-        alignment=TA_LEFT
-    )
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        self._sample()
     
-    # Cria o documento PDF
-    doc = SimpleDocTemplate(
-        output_path,
-        pagesize=A4,
-        rightMargin=inch,
-        leftMargin=inch,
-        topMargin=1.2*inch,
-        bottomMargin=inch
-    )
+    @property
+    def peak_mb(self):
+        return round(self.peak, 1) if self.peak is not None else None
+
+def iter_pdf_pages(file_path, dpi=PDF_RENDER_DPI, pages=None):
+    """Gera (número da página, total de páginas, imagem BGR) renderizando uma página por vez.
+
+    Com `pages` (números a partir de 1), renderiza só essas páginas.
+    """
+    import pypdfium2
     
-    # Lista para armazenar os elementos do PDF
-    story = []
+    pdf = pypdfium2.PdfDocument(file_path)
+    try:
+        total_pages = len(pdf)
+        page_numbers = range(1, total_pages + 1) if pages is None else [n for n in pages if 1 <= n <= total_pages]
+        for page_number in page_numbers:
+            page = pdf[page_number - 1]
+            try:
+                image = page.render(scale=dpi / 72).to_numpy()
+            finally:
+                page.close()
+            yield page_number, total_pages, image
+    finally:
+        pdf.close()
+
+class PageScreener:
+    """Triagem barata das páginas antes do OCR: páginas em branco e repetidas.
+
+    A página é reduzida a tons de cinza (amostrando 1 a cada 4 pixels). Se a
+    fração de pixels com tinta ficar abaixo de `max_ink`, a página é tratada
+    como em branco e não passa pelo OCR. Caso contrário, calcula-se o SHA-256
+    dos pixels da página inteira; só páginas idênticas pixel a pixel a uma já
+    reconhecida reusam as linhas dela (formulários do mesmo layout diferem
+    apenas no conteúdo dos campos, que um hash perceptual não distingue).
+    As páginas lembradas valem para todos os documentos e editais do processo
+    (cada worker do pool tem a sua cópia; as threads do `serve` compartilham).
+    """
     
-    # Título principal
-    title = Paragraph("Relatório de Processamento OCR", title_style)
-    story.append(title)
-    story.append(Spacer(1, 20))
+    def __init__(self, max_ink=BLANK_PAGE_MAX_INK, memory=DUPLICATE_PAGE_MEMORY):
+        self.max_ink = max_ink
+        self.memory = memory
+        self._lines = {}
+        self._lock = threading.Lock()
     
-    # Tabela de resumo geral
-    resumo_data = [
-        ['Métrica', 'Valor'],
-        ['Data de Processamento', json_data['data_processamento']],
-        ['Total de Editais', str(json_data['total_editais'])],
-        ['Total de Documentos', str(json_data['total_documentos'])],
-    ]
+    def __getstate__(self):
+        # O lock não é serializável: cada processo cria o seu
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
     
-    resumo_table = Table(resumo_data, colWidths=[3*inch, 2*inch])
-    resumo_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.darkblue),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 12),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black)
-    ]))
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
     
-    story.append(resumo_table)
-    story.append(Spacer(1, 30))
+    @staticmethod
+    def grayscale(image):
+        import numpy as np
+        
+        gray = np.asarray(image)[::4, ::4]
+        if gray.ndim == 3:
+            gray = gray.mean(axis=2)
+        return gray
     
-    # Seção de análise por edital
-    section_header = Paragraph("Análise Detalhada por Edital", section_style)
-    story.append(section_header)
+    def is_blank(self, gray):
+        return (gray < PAGE_INK_LEVEL).mean() < self.max_ink
     
-    # Cria tabela com estatísticas detalhadas
-    stats_data = [['Edital', 'Documentos', 'Campos Total', 'Campos Encontrados', 'Taxa de Sucesso']]
+    @staticmethod
+    def page_hash(image):
+        """SHA-256 dos pixels (com formato e tipo) da página inteira"""
+        import numpy as np
+        
+        pixels = np.ascontiguousarray(image)
+        digest = hashlib.sha256(f"{pixels.shape}{pixels.dtype}".encode('utf-8'))
+        digest.update(memoryview(pixels).cast('B'))
+        return digest.digest()
     
-    total_documentos = 0
-    total_campos = 0
-    total_encontrados = 0
+    def find(self, page_hash):
+        """Linhas (cópia) de uma página já reconhecida com os mesmos pixels, ou None"""
+        with self._lock:
+            lines = self._lines.get(page_hash)
+            return None if lines is None else [dict(line) for line in lines]
     
-    for edital_name, stats in json_data['estatisticas_por_edital'].items():
-        stats_data.append([
+    def remember(self, page_hash, lines):
+        """Guarda as linhas reconhecidas de uma página (descarta as mais antigas acima de `memory`)"""
+        with self._lock:
+            if page_hash in self._lines:
+                return
+            self._lines[page_hash] = [dict(line) for line in lines]
+            if len(self._lines) > self.memory:
+                del self._lines[next(iter(self._lines))]
+    
+    def screen(self, image):
+        """Retorna ('em_branco', None, None), ('duplicada', hash, linhas) ou ('nova', hash, None)"""
+        gray = self.grayscale(image)
+        if self.is_blank(gray):
+            return 'em_branco', None, None
+        page_hash = self.page_hash(image)
+        lines = self.find(page_hash)
+        if lines is not None:
+            return 'duplicada', page_hash, lines
+        return 'nova', page_hash, None
+
+def new_page_stats():
+    """Contadores da triagem de páginas de um documento"""
+    return {'em_branco': 0, 'duplicada': 0}
+
+def recognize_screened(source, ocr, screener, image=None, page_stats=None, timings=None):
+    """Reconhece uma página ou imagem passando antes pela triagem (em branco / repetida).
+
+    `source` vai para o OCR (caminho ou array); `image` é o array usado na
+    triagem (padrão: a própria fonte, carregada se for caminho).
+    """
+    timings = timings if timings is not None else {}
+    with timed(timings, 'triagem'):
+        status, page_hash, lines = screener.screen(load_image(source) if image is None else image)
+    
+    if status != 'nova':
+        if page_stats is not None:
+            page_stats[status] += 1
+        return lines or []
+    
+    with timed(timings, 'ocr'):
+        lines = ocr.recognize(source)
+    screener.remember(page_hash, lines)
+    return lines
+
+def timed_pages(pages, timings):
+    """Repassa as páginas de iter_pdf_pages somando o tempo de renderização em timings['rasterizacao']"""
+    try:
+        while True:
+            with timed(timings, 'rasterizacao'):
+                page = next(pages, None)
+            if page is None:
+                break
+            yield page
+    finally:
+        pages.close()
+
+def recognize_pdf_page(file_path, page_number, image, ocr, cache=None, dpi=PDF_RENDER_DPI, timings=None,
+                       screener=None, page_stats=None):
+    """OCR de uma página já renderizada, com cache por (documento, página, dpi); marca cada linha com 'page'.
+
+    Com `screener`, páginas em branco ou repetidas não passam pelo OCR
+    (contadas em `page_stats`); o texto dessas páginas não vai para o cache.
+    """
+    timings = timings if timings is not None else {}
+    page_texts = None
+    if cache is not None:
+        with timed(timings, 'cache'):
+            cache_key = cache.make_key(file_path, page=page_number, dpi=dpi)
+            page_texts = cache.get(cache_key)
+    
+    if page_texts is None:
+        screened = False
+        if screener is not None:
+            page_stats = page_stats if page_stats is not None else new_page_stats()
+            screened_before = sum(page_stats.values())
+            page_texts = recognize_screened(image, ocr, screener, image, page_stats, timings)
+            screened = sum(page_stats.values()) > screened_before
+        else:
+            with timed(timings, 'ocr'):
+                page_texts = ocr.recognize(image)
+        if cache is not None and not screened:
+            with timed(timings, 'cache'):
+                cache.put(cache_key, page_texts)
+    
+    for text_info in page_texts:
+        text_info['page'] = page_number
+    return page_texts
+
+def merge_matches(matches, page_matches):
+    """Incorpora os matches de uma página, mantendo o melhor score de cada campo"""
+    for field, page_match in page_matches.items():
+        current = matches.get(field)
+        if current is None or (page_match['found'] and page_match['similarity'] > current['similarity']):
+            matches[field] = page_match
+    return matches
+
+def ocr_pdf_streaming(file_path, json_data, ocr, cache=None, dpi=PDF_RENDER_DPI, threshold=MATCH_THRESHOLD,
+                      timings=None, screener=None, page_stats=None):
+    """OCR de um PDF página a página, parando assim que todos os campos forem encontrados.
+
+    Retorna (textos extraídos, matches, páginas processadas, total de páginas).
+    Cada linha extraída recebe a chave 'page' com o número da página. Os tempos
+    de cada etapa são somados em `timings`.
+    """
+    timings = timings if timings is not None else {}
+    extracted_texts = []
+    matches = {}
+    pages_processed = 0
+    total_pages = 0
+    pages = timed_pages(iter_pdf_pages(file_path, dpi), timings)
+    
+    for page_number, total_pages, image in pages:
+        page_texts = recognize_pdf_page(file_path, page_number, image, ocr, cache, dpi, timings, screener, page_stats)
+        extracted_texts.extend(page_texts)
+        pages_processed = page_number
+        
+        # Atualiza os matches só com as linhas da nova página
+        with timed(timings, 'matching'):
+            merge_matches(matches, find_matches_in_text(page_texts, json_data, threshold))
+        
+        # matches já contém todos os campos não nulos (encontrados ou não) desde a primeira página
+        if all(match['found'] for match in matches.values()):
+            if page_number < total_pages:
+                print(f"⏩ Todos os campos encontrados na página {page_number}/{total_pages}, OCR encerrado")
+            break
+    pages.close()
+    
+    # Mantém a ordem dos campos do JSON, como em find_matches_in_text
+    matches = {field: matches[field] for field in json_data if field in matches}
+    
+    return extracted_texts, matches, pages_processed, total_pages
+
+class LayoutTemplates:
+    """Modelos de layout por edital: onde cada campo costuma aparecer na página.
+
+    Documentos de um mesmo edital normalmente seguem um único formulário.
+    Dos primeiros `learn_documents` documentos processados por completo, a
+    caixa da linha onde cada campo foi encontrado é guardada em coordenadas
+    relativas (0 a 1), unindo as caixas de documentos diferentes (cada
+    documento é aprendido uma única vez). Depois disso o modelo não muda
+    mais e regions devolve, em pixels e com margem, as regiões a reconhecer
+    em um novo documento do edital; se algum campo não tiver região
+    conhecida, devolve None e o documento passa pelo OCR completo.
+    """
+    
+    def __init__(self, path=None, learn_documents=LAYOUT_LEARN_DOCUMENTS, margin=LAYOUT_MARGIN):
+        self.path = path
+        self.learn_documents = learn_documents
+        self.margin = margin
+        self.templates = {}
+        if path and os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self.templates = json.load(f)
+    
+    def learn(self, result):
+        """Acumula no modelo do edital as caixas dos campos encontrados em um documento completo"""
+        image_size = result.get('image_size')
+        if image_size is None:
+            return
+        width, height = image_size
+        template = self.templates.setdefault(result['edital'], {'documents': [], 'fields': {}})
+        # Modelo pronto: documentos refeitos por completo não alargam mais as regiões
+        if len(template['documents']) >= self.learn_documents or result['file_path'] in template['documents']:
+            return
+        
+        for field, match in result['matches'].items():
+            if match['found'] and match.get('box') is not None:
+                x1, y1, x2, y2 = match['box']
+                relative = [x1 / width, y1 / height, x2 / width, y2 / height]
+                known = template['fields'].get(field)
+                template['fields'][field] = relative if known is None else union_boxes([known, relative])
+        template['documents'].append(result['file_path'])
+    
+    def regions(self, edital_name, json_data, image_size):
+        """Regiões (pixels) a reconhecer para os campos de json_data, ou None se o modelo não as cobre"""
+        template = self.templates.get(edital_name)
+        if template is None or len(template['documents']) < self.learn_documents:
+            return None
+        
+        width, height = image_size
+        regions = []
+        for field, value in json_data.items():
+            if value is None or value == "" or value == "null":
+                continue
+            relative = template['fields'].get(field)
+            if relative is None:
+                return None
+            x1, y1, x2, y2 = relative
+            regions.append([
+                max(0, int((x1 - self.margin) * width)), max(0, int((y1 - self.margin) * height)),
+                min(width, math.ceil((x2 + self.margin) * width)), min(height, math.ceil((y2 + self.margin) * height))
+            ])
+        
+        # Regiões sobrepostas são unidas para não reconhecer a mesma linha duas vezes
+        merged = []
+        for region in sorted(regions, key=lambda box: (box[1], box[0])):
+            for i, other in enumerate(merged):
+                if region[0] < other[2] and other[0] < region[2] and region[1] < other[3] and other[1] < region[3]:
+                    merged[i] = union_boxes([region, other])
+                    break
+            else:
+                merged.append(region)
+        return merged or None
+    
+    def save(self):
+        if self.path:
+            with open(self.path, 'w', encoding='utf-8') as f:
+                json.dump(self.templates, f, ensure_ascii=False, indent=2)
+
+def ocr_with_layout(file_path, json_data, ocr, edital_name, layouts, threshold, timings, source=None):
+    """Tenta reconhecer só as regiões do modelo do edital.
+
+    Retorna (textos, matches, tamanho da imagem); textos e matches são None
+    quando não há modelo pronto ou algum campo não foi encontrado nas regiões
+    (o chamador faz então o OCR completo). `source` é a imagem já lida
+    (padrão: o próprio caminho).
+    """
+    source = file_path if source is None else source
+    image_size = ocr.image_size(source)
+    regions = layouts.regions(edital_name, json_data, image_size)
+    if regions is None:
+        return None, None, image_size
+    
+    with timed(timings, 'ocr'):
+        extracted_texts = ocr.recognize_regions(source, regions)
+    with timed(timings, 'matching'):
+        matches = find_matches_in_text(extracted_texts, json_data, threshold)
+    
+    if all(match['found'] for match in matches.values()):
+        print(f"🧩 {len(regions)} região(ões) do modelo de layout reconhecida(s)")
+        return extracted_texts, matches, image_size
+    
+    print("↩️ Campo fora das regiões do modelo de layout, refazendo o OCR da página inteira")
+    return None, None, image_size
+
+def merge_second_pass(matches, second_matches):
+    """Troca o match de um campo pelo da segunda passagem quando ela encontra o campo com mais confiança.
+
+    Um campo já encontrado só é trocado se o texto da segunda passagem casar
+    com o valor pelo menos tão bem quanto o da primeira.
+    """
+    for field, match in second_matches.items():
+        current = matches[field]
+        if match['found'] and (not current['found'] or (match['similarity'] >= current['similarity']
+                                                        and match['ocr_confidence'] > current['ocr_confidence'])):
+            match['pass'] = 2
+            matches[field] = match
+
+def pending_fields(matches, min_confidence):
+    """Campos não encontrados ou encontrados com confiança do OCR abaixo do mínimo"""
+    return [field for field, match in matches.items()
+            if not match['found'] or match['ocr_confidence'] < min_confidence]
+
+def ocr_adaptive(file_path, json_data, ocr, cache=None, pdf_dpi=PDF_RENDER_DPI, downscale=ADAPTIVE_DOWNSCALE,
+                 min_confidence=ADAPTIVE_MIN_CONFIDENCE, threshold=MATCH_THRESHOLD, timings=None, screener=None,
+                 page_stats=None, source=None):
+    """OCR em duas passagens: resolução reduzida em tudo, resolução original só onde faltou.
+
+    A primeira passagem usa a imagem reduzida por `downscale` (ou o PDF
+    renderizado a pdf_dpi * downscale). Campos não encontrados ou com
+    ocr_confidence abaixo de `min_confidence` vão para a segunda passagem, na
+    resolução original: nas imagens, só as regiões dos campos de baixa
+    confiança ou, se faltar algum campo, a imagem inteira; nos PDFs, só as
+    páginas desses campos ou, se faltar algum, as páginas em ordem até
+    encontrá-los. Cada match recebe 'pass' (1 ou 2) e cada linha da segunda
+    passagem 'pass': 2; caixas ficam sempre na resolução original. `source`
+    é a imagem já lida (padrão: o próprio caminho).
+
+    Retorna (textos extraídos, matches, resumo das passagens).
+    """
+    timings = timings if timings is not None else {}
+    is_pdf = file_path.lower().endswith('.pdf')
+    source = file_path if source is None else source
+    
+    # Primeira passagem: resolução reduzida
+    if is_pdf:
+        low_dpi = max(1, int(pdf_dpi * downscale))
+        extracted_texts = []
+        page_stats = page_stats if page_stats is not None else new_page_stats()
+        blank_pages = set()
+        total_pages = 0
+        for page_number, total_pages, image in timed_pages(iter_pdf_pages(file_path, low_dpi), timings):
+            blank_before = page_stats['em_branco']
+            page_texts = recognize_pdf_page(file_path, page_number, image, ocr, cache, low_dpi, timings,
+                                            screener, page_stats)
+            if page_stats['em_branco'] > blank_before:
+                blank_pages.add(page_number)
+            extracted_texts.extend(scale_boxes(page_texts, pdf_dpi / low_dpi))
+    else:
+        extracted_texts = None
+        if cache is not None:
+            with timed(timings, 'cache'):
+                cache_key = cache.make_key(file_path, scale=downscale)
+                extracted_texts = cache.get(cache_key)
+        if extracted_texts is None:
+            with timed(timings, 'ocr'):
+                extracted_texts = ocr.recognize_scaled(source, downscale)
+            if cache is not None:
+                with timed(timings, 'cache'):
+                    cache.put(cache_key, extracted_texts)
+    
+    with timed(timings, 'matching'):
+        matches = find_matches_in_text(extracted_texts, json_data, threshold)
+    for match in matches.values():
+        if match['found']:
+            match['pass'] = 1
+    
+    summary = {'downscale': downscale, 'second_pass': None, 'pages': []}
+    pending = pending_fields(matches, min_confidence)
+    if not pending:
+        return extracted_texts, matches, summary
+    
+    # Segunda passagem: resolução original, só para os campos pendentes
+    missing = any(not matches[field]['found'] for field in pending)
+    pending_json = {field: json_data[field] for field in pending}
+    second_texts = []
+    
+    if is_pdf:
+        if missing:
+            # Páginas descartadas pela triagem (em branco) não voltam ao OCR
+            pages = [n for n in range(1, total_pages + 1) if n not in blank_pages]
+        else:
+            pages = sorted({matches[field].get('page', 1) for field in pending})
+        summary['second_pass'] = 'paginas'
+        for page_number, _, image in timed_pages(iter_pdf_pages(file_path, pdf_dpi, pages), timings):
+            page_texts = recognize_pdf_page(file_path, page_number, image, ocr, cache, pdf_dpi, timings)
+            second_texts.extend(page_texts)
+            summary['pages'].append(page_number)
+            with timed(timings, 'matching'):
+                merge_second_pass(matches, find_matches_in_text(page_texts, pending_json, threshold))
+            still_pending = pending_fields({field: matches[field] for field in pending_json}, min_confidence)
+            pending_json = {field: json_data[field] for field in still_pending}
+            if not pending_json:
+                break
+    else:
+        boxes = [matches[field].get('box') for field in pending]
+        if missing or any(box is None for box in boxes):
+            summary['second_pass'] = 'imagem'
+            if cache is not None:
+                with timed(timings, 'cache'):
+                    full_key = cache.document_key(file_path)
+                    second_texts = cache.get(full_key)
+            if not second_texts:
+                with timed(timings, 'ocr'):
+                    second_texts = ocr.recognize(source)
+                if cache is not None:
+                    with timed(timings, 'cache'):
+                        cache.put(full_key, second_texts)
+        else:
+            summary['second_pass'] = 'regioes'
+            width, height = ocr.image_size(source)
+            regions = [expand_box(box, width, height) for box in boxes]
+            with timed(timings, 'ocr'):
+                second_texts = ocr.recognize_regions(source, regions)
+        with timed(timings, 'matching'):
+            merge_second_pass(matches, find_matches_in_text(second_texts, pending_json, threshold))
+    
+    for text_info in second_texts:
+        text_info['pass'] = 2
+    print(f"🔎 Segunda passagem ({summary['second_pass']}) para {len(pending)} campo(s); "
+          f"{sum(1 for match in matches.values() if match.get('pass') == 2)} resolvido(s) nela")
+    return merge_pass_texts(extracted_texts, second_texts), matches, summary
+
+def box_overlap(box, other):
+    """Interseção sobre união de duas caixas [x1, y1, x2, y2] (0 se não se tocam)"""
+    width = min(box[2], other[2]) - max(box[0], other[0])
+    height = min(box[3], other[3]) - max(box[1], other[1])
+    if width <= 0 or height <= 0:
+        return 0.0
+    intersection = width * height
+    area = (box[2] - box[0]) * (box[3] - box[1]) + (other[2] - other[0]) * (other[3] - other[1])
+    return intersection / (area - intersection)
+
+def merge_pass_texts(first_texts, second_texts, min_overlap=ADAPTIVE_DUPLICATE_IOU):
+    """Linhas da primeira passagem sem as que a segunda releu, seguidas das da segunda.
+
+    Uma linha da primeira passagem foi relida quando há, na mesma página, uma
+    linha da segunda com sobreposição (IoU) de pelo menos `min_overlap` ou,
+    sem caixas, com o mesmo texto normalizado; fica só a leitura da segunda
+    passagem, na resolução original.
+    """
+    second_by_page = defaultdict(list)
+    for other in second_texts:
+        second_by_page[other.get('page')].append(other)
+    
+    def reread(text_info):
+        for other in second_by_page.get(text_info.get('page'), ()):
+            if text_info.get('box') is not None and other.get('box') is not None:
+                if box_overlap(text_info['box'], other['box']) >= min_overlap:
+                    return True
+            elif normalize_text(text_info['text']) == normalize_text(other['text']):
+                return True
+        return False
+    
+    return [text_info for text_info in first_texts if not reread(text_info)] + second_texts
+
+def expand_box(box, width, height, margin=LAYOUT_MARGIN):
+    """Amplia a caixa em `margin` (fração da página) de cada lado, limitada à página"""
+    x1, y1, x2, y2 = box
+    return [max(0, int(x1 - margin * width)), max(0, int(y1 - margin * height)),
+            min(width, math.ceil(x2 + margin * width)), min(height, math.ceil(y2 + margin * height))]
+
+def found_match_confidence(matches):
+    """Confiança média do OCR nos campos encontrados (0 se nenhum foi encontrado)"""
+    confidences = [match['ocr_confidence'] for match in matches.values() if match['found']]
+    return sum(confidences) / len(confidences) if confidences else 0.0
+
+class OrientationPolicy:
+    """Política de orientação por edital: quando dá para dispensar o classificador de ângulo.
+
+    Documentos de um mesmo edital costumam ser digitalizados do mesmo jeito.
+    As primeiras `sample_pages` páginas de cada edital passam pelo OCR com o
+    classificador, contando as linhas que ele girou; se a fração de linhas
+    giradas ficar em até `max_rotated`, o edital é considerado em pé e os
+    demais documentos usam uma segunda instância do motor sem o classificador
+    (com chaves próprias no cache). Se a confiança média dos campos
+    encontrados sem o classificador ficar abaixo de `min_confidence`, o
+    documento é refeito com ele e, se melhorar, o edital volta a usá-lo.
+    O tempo economizado por documento é estimado pelo tempo de OCR por
+    página medido na amostra, menos o tempo real sem o classificador e o das
+    tentativas descartadas.
+    Com workers, cada processo decide sozinho; o arquivo salvo reúne todos
+    (cada documento é aprendido uma única vez).
+    """
+    
+    def __init__(self, path=None, engine_options=None, sample_pages=ORIENTATION_SAMPLE_PAGES,
+                 max_rotated=ORIENTATION_MAX_ROTATED, min_confidence=ORIENTATION_MIN_CONFIDENCE):
+        self.path = path
+        self.sample_pages = sample_pages
+        self.max_rotated = max_rotated
+        self.min_confidence = min_confidence
+        # Motor sem o classificador (None: o motor não tem classificador e a política não se aplica)
+        self.fast_engine_options = engine_options_without_angle_classifier(engine_options)
+        self._fast_ocr = None
+        self.editais = {}
+        if path and os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self.editais = json.load(f)
+    
+    def __getstate__(self):
+        # A segunda instância do motor é criada de novo em cada processo
+        state = self.__dict__.copy()
+        state['_fast_ocr'] = None
+        return state
+    
+    def state(self, edital_name):
+        return self.editais.setdefault(edital_name, {
+            'estado': 'amostragem', 'paginas': 0, 'linhas': 0, 'linhas_giradas': 0, 'segundos_ocr': 0.0,
+            'documentos': []
+        })
+    
+    def learn(self, result):
+        """Acumula a amostra de um documento (ou a volta do classificador) no estado do edital"""
+        orientation = result.get('orientation')
+        if orientation is None:
+            return
+        state = self.state(result['edital'])
+        if orientation['switched_back']:
+            state['estado'] = 'com_classificador'
+        if 'rotated_lines' not in orientation or state['estado'] != 'amostragem':
+            return
+        if result['file_path'] in state['documentos']:
+            return
+        
+        state['paginas'] += orientation['pages']
+        state['linhas'] += orientation['lines']
+        state['linhas_giradas'] += orientation['rotated_lines']
+        state['segundos_ocr'] += orientation['ocr_seconds']
+        state['documentos'].append(result['file_path'])
+        if state['paginas'] >= self.sample_pages:
+            rotated = state['linhas_giradas'] / state['linhas'] if state['linhas'] else 0.0
+            state['estado'] = 'sem_classificador' if rotated <= self.max_rotated else 'com_classificador'
+            action = "segue sem" if state['estado'] == 'sem_classificador' else "mantém"
+            print(f"🧭 Edital {result['edital']}: {rotated:.1%} das linhas giradas em {state['paginas']} "
+                  f"página(s) amostrada(s), {action} o classificador de ângulo")
+    
+    def process(self, file_path, json_data, ocr, edital_name, cache=None, **options):
+        """Processa o documento com ou sem o classificador de ângulo, conforme o estado do edital"""
+        if self.fast_engine_options is None:
+            return process_document(file_path, json_data, ocr, edital_name, cache=cache, **options)
+        
+        state = self.state(edital_name)
+        # Texto já no cache com o classificador: nada a economizar
+        use_classifier = state['estado'] != 'sem_classificador' or (
+            cache is not None and cache.has(cache.document_key(file_path)))
+        if use_classifier:
+            rotated_before = ocr.rotated_lines
+            result = process_document(file_path, json_data, ocr, edital_name, cache=cache, **options)
+            if 'ocr' in result['timings']:
+                result['orientation'] = self._summary(result, True, state)
+                if state['estado'] == 'amostragem':
+                    result['orientation']['lines'] = len(result['extracted_texts'])
+                    result['orientation']['rotated_lines'] = ocr.rotated_lines - rotated_before
+                self.learn(result)
+            return result
+        
+        if self._fast_ocr is None:
+            self._fast_ocr = LazyOCR(self.fast_engine_options)
+        fast_cache = cache.with_config(engine_config(self.fast_engine_options)) if cache is not None else None
+        result = process_document(file_path, json_data, self._fast_ocr, edital_name, cache=fast_cache, **options)
+        if 'ocr' not in result['timings']:
+            return result
+        
+        confidence = found_match_confidence(result['matches'])
+        if confidence >= self.min_confidence:
+            result['orientation'] = self._summary(result, False, state)
+            return result
+        
+        print(f"↩️ Confiança {confidence:.1%} sem o classificador de ângulo, refazendo o documento com ele")
+        retry = process_document(file_path, json_data, ocr, edital_name, cache=cache, **options)
+        if found_match_confidence(retry['matches']) > confidence:
+            # O classificador fez diferença: o edital volta a usá-lo
+            retry['orientation'] = self._summary(retry, True, state, discarded=result, switched_back=True)
+            self.learn(retry)
+            return retry
+        result['orientation'] = self._summary(result, False, state, discarded=retry)
+        return result
+    
+    def _summary(self, result, classifier, state, discarded=None, switched_back=False):
+        """Páginas, segundos de OCR e tempo economizado (estimado) do documento, com ou sem o classificador"""
+        pages = result.get('pages_processed') or document_page_count(result['file_path'])
+        saved = 0.0
+        if not classifier and state['paginas']:
+            saved = pages * state['segundos_ocr'] / state['paginas'] - result['timings']['ocr']
+        if discarded is not None:
+            result['timings']['orientacao_descartada'] = discarded['timings'].get('ocr', 0.0)
+            saved -= result['timings']['orientacao_descartada']
+        return {
+            'classifier': classifier,
+            'pages': pages,
+            'ocr_seconds': result['timings']['ocr'],
+            'saved_seconds': saved,
+            'switched_back': switched_back
+        }
+    
+    def save(self):
+        if self.path:
+            with open(self.path, 'w', encoding='utf-8') as f:
+                json.dump(self.editais, f, ensure_ascii=False, indent=2)
+
+def process_document(file_path, json_data, ocr, edital_name, cache=None, stream_pages=False, pdf_dpi=PDF_RENDER_DPI,
+                     threshold=MATCH_THRESHOLD, layouts=None, adaptive=False, downscale=ADAPTIVE_DOWNSCALE,
+                     min_confidence=ADAPTIVE_MIN_CONFIDENCE, screener=None, source=None, render_scale=None,
+                     max_pages=None, orientation=None):
+    """Processa um documento e verifica matches com os dados do JSON.
+
+    `source` é a entrada já lida pela leitura antecipada (imagem decodificada
+    ou caminho); sem ela, o OCR lê o próprio `file_path`. Com `render_scale`
+    (nova tentativa de um documento que derrubou o worker ou estourou o
+    orçamento de tempo), o documento é reconhecido em resolução reduzida e
+    sem cache: PDFs página a página a pdf_dpi * render_scale (só as
+    `max_pages` primeiras, se informado), imagens reduzidas pelo fator.
+    Com `orientation` (OrientationPolicy), a política do edital escolhe se o
+    documento passa pelo classificador de ângulo.
+    """
+    if orientation is not None and render_scale is None:
+        return orientation.process(file_path, json_data, ocr, edital_name, cache=cache, stream_pages=stream_pages,
+                                   pdf_dpi=pdf_dpi, threshold=threshold, layouts=layouts, adaptive=adaptive,
+                                   downscale=downscale, min_confidence=min_confidence, screener=screener,
+                                   source=source)
+    print(f"\n=== Processando: {file_path} (Edital: {edital_name}) ===")
+    source = file_path if source is None else source
+    
+    # Tempo (segundos) de cada etapa deste documento
+    timings = {}
+    
+    if render_scale is not None:
+        pages_processed = total_pages = None
+        if file_path.lower().endswith('.pdf'):
+            dpi = max(1, int(pdf_dpi * render_scale))
+            pages = range(1, max_pages + 1) if max_pages else None
+            extracted_texts = []
+            pages_processed = 0
+            for page_number, total_pages, image in timed_pages(iter_pdf_pages(file_path, dpi, pages), timings):
+                page_texts = recognize_pdf_page(file_path, page_number, image, ocr, None, dpi, timings)
+                extracted_texts.extend(scale_boxes(page_texts, pdf_dpi / dpi))
+                pages_processed += 1
+        else:
+            with timed(timings, 'ocr'):
+                extracted_texts = ocr.recognize_scaled(source, render_scale)
+        result = make_document_result(file_path, json_data, edital_name, extracted_texts, timings, threshold)
+        result['render_scale'] = render_scale
+        if max_pages and total_pages is not None and pages_processed < total_pages:
+            result['pages_processed'] = pages_processed
+            result['total_pages'] = total_pages
+        return result
+    # Páginas que a triagem (screener) dispensou do OCR
+    page_stats = new_page_stats() if screener is not None else None
+    
+    if stream_pages and file_path.lower().endswith('.pdf'):
+        extracted_texts, matches, pages_processed, total_pages = ocr_pdf_streaming(
+            file_path, json_data, ocr, cache=cache, dpi=pdf_dpi, threshold=threshold, timings=timings,
+            screener=screener, page_stats=page_stats
+        )
+        result = {
+            'file_path': file_path,
+            'edital': edital_name,
+            'json_data': json_data,
+            'extracted_texts': extracted_texts,
+            'matches': matches,
+            'threshold': threshold,
+            'pages_processed': pages_processed,
+            'total_pages': total_pages,
+            'timings': timings
+        }
+        if page_stats is not None:
+            result['page_screening'] = page_stats
+        return result
+    
+    # Triagem de PDF: as páginas são renderizadas aqui e ficam no cache uma a uma
+    screened_pdf = screener is not None and file_path.lower().endswith('.pdf')
+    
+    extracted_texts = None
+    if cache is not None and not screened_pdf:
+        with timed(timings, 'cache'):
+            cache_key = cache.document_key(file_path)
+            extracted_texts = cache.get(cache_key)
+        if extracted_texts is not None:
+            print("♻️ Texto extraído recuperado do cache")
+    
+    # Imagens de editais com modelo de layout: reconhece só as regiões dos campos
+    image_size = None
+    if layouts is not None and not file_path.lower().endswith('.pdf'):
+        if extracted_texts is None:
+            layout_texts, layout_matches, image_size = ocr_with_layout(file_path, json_data, ocr, edital_name,
+                                                                       layouts, threshold, timings, source)
+            if layout_texts is not None:
+                return {
+                    'file_path': file_path,
+                    'edital': edital_name,
+                    'json_data': json_data,
+                    'extracted_texts': layout_texts,
+                    'matches': layout_matches,
+                    'threshold': threshold,
+                    'layout': 'modelo',
+                    'timings': timings
+                }
+        else:
+            image_size = ocr.image_size(source)
+    
+    adaptive_summary = None
+    if extracted_texts is None and adaptive:
+        # Resolução adaptativa: primeira passagem reduzida, original só onde faltou
+        extracted_texts, matches, adaptive_summary = ocr_adaptive(
+            file_path, json_data, ocr, cache=cache, pdf_dpi=pdf_dpi, downscale=downscale,
+            min_confidence=min_confidence, threshold=threshold, timings=timings,
+            screener=screener, page_stats=page_stats, source=source
+        )
+    elif extracted_texts is None:
+        # Executa OCR (detecção + reconhecimento) e extrai texto e confiança
+        if screened_pdf:
+            # Triagem página a página: o PDF é renderizado aqui em vez de ir inteiro para o OCR
+            extracted_texts = []
+            for page_number, _, image in timed_pages(iter_pdf_pages(file_path, pdf_dpi), timings):
+                extracted_texts.extend(recognize_pdf_page(file_path, page_number, image, ocr, cache, pdf_dpi,
+                                                          timings, screener, page_stats))
+        elif screener is not None:
+            extracted_texts = recognize_screened(source, ocr, screener, page_stats=page_stats, timings=timings)
+        else:
+            with timed(timings, 'ocr'):
+                extracted_texts = ocr.recognize(source)
+        
+        # Texto com páginas dispensadas pela triagem não é o de um OCR completo: fica fora do cache
+        if cache is not None and not screened_pdf and not (page_stats and any(page_stats.values())):
+            with timed(timings, 'cache'):
+                cache.put(cache_key, extracted_texts)
+    
+    if adaptive_summary is not None:
+        result = make_document_result(file_path, json_data, edital_name, extracted_texts, timings, threshold, matches)
+        result['adaptive'] = adaptive_summary
+    else:
+        result = make_document_result(file_path, json_data, edital_name, extracted_texts, timings, threshold)
+    if page_stats is not None:
+        result['page_screening'] = page_stats
+    if image_size is not None:
+        # Documento completo: ensina o modelo de layout do edital
+        result['image_size'] = list(image_size)
+        result['layout'] = 'completo'
+        layouts.learn(result)
+    return result
+
+def read_document(file_path, ocr, cache=None):
+    """Etapa de leitura (threads de E/S): entrada do OCR para um documento.
+
+    Calcula o hash do conteúdo usado na chave do cache (memorizado no cache)
+    e, se o texto ainda não estiver lá, lê/decodifica o documento com
+    ocr.read_input. Falhas de leitura ficam para a etapa de OCR, que lê o
+    caminho original e reporta o erro como antes.
+    """
+    try:
+        if cache is not None and cache.has(cache.document_key(file_path)):
+            return file_path
+        return ocr.read_input(file_path)
+    except (OSError, ValueError, ImportError):
+        return file_path
+
+def prefetch_documents(tasks, ocr, cache=None, depth=PREFETCH_DEPTH, io_threads=IO_THREADS, idle=None):
+    """Lê os documentos à frente do OCR: produtor (threads de E/S) e consumidor (OCR).
+
+    Até `depth` documentos ficam em leitura adiante, numa fila FIFO; gera
+    (tarefa, entrada, segundos de espera) na ordem de `tasks`. A espera é o
+    tempo que o OCR ficou parado aguardando a leitura (E/S não escondida).
+    Com depth <= 0, gera (tarefa, None, None) e o OCR lê o caminho.
+    Enquanto espera uma leitura, chama `idle()`, que pode adiantar trabalho
+    do consumidor e retorna em quantos segundos quer ser chamado de novo
+    (None: só quando a leitura terminar); esse tempo não conta como espera.
+    """
+    if depth <= 0:
+        for task in tasks:
+            yield task, None, None
+        return
+    
+    def wait(task, future):
+        started = time.perf_counter()
+        busy = 0.0
+        while True:
+            timeout = None
+            if idle is not None:
+                idle_started = time.perf_counter()
+                timeout = idle()
+                busy += time.perf_counter() - idle_started
+            try:
+                source = future.result(timeout=timeout)
+                break
+            except FutureTimeoutError:
+                continue
+        return task, source, time.perf_counter() - started - busy
+    
+    with ThreadPoolExecutor(max_workers=max(1, io_threads)) as executor:
+        reads = deque()
+        for task in tasks:
+            reads.append((task, executor.submit(read_document, task[0], ocr, cache)))
+            if len(reads) > depth:
+                yield wait(*reads.popleft())
+        while reads:
+            yield wait(*reads.popleft())
+
+class OCRBatcher:
+    """Agrupa imagens de vários documentos em chamadas únicas de ocr.recognize_batch.
+
+    Cada imagem é enviada com uma chave (documento, página). O lote é
+    executado quando atinge `batch_size` itens ou quando o item mais antigo
+    espera há mais de `max_wait` segundos; os resultados voltam separados por
+    chave, na ordem de envio. O prazo é verificado a cada envio e em poll(),
+    que o consumidor chama entre as etapas (remaining diz quando chamar).
+    """
+    
+    def __init__(self, ocr, batch_size=OCR_BATCH_SIZE, max_wait=OCR_BATCH_MAX_WAIT):
+        self.ocr = ocr
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self._keys = []
+        self._inputs = []
+        self._first_submit = None
+    
+    def submit(self, key, image):
+        """Enfileira uma imagem (array ou caminho); retorna os itens concluídos, se o lote rodou"""
+        if not self._inputs:
+            self._first_submit = time.monotonic()
+        self._keys.append(key)
+        self._inputs.append(image)
+        
+        if len(self._inputs) >= self.batch_size:
+            return self.flush()
+        return self.poll()
+    
+    def remaining(self):
+        """Segundos até o prazo do lote pendente (None se não há lote)"""
+        if not self._inputs:
+            return None
+        return max(0.0, self._first_submit + self.max_wait - time.monotonic())
+    
+    def poll(self):
+        """Executa o lote pendente se o item mais antigo já esperou `max_wait`; retorna os itens concluídos"""
+        if self._inputs and self.remaining() == 0:
+            return self.flush()
+        return []
+    
+    def flush(self):
+        """Executa o lote pendente e retorna [(chave, textos extraídos, segundos), ...].
+
+        O tempo do lote é dividido igualmente entre as entradas.
+        """
+        if not self._inputs:
+            return []
+        
+        keys, inputs = self._keys, self._inputs
+        self._keys, self._inputs = [], []
+        
+        # Um resultado por entrada, na mesma ordem
+        start = time.perf_counter()
+        results = self.ocr.recognize_batch(inputs)
+        share = (time.perf_counter() - start) / len(inputs)
+        return [(key, texts, share) for key, texts in zip(keys, results)]
+
+def make_document_result(file_path, json_data, edital_name, extracted_texts, timings=None, threshold=MATCH_THRESHOLD,
+                         matches=None):
+    """Monta o resultado de um documento a partir do texto já extraído (e dos matches, se já calculados)"""
+    timings = timings if timings is not None else {}
+    if matches is None:
+        with timed(timings, 'matching'):
+            matches = find_matches_in_text(extracted_texts, json_data, threshold)
+    
+    return {
+        'file_path': file_path,
+        'edital': edital_name,
+        'json_data': json_data,
+        'extracted_texts': extracted_texts,
+        'matches': matches,
+        'threshold': threshold,
+        'timings': timings
+    }
+
+def process_documents_batched(tasks, ocr, cache=None, batch_size=OCR_BATCH_SIZE, max_wait=OCR_BATCH_MAX_WAIT,
+                              stream_pages=False, pdf_dpi=PDF_RENDER_DPI, threshold=MATCH_THRESHOLD, layouts=None,
+                              adaptive=False, downscale=ADAPTIVE_DOWNSCALE, min_confidence=ADAPTIVE_MIN_CONFIDENCE,
+                              screener=None, prefetch=0, orientation=None):
+    """Processa documentos enviando imagens e páginas de PDF ao OCR em micro-batches.
+
+    Gera os resultados na ordem de `tasks`, com o mesmo formato de
+    process_document; só ficam retidos os documentos concluídos fora de ordem
+    dentro dos lotes em andamento. PDFs no modo --stream-pages continuam sendo
+    processados individualmente (a parada antecipada depende dos matches
+    página a página), assim como todos os documentos no modo `adaptive`
+    (a segunda passagem depende dos matches da primeira). Modelos de layout
+    (`layouts`) e a política de orientação (`orientation`) não são usados
+    aqui: as imagens vão inteiras para o lote, com o motor configurado.
+    Com `screener`, as páginas de PDF passam pela triagem antes de entrar no
+    lote; imagens avulsas seguem direto para o OCR. Com `prefetch`, as imagens
+    chegam ao lote já decodificadas pela leitura antecipada.
+    """
+    batcher = OCRBatcher(ocr, batch_size, max_wait)
+    ready = {}             # índice do documento -> resultado concluído, aguardando a vez
+    next_index = 0
+    pages_by_doc = {}      # índice do documento -> {página: textos}
+    pending_pages = {}     # índice do documento -> páginas ainda sem resultado
+    cache_keys = {}        # índice do documento -> chave do cache das imagens
+    page_cache_keys = {}   # (documento, página) -> chave do cache da página de PDF enviada ao lote
+    timings_by_doc = {}    # índice do documento -> tempos por etapa
+    page_hashes = {}       # (documento, página) -> hash da página nova enviada ao lote
+    stats_by_doc = {}      # índice do documento -> contadores da triagem
+    
+    def finish(doc_index, result):
+        ready[doc_index] = result
+    
+    def drain():
+        nonlocal next_index
+        while next_index in ready:
+            yield ready.pop(next_index)
+            next_index += 1
+    
+    def complete(done):
+        for (doc_index, page_number), page_texts, seconds in done:
+            timings = timings_by_doc[doc_index]
+            timings['ocr'] = timings.get('ocr', 0.0) + seconds
+            if (doc_index, page_number) in page_hashes:
+                screener.remember(page_hashes.pop((doc_index, page_number)), page_texts)
+            if page_number is not None:
+                for text_info in page_texts:
+                    text_info['page'] = page_number
+            page_key = page_cache_keys.pop((doc_index, page_number), None)
+            if page_key is not None:
+                with timed(timings, 'cache'):
+                    cache.put(page_key, page_texts)
+            pages_by_doc[doc_index][page_number] = page_texts
+            pending_pages[doc_index] -= 1
+            
+            if pending_pages[doc_index] == 0:
+                file_path, json_data, edital_name = tasks[doc_index]
+                pages = pages_by_doc.pop(doc_index)
+                extracted_texts = [text_info for page in sorted(pages, key=lambda n: n or 0) for text_info in pages[page]]
+                cache_key = cache_keys.pop(doc_index, None)
+                if cache_key is not None:
+                    with timed(timings, 'cache'):
+                        cache.put(cache_key, extracted_texts)
+                result = make_document_result(file_path, json_data, edital_name, extracted_texts,
+                                              timings_by_doc.pop(doc_index), threshold)
+                if doc_index in stats_by_doc:
+                    result['page_screening'] = stats_by_doc.pop(doc_index)
+                finish(doc_index, result)
+    
+    def idle():
+        # Enquanto a leitura antecipada não chega, o lote pendente não passa do prazo
+        complete(batcher.poll())
+        return batcher.remaining()
+    
+    for doc_index, (task, source, waited) in enumerate(prefetch_documents(tasks, ocr, cache, prefetch, idle=idle)):
+        file_path, json_data, edital_name = task
+        complete(batcher.poll())
+        yield from drain()
+        
+        is_pdf = file_path.lower().endswith('.pdf')
+        if (stream_pages and is_pdf) or adaptive:
+            # Documento processado à parte: o lote pendente não espera por ele
+            complete(batcher.flush())
+            result = process_document(file_path, json_data, ocr, edital_name, cache=cache,
+                                      stream_pages=stream_pages, pdf_dpi=pdf_dpi, threshold=threshold,
+                                      adaptive=adaptive, downscale=downscale,
+                                      min_confidence=min_confidence, screener=screener, source=source)
+            if waited is not None:
+                result['timings']['leitura'] = waited
+            finish(doc_index, result)
+            continue
+        
+        print(f"\n=== Processando: {file_path} (Edital: {edital_name}) ===")
+        timings = timings_by_doc[doc_index] = {}
+        if waited is not None:
+            timings['leitura'] = waited
+        
+        if cache is not None and not is_pdf:
+            with timed(timings, 'cache'):
+                cache_keys[doc_index] = cache.document_key(file_path)
+                extracted_texts = cache.get(cache_keys[doc_index])
+            if extracted_texts is not None:
+                print("♻️ Texto extraído recuperado do cache")
+                del cache_keys[doc_index]
+                finish(doc_index, make_document_result(file_path, json_data, edital_name, extracted_texts,
+                                                       timings_by_doc.pop(doc_index), threshold))
+                continue
+        
+        pages_by_doc[doc_index] = {}
+        if is_pdf:
+            # Páginas do PDF entram no lote uma a uma, já renderizadas
+            pending_pages[doc_index] = None
+            pages = iter_pdf_pages(file_path, pdf_dpi)
+            while True:
+                complete(batcher.poll())
+                with timed(timings, 'rasterizacao'):
+                    page = next(pages, None)
+                if page is None:
+                    break
+                page_number, total_pages, image = page
+                if pending_pages[doc_index] is None:
+                    pending_pages[doc_index] = total_pages
+                if cache is not None:
+                    # Mesma chave por página e dpi de recognize_pdf_page
+                    with timed(timings, 'cache'):
+                        page_key = cache.make_key(file_path, page=page_number, dpi=pdf_dpi)
+                        page_texts = cache.get(page_key)
+                    if page_texts is not None:
+                        complete([((doc_index, page_number), page_texts, 0.0)])
+                        continue
+                    page_cache_keys[(doc_index, page_number)] = page_key
+                if screener is not None:
+                    page_stats = stats_by_doc.setdefault(doc_index, new_page_stats())
+                    with timed(timings, 'triagem'):
+                        status, page_hash, lines = screener.screen(image)
+                    if status != 'nova':
+                        # Página em branco ou repetida: conclui sem passar pelo OCR (nem ir para o cache)
+                        page_stats[status] += 1
+                        page_cache_keys.pop((doc_index, page_number), None)
+                        complete([((doc_index, page_number), lines or [], 0.0)])
+                        continue
+                    page_hashes[(doc_index, page_number)] = page_hash
+                complete(batcher.submit((doc_index, page_number), image))
+            
+            if pending_pages[doc_index] is None:
+                # PDF sem páginas: conclui com texto vazio
+                pending_pages[doc_index] = 1
+                complete([((doc_index, None), [], 0.0)])
+        else:
+            # Imagens vão pelo caminho (a leitura fica com o PaddleOCR) ou já decodificadas
+            pending_pages[doc_index] = 1
+            complete(batcher.submit((doc_index, None), file_path if source is None else source))
+    
+    complete(batcher.flush())
+    yield from drain()
+
+def calculate_edital_stats(results_by_edital):
+    """Calcula estatísticas por edital"""
+    edital_stats = {}
+    
+    for edital_name, results in results_by_edital.items():
+        total_documents = len(results)
+        total_fields = sum(len(result['matches']) for result in results)
+        total_found = sum(sum(1 for match in result['matches'].values() if match['found']) for result in results)
+        
+        success_rate = (total_found / total_fields * 100) if total_fields > 0 else 0
+        
+        edital_stats[edital_name] = {
+            'total_documents': total_documents,
+            'total_fields': total_fields,
+            'fields_found': total_found,
+            'success_rate': success_rate,
+            'results': results
+        }
+    
+    return edital_stats
+
+def new_edital_stats(edital_names):
+    """Contadores por edital zerados, no mesmo formato de calculate_edital_stats (sem 'results')"""
+    return {
+        edital_name: {'total_documents': 0, 'total_fields': 0, 'fields_found': 0, 'success_rate': 0}
+        for edital_name in edital_names
+    }
+
+def add_result_to_stats(edital_stats, result):
+    """Acumula um documento nos contadores do seu edital"""
+    stats = edital_stats[result['edital']]
+    stats['total_documents'] += 1
+    stats['total_fields'] += len(result['matches'])
+    stats['fields_found'] += sum(1 for match in result['matches'].values() if match['found'])
+    stats['success_rate'] = (stats['fields_found'] / stats['total_fields'] * 100) if stats['total_fields'] > 0 else 0
+    
+    # Política de orientação: páginas e segundos de OCR com e sem o classificador de ângulo
+    orientation = result.get('orientation')
+    if orientation is not None:
+        counters = stats.setdefault('orientation', {
+            'pages_with_classifier': 0, 'seconds_with_classifier': 0.0,
+            'pages_without_classifier': 0, 'seconds_without_classifier': 0.0, 'saved_seconds': 0.0
+        })
+        suffix = 'with_classifier' if orientation['classifier'] else 'without_classifier'
+        counters[f'pages_{suffix}'] += orientation['pages']
+        counters[f'seconds_{suffix}'] += orientation['ocr_seconds']
+        counters['saved_seconds'] += orientation['saved_seconds']
+
+def parse_thresholds(value):
+    """Lê a lista de thresholds: valores separados por vírgula e/ou intervalos início:fim:passo (fim incluído)"""
+    thresholds = set()
+    try:
+        for part in value.split(','):
+            if ':' not in part:
+                thresholds.add(float(part))
+                continue
+            start, stop, step = (Decimal(number) for number in part.split(':'))
+            if step <= 0:
+                raise ValueError
+            # Decimal evita que o acúmulo do passo em float pule o fim do intervalo
+            while start <= stop:
+                thresholds.add(float(start))
+                start += step
+    except (ValueError, InvalidOperation):
+        raise argparse.ArgumentTypeError(f"thresholds inválidos: {value!r} (ex.: 0.6,0.7 ou 0.5:0.95:0.05)")
+    if not thresholds or not all(0 <= threshold <= 1 for threshold in thresholds):
+        raise argparse.ArgumentTypeError(f"os thresholds precisam estar entre 0 e 1: {value!r}")
+    return sorted(thresholds)
+
+class ThresholdSweep:
+    """Scores de todos os campos de uma coleção, para avaliar vários thresholds de uma vez.
+
+    Cada documento contribui com o melhor score de cada campo (TextMatcher.best_scores),
+    calculado uma única vez. Os scores ficam em arrays NumPy (float64, para que
+    a comparação com o threshold seja exatamente a de find_matches) junto com o
+    índice do edital de cada campo.
+    """
+    
+    def __init__(self, edital_names):
+        self.edital_names = list(edital_names)
+        self._edital_index = {edital_name: i for i, edital_name in enumerate(self.edital_names)}
+        self.documents = [0] * len(self.edital_names)
+        self._scores = array.array('d')
+        self._editais = array.array('i')
+    
+    def add(self, edital_name, extracted_texts, json_data):
+        """Calcula e guarda os scores dos campos de um documento"""
+        index = self._edital_index[edital_name]
+        scores = TextMatcher(extracted_texts).best_scores(json_data)
+        self.documents[index] += 1
+        self._scores.extend(scores)
+        self._editais.extend([index] * len(scores))
+    
+    def evaluate(self, thresholds):
+        """Contadores por edital para cada threshold, no formato de calculate_edital_stats (sem 'results')"""
+        import numpy as np
+        
+        scores = np.frombuffer(self._scores, dtype=np.float64)
+        editais = np.frombuffer(self._editais, dtype=np.intc)
+        thresholds = np.asarray(thresholds, dtype=np.float64)
+        
+        # Scores ordenados por edital: campos encontrados com o threshold t são os de score > t,
+        # contados de uma vez para todos os thresholds com searchsorted
+        order = np.lexsort((scores, editais))
+        scores, editais = scores[order], editais[order]
+        bounds = np.searchsorted(editais, np.arange(len(self.edital_names) + 1))
+        
+        stats_by_threshold = [{} for _ in thresholds]
+        for i, edital_name in enumerate(self.edital_names):
+            edital_scores = scores[bounds[i]:bounds[i + 1]]
+            found = len(edital_scores) - np.searchsorted(edital_scores, thresholds, side='right')
+            for stats, fields_found in zip(stats_by_threshold, found.tolist()):
+                total_fields = len(edital_scores)
+                stats[edital_name] = {
+                    'total_documents': self.documents[i],
+                    'total_fields': total_fields,
+                    'fields_found': fields_found,
+                    'success_rate': (fields_found / total_fields * 100) if total_fields > 0 else 0
+                }
+        return stats_by_threshold
+
+def pdf_available():
+    """Indica se o reportlab está instalado (sem importá-lo)"""
+    return importlib.util.find_spec('reportlab') is not None
+
+def create_header_footer(canvas, doc):
+    """Cria cabeçalho e rodapé personalizados para o PDF"""
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.units import inch
+    from reportlab.lib import colors
+    
+    canvas.saveState()
+    
+    # Cabeçalho
+    canvas.setFont('Helvetica-Bold', 10)
+    canvas.setFillColor(colors.darkblue)
+    canvas.drawString(inch, A4[1] - 0.5*inch, "Relatório de Processamento OCR")
+    
+    # Rodapé
+    canvas.setFont('Helvetica', 8)
+    canvas.setFillColor(colors.grey)
+    canvas.drawString(inch, 0.5*inch, f"Gerado em: {datetime.now().strftime('%d/%m/%Y às %H:%M:%S')}")
+    canvas.drawRightString(A4[0] - inch, 0.5*inch, f"Página {doc.page}")
+    
+    canvas.restoreState()
+
+def pdf_report_styles():
+    """Estilos do relatório PDF"""
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib import colors
+    from reportlab.lib.enums import TA_CENTER, TA_LEFT
+    
+    # Configura estilos
+    styles = getSampleStyleSheet()
+    
+    # Estilos customizados
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Title'],
+        fontSize=24,
+        spaceAfter=30,
+        alignment=TA_CENTER,
+        textColor=colors.darkblue
+    )
+    
+    subtitle_style = ParagraphStyle(
+        'CustomSubtitle',
+        parent=styles['Heading1'],
+        fontSize=18,
+        spaceAfter=20,
+        alignment=TA_CENTER,
+        textColor=colors.darkgreen
+    )
+    
+    section_style = ParagraphStyle(
+        'SectionHeader',
+        parent=styles['Heading2'],
+        fontSize=14,
+        spaceAfter=12,
+        spaceBefore=20,
+        textColor=colors.darkblue,
+        borderWidth=1,
+        borderColor=colors.darkblue,
+        borderPadding=5
+    )
+    
+    normal_style = ParagraphStyle(
+        'CustomNormal',
+        parent=styles['Normal'],
+        fontSize=11,
+        spaceAfter=6,
+        alignment=TA_LEFT
+    )
+    
+    return {'title': title_style, 'subtitle': subtitle_style, 'section': section_style, 'normal': normal_style}
+
+def pdf_document(output_path):
+    """Documento A4 com as margens do relatório"""
+    from reportlab.lib.pagesizes import A4
+    from reportlab.platypus import SimpleDocTemplate
+    from reportlab.lib.units import inch
+    
+    return SimpleDocTemplate(
+        output_path,
+        pagesize=A4,
+        rightMargin=inch,
+        leftMargin=inch,
+        topMargin=1.2*inch,
+        bottomMargin=inch
+    )
+
+def pdf_report_totals(json_data):
+    """Totais de documentos, campos e campos encontrados de todos os editais, e a taxa geral"""
+    total_documentos = 0
+    total_campos = 0
+    total_encontrados = 0
+    
+    for stats in json_data['estatisticas_por_edital'].values():
+        total_documentos += stats['total_documentos']
+        total_campos += stats['total_campos']
+        total_encontrados += stats['campos_encontrados']
+    
+    taxa_geral = (total_encontrados / total_campos * 100) if total_campos > 0 else 0
+    return total_documentos, total_campos, total_encontrados, taxa_geral
+
+def pdf_summary_story(json_data, styles):
+    """Título, tabela de resumo geral e tabela com as estatísticas de cada edital"""
+    from reportlab.platypus import Paragraph, Spacer, Table, TableStyle
+    from reportlab.lib.units import inch
+    from reportlab.lib import colors
+    
+    title_style = styles['title']
+    section_style = styles['section']
+    
+    # Lista para armazenar os elementos do PDF
+    story = []
+    
+    # Título principal
+    title = Paragraph("Relatório de Processamento OCR", title_style)
+    story.append(title)
+    story.append(Spacer(1, 20))
+    
+    # Tabela de resumo geral
+    resumo_data = [
+        ['Métrica', 'Valor'],
+        ['Data de Processamento', json_data['data_processamento']],
+        ['Total de Editais', str(json_data['total_editais'])],
+        ['Total de Documentos', str(json_data['total_documentos'])],
+    ]
+    
+    resumo_table = Table(resumo_data, colWidths=[3*inch, 2*inch])
+    resumo_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.darkblue),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 12),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black)
+    ]))
+    
+    story.append(resumo_table)
+    story.append(Spacer(1, 30))
+    
+    # Seção de análise por edital
+    section_header = Paragraph("Análise Detalhada por Edital", section_style)
+    story.append(section_header)
+    
+    # Cria tabela com estatísticas detalhadas
+    stats_data = [['Edital', 'Documentos', 'Campos Total', 'Campos Encontrados', 'Taxa de Sucesso']]
+    
+    for edital_name, stats in json_data['estatisticas_por_edital'].items():
+        stats_data.append([
             stats['nome_edital'],
             str(stats['total_documentos']),
             str(stats['total_campos']),
             str(stats['campos_encontrados']),
             stats['taxa_sucesso_percentual']
         ])
-        
-        total_documentos += stats['total_documentos']
-        total_campos += stats['total_campos']
-        total_encontrados += stats['campos_encontrados']
     
     # Linha de totais
-    taxa_geral = (total_encontrados / total_campos * 100) if total_campos > 0 else 0
+    total_documentos, total_campos, total_encontrados, taxa_geral = pdf_report_totals(json_data)
     stats_data.append([
         'TOTAL GERAL',
         str(total_documentos),
@@ -329,56 +2148,71 @@ def generate_pdf_report(json_data, output_path):
     story.append(stats_table)
     story.append(Spacer(1, 20))
     
-    # Análise individual por edital
-    for edital_name, stats in json_data['estatisticas_por_edital'].items():
-        story.append(PageBreak())
-        
-        # Título do edital
-        edital_title = Paragraph(f"Análise: {stats['nome_edital']}", subtitle_style)
-        story.append(edital_title)
-        story.append(Spacer(1, 15))
-        
-        # Informações detalhadas do edital
-        info_text = f"""
-        <b>Resumo do Edital:</b><br/>
-        • Nome: {stats['nome_edital']}<br/>
-        • Total de documentos processados: {stats['total_documentos']}<br/>
-        • Total de campos analisados: {stats['total_campos']}<br/>
-        • Campos encontrados com sucesso: {stats['campos_encontrados']}<br/>
-        • Taxa de sucesso: {stats['taxa_sucesso_percentual']}<br/><br/>
-        
-        <b>Interpretação dos Resultados:</b><br/>
-        """
-        
-        # Adiciona interpretação baseada na taxa de sucesso
-        taxa_decimal = stats['taxa_sucesso_decimal']
-        if taxa_decimal >= 0.9:
-            interpretacao = "Excelente! A taxa de sucesso indica um processamento muito eficiente dos documentos."
-        elif taxa_decimal >= 0.7:
-            interpretacao = "Bom! A maioria dos campos foi identificada corretamente, mas há espaço para melhorias."
-        elif taxa_decimal >= 0.5:
-            interpretacao = "Moderado. Cerca de metade dos campos foi identificada. Recomenda-se revisar a qualidade das imagens."
-        else:
-            interpretacao = "Baixo. A taxa de sucesso indica possíveis problemas na qualidade das imagens ou na configuração do OCR."
-        
-        info_text += f"• {interpretacao}<br/><br/>"
-        
-        # Recomendações
-        info_text += "<b>Recomendações:</b><br/>"
-        if taxa_decimal < 0.7:
-            info_text += "• Verificar a qualidade e resolução das imagens<br/>"
-            info_text += "• Considerar pré-processamento das imagens<br/>"
-            info_text += "• Revisar os padrões de busca utilizados<br/>"
-        else:
-            info_text += "• Manter o padrão atual de processamento<br/>"
-            info_text += "• Considerar otimizações pontuais nos campos não encontrados<br/>"
-        
-        info_paragraph = Paragraph(info_text, normal_style)
-        story.append(info_paragraph)
-        story.append(Spacer(1, 20))
+    return story
+
+def pdf_edital_story(stats, styles):
+    """Seção de análise de um edital (sem a quebra de página que a antecede)"""
+    from reportlab.platypus import Paragraph, Spacer
+    
+    subtitle_style = styles['subtitle']
+    normal_style = styles['normal']
+    story = []
+    
+    # Título do edital
+    edital_title = Paragraph(f"Análise: {stats['nome_edital']}", subtitle_style)
+    story.append(edital_title)
+    story.append(Spacer(1, 15))
+    
+    # Informações detalhadas do edital
+    info_text = f"""
+    <b>Resumo do Edital:</b><br/>
+    • Nome: {stats['nome_edital']}<br/>
+    • Total de documentos processados: {stats['total_documentos']}<br/>
+    • Total de campos analisados: {stats['total_campos']}<br/>
+    • Campos encontrados com sucesso: {stats['campos_encontrados']}<br/>
+    • Taxa de sucesso: {stats['taxa_sucesso_percentual']}<br/><br/>
+    
+    <b>Interpretação dos Resultados:</b><br/>
+    """
+    
+    # Adiciona interpretação baseada na taxa de sucesso
+    taxa_decimal = stats['taxa_sucesso_decimal']
+    if taxa_decimal >= 0.9:
+        interpretacao = "Excelente! A taxa de sucesso indica um processamento muito eficiente dos documentos."
+    elif taxa_decimal >= 0.7:
+        interpretacao = "Bom! A maioria dos campos foi identificada corretamente, mas há espaço para melhorias."
+    elif taxa_decimal >= 0.5:
+        interpretacao = "Moderado. Cerca de metade dos campos foi identificada. Recomenda-se revisar a qualidade das imagens."
+    else:
+        interpretacao = "Baixo. A taxa de sucesso indica possíveis problemas na qualidade das imagens ou na configuração do OCR."
+    
+    info_text += f"• {interpretacao}<br/><br/>"
+    
+    # Recomendações
+    info_text += "<b>Recomendações:</b><br/>"
+    if taxa_decimal < 0.7:
+        info_text += "• Verificar a qualidade e resolução das imagens<br/>"
+        info_text += "• Considerar pré-processamento das imagens<br/>"
+        info_text += "• Revisar os padrões de busca utilizados<br/>"
+    else:
+        info_text += "• Manter o padrão atual de processamento<br/>"
+        info_text += "• Considerar otimizações pontuais nos campos não encontrados<br/>"
+    
+    info_paragraph = Paragraph(info_text, normal_style)
+    story.append(info_paragraph)
+    story.append(Spacer(1, 20))
+    
+    return story
+
+def pdf_conclusion_story(json_data, styles):
+    """Conclusões e recomendações gerais (sem a quebra de página que as antecede)"""
+    from reportlab.platypus import Paragraph
+    
+    subtitle_style = styles['subtitle']
+    normal_style = styles['normal']
+    _, total_campos, total_encontrados, taxa_geral = pdf_report_totals(json_data)
+    story = []
     
-    # Conclusões e recomendações gerais
-    story.append(PageBreak())
     conclusion_title = Paragraph("Conclusões e Recomendações Gerais", subtitle_style)
     story.append(conclusion_title)
     
@@ -413,81 +2247,1204 @@ def generate_pdf_report(json_data, output_path):
     conclusion_paragraph = Paragraph(conclusion_text, normal_style)
     story.append(conclusion_paragraph)
     
+    return story
+
+# Páginas de cada parte do relatório PDF paralelo (-1 enquanto a parte não foi
+# paginada, _PDF_PART_FAILED se ela falhou) e condição que avisa quando uma
+# parte publica o seu total; herdadas pelos processos do pool em _init_pdf_worker
+_PDF_PART_FAILED = -2
+_pdf_part_pages = None
+_pdf_part_pages_ready = None
+
+def _init_pdf_worker(part_pages, part_pages_ready):
+    """Inicializa um processo do relatório PDF paralelo com as páginas compartilhadas das partes"""
+    global _pdf_part_pages, _pdf_part_pages_ready
+    _pdf_part_pages = part_pages
+    _pdf_part_pages_ready = part_pages_ready
+
+def _pdf_part_canvas(index):
+    """Canvas que adia cabeçalho e rodapé de cada página até saber onde a parte `index` começa.
+
+    As páginas ficam guardadas até o save(): aí a parte publica quantas
+    páginas tem, espera o total das partes anteriores e só então desenha
+    create_header_footer com a numeração do documento inteiro.
+    """
+    from reportlab.pdfgen.canvas import Canvas
+    
+    class PartCanvas(Canvas):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self._saved_pages = []
+        
+        def showPage(self):
+            self._saved_pages.append(dict(self.__dict__))
+            self._startPage()
+        
+        def save(self):
+            with _pdf_part_pages_ready:
+                _pdf_part_pages[index] = len(self._saved_pages)
+                _pdf_part_pages_ready.notify_all()
+                # As partes anteriores foram enviadas antes ao pool: nunca esperam por esta
+                previous = lambda: _pdf_part_pages[:index]
+                _pdf_part_pages_ready.wait_for(
+                    lambda: _PDF_PART_FAILED in previous() or min(previous(), default=0) >= 0
+                )
+                if _PDF_PART_FAILED in previous():
+                    raise RuntimeError("parte anterior do relatório PDF falhou")
+                first_page = sum(previous()) + 1
+            
+            for page_number, state in enumerate(self._saved_pages, first_page):
+                self.__dict__.update(state)
+                create_header_footer(self, SimpleNamespace(page=page_number))
+                Canvas.showPage(self)
+            Canvas.save(self)
+    
+    return PartCanvas
+
+def _render_pdf_part(path, index, part, data):
+    """Renderiza a parte `index` do relatório ('resumo', 'editais' ou 'conclusao') num PDF próprio"""
+    from reportlab.platypus import PageBreak
+    
+    try:
+        styles = pdf_report_styles()
+        if part == 'resumo':
+            story = pdf_summary_story(data, styles)
+        elif part == 'conclusao':
+            story = pdf_conclusion_story(data, styles)
+        else:
+            # Cada edital começa numa página nova; o primeiro já abre a parte
+            story = []
+            for stats in data:
+                if story:
+                    story.append(PageBreak())
+                story.extend(pdf_edital_story(stats, styles))
+        
+        pdf_document(path).build(story, canvasmaker=_pdf_part_canvas(index))
+    except BaseException:
+        # Publica a falha para as partes seguintes não esperarem para sempre
+        with _pdf_part_pages_ready:
+            if _pdf_part_pages[index] < 0:
+                _pdf_part_pages[index] = _PDF_PART_FAILED
+            _pdf_part_pages_ready.notify_all()
+        raise
+    return path
+
+def concatenate_pdfs(paths, output_path):
+    """Junta PDFs, na ordem, num único arquivo (pypdfium2)"""
+    import pypdfium2 as pdfium
+    
+    merged = pdfium.PdfDocument.new()
+    for path in paths:
+        part = pdfium.PdfDocument(path)
+        merged.import_pages(part)
+        part.close()
+    merged.save(output_path)
+    merged.close()
+
+def generate_pdf_report(json_data, output_path, workers=PDF_REPORT_WORKERS, chunk_editais=PDF_REPORT_CHUNK_EDITAIS):
+    """Gera relatório PDF completo baseado nos dados do JSON.
+
+    Com muitos editais (mais que chunk_editais) e o pypdfium2 instalado, o
+    resumo, as seções dos editais (em blocos de chunk_editais) e as
+    conclusões são renderizados em paralelo, em PDFs separados, e depois
+    concatenados. A numeração das páginas (create_header_footer) continua
+    a do documento inteiro: cada parte espera o total de páginas das
+    anteriores antes de desenhar cabeçalho e rodapé.
+    """
+    if not pdf_available():
+        print("❌ Não foi possível gerar PDF - bibliotecas não instaladas")
+        return None
+    
+    editais = list(json_data['estatisticas_por_edital'].values())
+    if workers > 1 and len(editais) > chunk_editais and importlib.util.find_spec('pypdfium2') is not None:
+        parts = [('resumo', json_data)]
+        parts += [('editais', editais[start:start + chunk_editais]) for start in range(0, len(editais), chunk_editais)]
+        parts.append(('conclusao', json_data))
+        
+        part_pages = multiprocessing.Array('i', [-1] * len(parts), lock=False)
+        part_pages_ready = multiprocessing.Condition()
+        with tempfile.TemporaryDirectory(prefix='relatorio_pdf_') as temp_dir:
+            part_paths = [os.path.join(temp_dir, f"parte_{i:05d}.pdf") for i in range(len(parts))]
+            executor = ProcessPoolExecutor(max_workers=min(workers, len(parts)), initializer=_init_pdf_worker,
+                                           initargs=(part_pages, part_pages_ready))
+            try:
+                list(executor.map(_render_pdf_part, part_paths, range(len(parts)), *zip(*parts)))
+            finally:
+                # Na falha de uma parte, as que nem começaram são descartadas e a exceção original sobe
+                executor.shutdown(cancel_futures=True)
+            concatenate_pdfs(part_paths, output_path)
+        return output_path
+    
+    from reportlab.platypus import PageBreak
+    
+    styles = pdf_report_styles()
+    story = pdf_summary_story(json_data, styles)
+    
+    # Análise individual por edital
+    for stats in editais:
+        story.append(PageBreak())
+        story.extend(pdf_edital_story(stats, styles))
+    
+    # Conclusões e recomendações gerais
+    story.append(PageBreak())
+    story.extend(pdf_conclusion_story(json_data, styles))
+    
     # Constrói o PDF
-    doc.build(story, onFirstPage=create_header_footer, onLaterPages=create_header_footer)
+    pdf_document(output_path).build(story, onFirstPage=create_header_footer, onLaterPages=create_header_footer)
     
     return output_path
 
-# Inicializa OCR
-ocr = PaddleOCR(use_angle_cls=True, lang='pt')
+def load_image(source):
+    """Carrega uma imagem BGR (arrays já renderizados passam direto)"""
+    if not isinstance(source, str):
+        return source
+    import cv2
+    
+    image = cv2.imread(source)
+    if image is None:
+        raise ValueError(f"Não foi possível ler a imagem: {source}")
+    return image
+
+def read_file(file_path, chunk_size=1024 * 1024):
+    """Lê o arquivo inteiro e descarta o conteúdo (o próximo acesso sai do cache do sistema)"""
+    with open(file_path, 'rb') as f:
+        while f.read(chunk_size):
+            pass
+
+def downscale_image(image, factor):
+    """Reduz a imagem pelo fator (0 < factor <= 1)"""
+    import cv2
+    
+    height, width = image.shape[:2]
+    size = (max(1, int(width * factor)), max(1, int(height * factor)))
+    return cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+
+def scale_boxes(lines, factor):
+    """Multiplica as caixas das linhas pelo fator (converte entre resoluções)"""
+    for line in lines:
+        if line.get('box') is not None:
+            line['box'] = [int(round(value * factor)) for value in line['box']]
+    return lines
+
+class OCREngine:
+    """Interface dos motores de OCR usados pelo pipeline.
+
+    recognize recebe o caminho de um documento (imagem ou PDF inteiro) ou uma
+    imagem já renderizada (array BGR) e retorna as linhas reconhecidas, na
+    ordem de leitura, como dicionários com 'text', 'confidence' e, quando o
+    motor informa, 'box' ([x1, y1, x2, y2]). recognize_batch faz o mesmo para
+    uma lista de entradas, com uma lista de linhas por entrada.
+    recognize_regions reconhece só as regiões indicadas de uma imagem (modelos
+    de layout), recognize_scaled reconhece a imagem reduzida por um fator
+    (resolução adaptativa, caixas nas coordenadas originais), image_size
+    retorna (largura, altura) e read_input lê o documento antes do OCR
+    (leitura antecipada). config descreve o que
+    influencia o texto extraído e entra na chave do cache; degraded devolve
+    as opções de uma configuração mais barata do motor (caminho degradado
+    do orçamento de tempo). Motores com classificador de ângulo contam em
+    rotated_lines as linhas que ele girou e devolvem em
+    without_angle_classifier as opções do motor sem ele (None se não houver
+    classificador).
+    """
+    
+    name = None
+    rotated_lines = 0
+    
+    def load(self):
+        """Carrega o modelo antecipadamente (motores sem modelo não fazem nada)"""
+    
+    @classmethod
+    def read_input(cls, file_path):
+        """Lê o documento antes do OCR (em outra thread); retorna a entrada para recognize.
+
+        Imagens voltam decodificadas; PDFs são lidos por inteiro (o arquivo
+        fica no cache do sistema) e seguem como caminho.
+        """
+        if file_path.lower().endswith('.pdf'):
+            read_file(file_path)
+            return file_path
+        return load_image(file_path)
+    
+    def recognize(self, source):
+        raise NotImplementedError
+    
+    def recognize_batch(self, sources):
+        return [self.recognize(source) for source in sources]
+    
+    def image_size(self, source):
+        height, width = load_image(source).shape[:2]
+        return width, height
+    
+    def recognize_scaled(self, source, factor):
+        """Reconhece a imagem reduzida por `factor` e devolve as caixas nas coordenadas originais"""
+        return scale_boxes(self.recognize(downscale_image(load_image(source), factor)), 1 / factor)
+    
+    def recognize_regions(self, source, regions):
+        """Recorta as regiões ([x1, y1, x2, y2] em pixels), reconhece em lote e devolve as caixas na página"""
+        image = load_image(source)
+        crops = [image[y1:y2, x1:x2] for x1, y1, x2, y2 in regions]
+        lines = []
+        for (x1, y1, _, _), crop_lines in zip(regions, self.recognize_batch(crops)):
+            for line in crop_lines:
+                if line.get('box') is not None:
+                    box = line['box']
+                    line['box'] = [box[0] + x1, box[1] + y1, box[2] + x1, box[3] + y1]
+                lines.append(line)
+        return lines
+    
+    @classmethod
+    def config(cls, **options):
+        return {'engine': cls.name, **options}
+    
+    @classmethod
+    def degraded(cls, **options):
+        return options
+    
+    @classmethod
+    def without_angle_classifier(cls, **options):
+        return None
+
+class PaddleOCREngine(OCREngine):
+    """Adaptador do PaddleOCR (o modelo é carregado no primeiro reconhecimento ou em load)"""
+    
+    name = 'paddle'
+    
+    def __init__(self, lang=OCR_LANG, use_angle_cls=OCR_USE_ANGLE_CLS):
+        self.lang = lang
+        self.use_angle_cls = use_angle_cls
+        self.rotated_lines = 0
+        self._ocr = None
+    
+    def load(self):
+        if self._ocr is None:
+            from paddleocr import PaddleOCR
+            
+            self._ocr = PaddleOCR(use_angle_cls=self.use_angle_cls, lang=self.lang)
+        return self._ocr
+    
+    def recognize(self, source):
+        # Um PDF gera um resultado por página; as linhas são concatenadas
+        result = self.load().predict(source)
+        self.rotated_lines += count_rotated_lines(result)
+        return extract_text_from_ocr_result(result)
+    
+    def recognize_batch(self, sources):
+        # Um resultado por entrada, na mesma ordem
+        results = self.load().predict(sources)
+        self.rotated_lines += count_rotated_lines(results)
+        return [extract_text_from_ocr_result([res]) for res in results]
+    
+    @classmethod
+    def config(cls, **options):
+        # Mesmo formato de antes da interface de motores: o cache existente continua válido
+        return {**ocr_config_fingerprint(), 'use_angle_cls': options.get('use_angle_cls', OCR_USE_ANGLE_CLS)}
+    
+    @classmethod
+    def degraded(cls, **options):
+        return cls.without_angle_classifier(**options)
+    
+    @classmethod
+    def without_angle_classifier(cls, **options):
+        # Sem o classificador de ângulo: uma rede a menos por linha detectada
+        return {**options, 'use_angle_cls': False}
+
+class StubEngine(OCREngine):
+    """Motor falso, determinístico e sem modelo, para benchmarks e testes de carga.
+
+    Com `replay_cache_dir`, devolve o texto que o PaddleOCR gravou no cache
+    para o mesmo arquivo (só para caminhos; páginas renderizadas não têm
+    entrada própria). Caso contrário gera linhas sintéticas a partir do hash
+    da entrada: `num_lines` linhas de ruído mais os valores do JSON esperado
+    do documento, se existir, sempre na mesma posição para o mesmo campo.
+    Cada entrada custa `latency` segundos (recognize_regions, só a fração
+    proporcional à área reconhecida).
+    """
+    
+    name = 'stub'
+    
+    def __init__(self, latency=0.0, replay_cache_dir=None, num_lines=20, seed=0):
+        self.latency = latency
+        self.num_lines = num_lines
+        self.seed = seed
+        self.replay_cache = None
+        if replay_cache_dir:
+            self.replay_cache = OCRCache(replay_cache_dir, config=PaddleOCREngine.config())
+    
+    @classmethod
+    def read_input(cls, file_path):
+        # O texto sintético depende do caminho (JSON esperado, replay): só lê o arquivo
+        read_file(file_path)
+        return file_path
+    
+    def _digest(self, source):
+        if isinstance(source, str):
+            return file_sha256(source)
+        return hashlib.sha256(source.tobytes()).hexdigest()
+    
+    def _synthetic(self, source):
+        rng = random.Random(f"{self.seed}:{self._digest(source)}")
+        texts = [
+            ' '.join(''.join(rng.choice(string.ascii_letters) for _ in range(rng.randint(2, 10)))
+                     for _ in range(rng.randint(1, 8)))
+            for _ in range(self.num_lines)
+        ]
+        
+        # Valores esperados do documento; a posição depende só do campo, como em um formulário fixo
+        json_path = expected_json_path(source) if isinstance(source, str) else None
+        if json_path and os.path.exists(json_path):
+            with open(json_path, 'r', encoding='utf-8') as f:
+                json_data = json.load(f)
+            for field, value in json_data.items():
+                if value not in (None, '', 'null'):
+                    texts.insert(random.Random(f"{self.seed}:{field}").randint(0, len(texts)), str(value))
+        
+        return [
+            {'text': text, 'confidence': round(rng.uniform(0.8, 1.0), 4),
+             'box': [20, 20 + 30 * i, min(STUB_PAGE_WIDTH - 20, 20 + 12 * len(text)), 45 + 30 * i]}
+            for i, text in enumerate(texts)
+        ]
+    
+    def recognize(self, source):
+        if self.latency:
+            time.sleep(self.latency)
+        if self.replay_cache is not None and isinstance(source, str):
+            texts = self.replay_cache.get(self.replay_cache.document_key(source))
+            if texts is not None:
+                return texts
+        return self._synthetic(source)
+    
+    def image_size(self, source):
+        # Página sintética: largura fixa e uma faixa de 30 px por linha
+        return STUB_PAGE_WIDTH, 40 + 30 * len(self._synthetic(source))
+    
+    def recognize_scaled(self, source, factor):
+        # Resolução menor: custa factor² da latência, perde linhas e confiança de forma determinística
+        if self.latency:
+            time.sleep(self.latency * factor * factor)
+        lines = []
+        for line in self._synthetic(source):
+            rng = random.Random(f"{self.seed}:{factor}:{line['text']}")
+            if rng.random() < (1 - factor) * 0.3:
+                continue
+            lines.append({**line, 'confidence': round(line['confidence'] * (0.95 + 0.05 * factor), 4)})
+        return lines
+    
+    def recognize_regions(self, source, regions):
+        # Só as linhas que tocam as regiões; a latência é proporcional à área reconhecida
+        width, height = self.image_size(source)
+        area = sum((x2 - x1) * (y2 - y1) for x1, y1, x2, y2 in regions)
+        if self.latency:
+            time.sleep(self.latency * min(1.0, area / (width * height)))
+        return [
+            line for line in self._synthetic(source)
+            if any(line['box'][0] < x2 and x1 < line['box'][2] and line['box'][1] < y2 and y1 < line['box'][3]
+                   for x1, y1, x2, y2 in regions)
+        ]
+    
+    @classmethod
+    def config(cls, latency=0.0, replay_cache_dir=None, num_lines=20, seed=0):
+        # A latência não muda o texto gerado
+        return {'engine': cls.name, 'replay_cache_dir': replay_cache_dir, 'num_lines': num_lines, 'seed': seed}
+
+# Motores disponíveis em --engine
+OCR_ENGINES = {engine.name: engine for engine in (PaddleOCREngine, StubEngine)}
+
+def _engine_class_and_options(engine_options):
+    options = dict(engine_options or {})
+    return OCR_ENGINES[options.pop('engine', PaddleOCREngine.name)], options
+
+def create_ocr(engine_options=None):
+    """Cria o motor de OCR descrito em engine_options ({'engine': nome, ...}; padrão: PaddleOCR)"""
+    engine_class, options = _engine_class_and_options(engine_options)
+    return engine_class(**options)
+
+def engine_config(engine_options=None):
+    """Configuração do motor que entra na chave do cache"""
+    engine_class, options = _engine_class_and_options(engine_options)
+    return engine_class.config(**options)
+
+def degraded_engine_options(engine_options=None):
+    """Opções do mesmo motor na configuração mais barata (caminho degradado do orçamento de tempo)"""
+    engine_class, options = _engine_class_and_options(engine_options)
+    return {'engine': engine_class.name, **engine_class.degraded(**options)}
+
+def engine_options_without_angle_classifier(engine_options=None):
+    """Opções do mesmo motor sem o classificador de ângulo (None se o motor não tem classificador)"""
+    engine_class, options = _engine_class_and_options(engine_options)
+    options = engine_class.without_angle_classifier(**options)
+    return None if options is None else {'engine': engine_class.name, **options}
+
+class LazyOCR:
+    """Adia a carga do modelo até o primeiro reconhecimento (evita o custo quando tudo vem do cache)"""
+    
+    def __init__(self, engine_options=None):
+        self.engine_options = engine_options
+        self._ocr = None
+    
+    def _engine(self):
+        if self._ocr is None:
+            self._ocr = create_ocr(self.engine_options)
+        return self._ocr
+    
+    def load(self):
+        self._engine().load()
+    
+    def recognize(self, source):
+        return self._engine().recognize(source)
+    
+    def recognize_batch(self, sources):
+        return self._engine().recognize_batch(sources)
+    
+    def image_size(self, source):
+        return self._engine().image_size(source)
+    
+    def recognize_regions(self, source, regions):
+        return self._engine().recognize_regions(source, regions)
+    
+    def recognize_scaled(self, source, factor):
+        return self._engine().recognize_scaled(source, factor)
+    
+    @property
+    def rotated_lines(self):
+        return self._ocr.rotated_lines if self._ocr is not None else 0
+    
+    def read_input(self, file_path):
+        # Não carrega o modelo: a leitura roda nas threads de E/S
+        engine_class, _ = _engine_class_and_options(self.engine_options)
+        return engine_class.read_input(file_path)
+
+def expected_json_path(file_path):
+    """Caminho do JSON de valores esperados de um documento"""
+    return file_path.rsplit('.', 1)[0] + '.json'
+
+def load_json_file(json_path):
+    """Carrega um JSON de valores esperados"""
+    with open(json_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def collect_documents(directory, edital_name, executor=None):
+    """Lista os documentos de um diretório que possuem JSON correspondente.
+
+    Uma única varredura (os.scandir) pareia documentos e JSONs; os JSONs são
+    carregados em paralelo quando há `executor` (threads de E/S).
+    """
+    with os.scandir(directory) as entries:
+        names = [entry.name for entry in entries if entry.is_file()]
+    json_names = {name for name in names if name.endswith('.json')}
+    
+    # Documentos com JSON correspondente, na ordem da listagem do diretório
+    file_paths = [
+        os.path.join(directory, filename) for filename in names
+        if filename.endswith(SUPPORTED_EXTENSIONS) and expected_json_path(filename) in json_names
+    ]
+    json_paths = [expected_json_path(file_path) for file_path in file_paths]
+    json_datas = executor.map(load_json_file, json_paths) if executor is not None else map(load_json_file, json_paths)
+    
+    return [(file_path, json_data, edital_name) for file_path, json_data in zip(file_paths, json_datas)]
+
+def discover_documents(input_dir, io_threads=IO_THREADS):
+    """Descobre editais e documentos em input_dir, na mesma ordem do processamento serial"""
+    edital_names = []
+    tasks = []
+    
+    with os.scandir(input_dir) as entries:
+        subdirs = [entry.name for entry in entries if entry.is_dir()]
+    
+    with ThreadPoolExecutor(max_workers=max(1, io_threads)) as executor:
+        # Verifica se input_docs tem subpastas (editais) ou arquivos diretos
+        if subdirs:
+            # Processa por subpastas (editais)
+            for edital_name in subdirs:
+                print(f"\n🏛️ Processando Edital: {edital_name}")
+                edital_names.append(edital_name)
+                tasks.extend(collect_documents(os.path.join(input_dir, edital_name), edital_name, executor))
+        else:
+            # Modo compatibilidade: processa arquivos diretos em input_docs
+            print("📁 Processando arquivos diretamente em input_docs (modo compatibilidade)")
+            edital_names.append('root')
+            tasks.extend(collect_documents(input_dir, 'root', executor))
+    
+    return edital_names, tasks
+
+def parse_shard(value):
+    """Converte o argumento --shard 'i/N' em (i, N), com 1 <= i <= N"""
+    try:
+        index, total = (int(part) for part in value.split('/'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"formato esperado i/N (ex.: 1/4): {value}")
+    if not 1 <= index <= total:
+        raise argparse.ArgumentTypeError(f"parte fora do intervalo 1..N: {value}")
+    return index, total
+
+def shard_output_dir(shard):
+    """Pasta dos resultados parciais da parte (i, N)"""
+    index, total = shard
+    return os.path.join(OUTPUT_DIR, SHARD_DIR_FORMAT.format(index=index, total=total))
+
+def shard_of(file_path, edital_name, input_dir, total):
+    """Parte (1..total) de um documento: hash estável do edital e do caminho relativo a input_dir"""
+    relative = os.path.relpath(file_path, input_dir).replace(os.sep, '/')
+    digest = hashlib.sha256(f"{edital_name}\0{relative}".encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big') % total + 1
+
+def select_shard(tasks, edital_names, shard, input_dir, output_dir):
+    """Filtra as tarefas da parte `shard` = (i, N) e grava shard.json para o merge.
+
+    shard.json guarda a lista completa de editais e a posição de cada
+    documento da parte na ordem global de descoberta: o merge reconstrói
+    assim a mesma ordem de uma execução em uma única máquina.
+    """
+    index, total = shard
+    selected = [(position, task) for position, task in enumerate(tasks)
+                if shard_of(task[0], task[2], input_dir, total) == index]
+    info = {
+        'parte': index,
+        'total_partes': total,
+        'editais': edital_names,
+        'documentos': [[position, task[0]] for position, task in selected]
+    }
+    with open(os.path.join(output_dir, SHARD_INFO_FILENAME), 'w', encoding='utf-8') as f:
+        json.dump(info, f, ensure_ascii=False, indent=2)
+    
+    print(f"🧩 Parte {index} de {total}: {len(selected)} de {len(tasks)} documento(s)")
+    return [task for _, task in selected]
+
+def find_shard_dirs(output_dir):
+    """Pastas de resultados parciais (com shard.json) dentro de output_dir"""
+    with os.scandir(output_dir) as entries:
+        return sorted(entry.path for entry in entries
+                      if entry.is_dir() and os.path.exists(os.path.join(entry.path, SHARD_INFO_FILENAME)))
+
+def merge_shards(shard_dirs):
+    """Reúne as partes de uma execução distribuída.
+
+    Retorna (editais, documentos, ausentes): documentos como (manifesto,
+    caminho) na ordem global de descoberta e os caminhos da parte que não
+    chegaram ao manifesto (parte interrompida). Levanta ValueError se as
+    partes não forem da mesma divisão ou se faltar alguma.
+    """
+    if not shard_dirs:
+        raise ValueError("Nenhuma parte encontrada")
+    
+    edital_names = None
+    total = None
+    shards = {}
+    documents = []
+    missing = []
+    for shard_dir in shard_dirs:
+        with open(os.path.join(shard_dir, SHARD_INFO_FILENAME), 'r', encoding='utf-8') as f:
+            info = json.load(f)
+        if edital_names is None:
+            edital_names, total = info['editais'], info['total_partes']
+        elif info['editais'] != edital_names or info['total_partes'] != total:
+            raise ValueError(f"{shard_dir} não pertence à mesma divisão em partes")
+        if info['parte'] in shards:
+            raise ValueError(f"Parte {info['parte']} repetida: {shards[info['parte']]} e {shard_dir}")
+        shards[info['parte']] = shard_dir
+        
+        manifest = ProcessingManifest(os.path.join(shard_dir, MANIFEST_FILENAME))
+        for position, file_path in info['documentos']:
+            if file_path in manifest.entries:
+                documents.append((position, manifest, file_path))
+            else:
+                missing.append(file_path)
+    
+    absent = sorted(set(range(1, total + 1)) - set(shards))
+    if absent:
+        raise ValueError(f"Faltam as partes {', '.join(map(str, absent))} de {total}")
+    
+    documents.sort(key=lambda document: document[0])
+    return edital_names, [(manifest, file_path) for _, manifest, file_path in documents], missing
+
+def create_cache(cache_options, engine_options=None):
+    """Cria o cache de OCR a partir das opções da linha de comando (None desativa)"""
+    if cache_options is None:
+        return None
+    return OCRCache(**cache_options, config=engine_config(engine_options))
+
+# Instâncias de cada processo do pool (criadas uma única vez no initializer)
+_worker_ocr = None
+_worker_cache = None
+_worker_document_options = {}
+
+def _init_worker(cache_options=None, document_options=None, engine_options=None):
+    """Initializer do pool: prepara o motor de OCR e o cache uma vez por processo"""
+    global _worker_ocr, _worker_cache, _worker_document_options
+    _worker_ocr = LazyOCR(engine_options)
+    _worker_cache = create_cache(cache_options, engine_options)
+    _worker_document_options = document_options or {}
+
+def _process_unit(chunk, batch_options=None, retry_options=None):
+    """Processa um bloco de documentos no worker (em micro-batches, com batch_options)"""
+    if retry_options is not None:
+        # Nova tentativa (falta de memória ou orçamento de tempo): um documento, resolução reduzida,
+        # sem cache; retry_options traz render_scale e, no caminho degradado, max_pages
+        return [process_document(file_path, json_data, _worker_ocr, edital_name, **retry_options,
+                                 **_worker_document_options)
+                for file_path, json_data, edital_name in chunk]
+    if batch_options:
+        return list(process_documents_batched(chunk, _worker_ocr, cache=_worker_cache,
+                                              **batch_options, **_worker_document_options))
+    return [process_document(file_path, json_data, _worker_ocr, edital_name, cache=_worker_cache,
+                             **_worker_document_options)
+            for file_path, json_data, edital_name in chunk]
+
+def _supervised_worker(conn, cache_options, document_options, engine_options, batch_options, max_documents,
+                       max_rss_mb, preload=False):
+    """Laço de um worker supervisionado: recebe blocos pelo pipe e devolve (id, resultados, erro, reciclar).
+
+    Antes do primeiro bloco, o worker avisa que está pronto com id None
+    (com `preload`, depois de carregar o modelo: o prazo do orçamento de
+    tempo só começa a contar aí). Depois de `max_documents` documentos ou
+    acima de `max_rss_mb` de RSS, o worker avisa que vai reciclar junto com
+    o último resultado e termina; o supervisor sobe outro no lugar.
+    """
+    _init_worker(cache_options, document_options, engine_options)
+    try:
+        if preload:
+            _worker_ocr.load()
+    except Exception:
+        conn.send((None, None, traceback.format_exc(), True))
+        conn.close()
+        return
+    conn.send((None, None, None, False))
+    processed = 0
+    while True:
+        message = conn.recv()
+        if message is None:
+            break
+        unit_id, chunk, retry_options = message
+        try:
+            with PeakRSSMonitor() as memory:
+                results = _process_unit(chunk, batch_options, retry_options)
+        except Exception:
+            conn.send((unit_id, None, traceback.format_exc(), True))
+            break
+        for result in results:
+            result['memory'] = {'peak_rss_mb': memory.peak_mb}
+        
+        processed += len(chunk)
+        rss_mb = current_rss_mb()
+        recycle = bool((max_documents and processed >= max_documents) or
+                       (max_rss_mb and rss_mb is not None and rss_mb > max_rss_mb))
+        conn.send((unit_id, results, None, recycle))
+        if recycle:
+            break
+    conn.close()
+
+def document_page_count(file_path):
+    """Número de páginas de um documento (imagens e PDFs que não abrem contam 1)"""
+    if not file_path.lower().endswith('.pdf'):
+        return 1
+    try:
+        import pypdfium2
+        
+        pdf = pypdfium2.PdfDocument(file_path)
+    except Exception:
+        return 1
+    try:
+        return max(1, len(pdf))
+    finally:
+        pdf.close()
+
+def document_budget(file_path, document_timeout=DOCUMENT_TIMEOUT, page_timeout=PAGE_TIMEOUT, max_pages=None):
+    """Orçamento de tempo (s) de um documento: o menor entre o por documento e o por página (None = sem limite)"""
+    budgets = []
+    if document_timeout:
+        budgets.append(document_timeout)
+    if page_timeout:
+        pages = document_page_count(file_path)
+        budgets.append(page_timeout * (min(pages, max_pages) if max_pages else pages))
+    return min(budgets) if budgets else None
+
+def failed_document_result(task, reason, threshold=MATCH_THRESHOLD):
+    """Resultado de um documento que não pôde ser processado (sem texto; não entra no manifesto)"""
+    file_path, json_data, edital_name = task
+    result = make_document_result(file_path, json_data, edital_name, [], {}, threshold)
+    result['error'] = reason
+    return result
+
+class SupervisedPool:
+    """Workers de OCR em processos supervisionados, com guarda de memória e orçamento de tempo.
+
+    Cada worker recebe um bloco de documentos por vez (um documento, ou um
+    micro-batch com batch_options) por um pipe próprio, de modo que o
+    supervisor sabe exatamente o que está em andamento em cada processo. O
+    worker mede o pico de RSS de cada bloco (gravado em result['memory']) e
+    se recicla após `max_documents` documentos ou acima de `max_rss_mb`.
+
+    Se um worker morre com um bloco em andamento (ex.: morto pelo limite de
+    memória do contêiner), cada documento do bloco é refeito uma vez,
+    sozinho, em um worker novo e com a renderização reduzida por
+    `retry_scale`. Se morrer de novo, o documento sai com result['error'] e
+    o restante da execução segue.
+
+    Com `document_timeout` e/ou `page_timeout` (segundos por página), cada
+    bloco tem um prazo (a soma dos orçamentos dos seus documentos, ver
+    document_budget); quem passa do prazo tem o worker encerrado, e cada
+    documento do bloco é refeito sozinho no caminho degradado: só as
+    `degraded_max_pages` primeiras páginas, resolução reduzida por
+    `retry_scale` e o motor sem o classificador de ângulo. O desfecho fica
+    em result['time_budget'] ('degradado', ou 'esgotado' se o caminho
+    degradado também passar do prazo).
+    """
+    
+    def __init__(self, workers, cache_options=None, document_options=None, engine_options=None, batch_options=None,
+                 max_documents=WORKER_MAX_DOCUMENTS, max_rss_mb=WORKER_MAX_RSS_MB, retry_scale=RETRY_RENDER_SCALE,
+                 document_timeout=DOCUMENT_TIMEOUT, page_timeout=PAGE_TIMEOUT, degraded_max_pages=DEGRADED_MAX_PAGES):
+        # 'spawn' evita herdar o estado interno do Paddle no fork dos workers
+        self.context = multiprocessing.get_context('spawn')
+        self.workers = workers
+        self.document_options = document_options or {}
+        self.batch_options = batch_options
+        self.max_documents = max_documents
+        self.max_rss_mb = max_rss_mb
+        self.retry_scale = retry_scale
+        self.document_timeout = document_timeout
+        self.page_timeout = page_timeout
+        self.degraded_max_pages = degraded_max_pages
+        self._cache_options = cache_options
+        self._engine_options = engine_options
+        self.recycled = 0
+        self.retried = 0
+        self.failed = 0
+        self.degraded = 0
+        # Bloco interrompido -> segundos perdidos por documento (somados ao documento refeito)
+        self._interrupted = {}
+    
+    def _start(self, isolated=False, degraded=False):
+        parent_conn, child_conn = self.context.Pipe()
+        # Worker isolado (nova tentativa): só o documento refeito, depois termina
+        limits = (None, 1, 0) if isolated else (self.batch_options, self.max_documents, self.max_rss_mb)
+        engine_options = degraded_engine_options(self._engine_options) if degraded else self._engine_options
+        # Com orçamento de tempo, o modelo é carregado antes do primeiro bloco (fora do prazo)
+        preload = bool(self.document_timeout or self.page_timeout)
+        process = self.context.Process(target=_supervised_worker,
+                                       args=(child_conn, self._cache_options, self.document_options, engine_options,
+                                             *limits, preload),
+                                       daemon=True)
+        process.start()
+        child_conn.close()
+        return {'process': process, 'conn': parent_conn, 'unit': None, 'recycling': False, 'isolated': isolated,
+                'degraded': degraded, 'spawned': time.monotonic(), 'ready': False, 'started': None, 'budget': None,
+                'deadline': None, 'timed_out': False}
+    
+    @staticmethod
+    def _stop(worker):
+        try:
+            worker['conn'].send(None)
+        except (OSError, ValueError):
+            pass
+        worker['process'].join(timeout=5)
+        if worker['process'].is_alive():
+            worker['process'].terminate()
+            worker['process'].join()
+        worker['conn'].close()
+    
+    def _dispatch(self, worker, unit, tasks, retry_options=None, max_pages=None):
+        """Envia um bloco ao worker e marca o prazo do orçamento de tempo (a partir de quando o worker fica pronto)"""
+        worker['conn'].send((unit[0], tasks, retry_options))
+        worker['unit'] = unit
+        budgets = [document_budget(task[0], self.document_timeout, self.page_timeout, max_pages) for task in tasks]
+        worker['budget'] = None if None in budgets else sum(budgets)
+        if worker['ready']:
+            self._start_deadline(worker)
+    
+    @staticmethod
+    def _start_deadline(worker):
+        worker['started'] = time.monotonic()
+        worker['deadline'] = None if worker['budget'] is None else worker['started'] + worker['budget']
+    
+    def run(self, tasks):
+        """Processa as tarefas e gera os resultados na ordem de `tasks`"""
+        chunk_size = self.batch_options['batch_size'] if self.batch_options else 1
+        units = [tasks[i:i + chunk_size] for i in range(0, len(tasks), chunk_size)]
+        pending = deque(range(len(units)))
+        retries = deque()      # (bloco, posição no bloco, degradado?) a refazer isoladamente
+        partial = {}           # bloco refeito -> resultados por posição
+        done = {}              # bloco concluído -> resultados, aguardando a vez
+        next_unit = 0
+        # Limita os blocos concluídos fora de ordem retidos em memória
+        window = max(2, 2 * self.workers)
+        
+        workers = [self._start() for _ in range(min(self.workers, len(units)))]
+        isolated = None
+        try:
+            while next_unit < len(units):
+                for worker in workers:
+                    if (worker['unit'] is None and not worker['recycling'] and pending
+                            and pending[0] < next_unit + window):
+                        unit_id = pending.popleft()
+                        try:
+                            self._dispatch(worker, (unit_id, None), units[unit_id])
+                        except OSError:
+                            # Worker morreu ocioso: o bloco volta para a fila e o processo é trocado abaixo
+                            pending.appendleft(unit_id)
+                            continue
+                if isolated is None and retries:
+                    unit_id, position, degraded = retries.popleft()
+                    isolated = self._start(isolated=True, degraded=degraded)
+                    retry_options = {'render_scale': self.retry_scale}
+                    max_pages = None
+                    if degraded:
+                        retry_options['max_pages'] = max_pages = self.degraded_max_pages
+                    self._dispatch(isolated, (unit_id, position), [units[unit_id][position]], retry_options,
+                                   max_pages)
+                
+                alive = workers + ([isolated] if isolated is not None else [])
+                deadlines = [worker['deadline'] for worker in alive
+                             if worker['unit'] is not None and worker['deadline'] is not None]
+                ready = multiprocessing.connection.wait(
+                    [worker['conn'] for worker in alive] + [worker['process'].sentinel for worker in alive],
+                    timeout=max(0, min(deadlines) - time.monotonic()) if deadlines else None
+                )
+                
+                for worker in alive:
+                    if worker['conn'] in ready:
+                        try:
+                            unit_id, results, error, recycle = worker['conn'].recv()
+                        except (EOFError, OSError):
+                            pass  # o processo morreu: tratado abaixo pelo sentinel
+                        else:
+                            if unit_id is None:
+                                # Worker pronto (modelo carregado): o prazo do bloco já enviado começa agora
+                                if error is not None:
+                                    raise RuntimeError(f"Falha ao carregar o motor de OCR no worker:\n{error}")
+                                worker['ready'] = True
+                                if worker['unit'] is not None:
+                                    self._start_deadline(worker)
+                            else:
+                                if error is not None:
+                                    paths = ', '.join(task[0] for task in units[unit_id])
+                                    raise RuntimeError(f"Falha no worker ao processar {paths}:\n{error}")
+                                if worker['isolated']:
+                                    if worker['degraded']:
+                                        self._mark_degraded(results[0])
+                                    self._finish_retry(units, partial, done, worker['unit'], results[0])
+                                else:
+                                    done[unit_id] = results
+                                worker['unit'] = None
+                                worker['recycling'] = recycle
+                    
+                    if (worker['unit'] is not None and worker['deadline'] is not None
+                            and time.monotonic() >= worker['deadline'] and worker['process'].is_alive()):
+                        # Orçamento de tempo esgotado: o OCR em andamento não tem como ser interrompido por dentro
+                        worker['timed_out'] = True
+                        worker['process'].kill()
+                        worker['process'].join()
+                    
+                    if worker['process'].sentinel in ready or worker['recycling'] or worker['timed_out']:
+                        if worker['process'].is_alive() and not worker['recycling']:
+                            continue
+                        worker['process'].join()
+                        worker['conn'].close()
+                        if worker['unit'] is not None:
+                            self._handle_crash(units, retries, partial, done, worker)
+                        elif not worker['isolated']:
+                            self.recycled += 1
+                            print(f"♻️ Worker reciclado (pid {worker['process'].pid}, "
+                                  f"código de saída {worker['process'].exitcode})")
+                        if worker['isolated']:
+                            isolated = None
+                        else:
+                            workers[workers.index(worker)] = self._start()
+                
+                while next_unit in done:
+                    yield from done.pop(next_unit)
+                    next_unit += 1
+        finally:
+            for worker in workers + ([isolated] if isolated is not None else []):
+                self._stop(worker)
+            if self.recycled or self.retried or self.failed:
+                print(f"🧠 Guarda de memória: {self.recycled} worker(s) reciclado(s), {self.retried} documento(s) "
+                      f"refeito(s) em resolução reduzida, {self.failed} com falha")
+            if self.degraded:
+                print(f"⏱️ Orçamento de tempo: {self.degraded} documento(s) refeito(s) no caminho degradado")
+    
+    def _handle_crash(self, units, retries, partial, done, worker):
+        """Trata um worker que morreu (ou foi encerrado pelo orçamento de tempo) com um bloco em andamento"""
+        unit_id, position = worker['unit']
+        exitcode = worker['process'].exitcode
+        # Worker que morreu antes de ficar pronto: conta desde que o processo subiu
+        elapsed = time.monotonic() - (worker['started'] or worker['spawned'])
+        if not worker['isolated']:
+            if worker['timed_out']:
+                # Cada documento do bloco é refeito sozinho no caminho degradado
+                print(f"⏱️ Orçamento de tempo esgotado ({elapsed:.1f}s) com {len(units[unit_id])} documento(s) em "
+                      f"andamento; refazendo cada um no caminho degradado (até {self.degraded_max_pages} "
+                      f"página(s), resolução × {self.retry_scale}, sem classificador de ângulo)")
+            else:
+                # Primeira falha: cada documento do bloco é refeito sozinho, em resolução reduzida
+                print(f"💥 Worker morreu (código de saída {exitcode}) com {len(units[unit_id])} documento(s) em "
+                      f"andamento; refazendo cada um isoladamente com resolução × {self.retry_scale}")
+            partial[unit_id] = [None] * len(units[unit_id])
+            for i in range(len(units[unit_id])):
+                retries.append((unit_id, i, worker['timed_out']))
+            # O tempo perdido na tentativa interrompida é dividido entre os documentos do bloco
+            self._interrupted[unit_id] = elapsed / len(units[unit_id])
+            return
+        
+        # Segunda falha do mesmo documento: registra o erro e segue
+        task = units[unit_id][position]
+        self.failed += 1
+        if worker['timed_out']:
+            reason = (f"Orçamento de tempo esgotado também no caminho degradado ({elapsed:.1f}s)" if worker['degraded']
+                      else f"Orçamento de tempo esgotado na nova tentativa em resolução reduzida ({elapsed:.1f}s)")
+        else:
+            reason = f"Worker morreu duas vezes (código de saída {exitcode})"
+        print(f"❌ {reason}: {task[0]}")
+        result = failed_document_result(task, reason, self.document_options.get('threshold', MATCH_THRESHOLD))
+        if worker['timed_out']:
+            result['time_budget'] = {'status': 'esgotado'}
+        result['timings']['nova_tentativa'] = elapsed
+        self._finish_retry(units, partial, done, (unit_id, position), result)
+    
+    def _mark_degraded(self, result):
+        """Registra no resultado que o documento veio do caminho degradado do orçamento de tempo"""
+        self.degraded += 1
+        result['time_budget'] = {
+            'status': 'degradado',
+            'max_pages': self.degraded_max_pages,
+            'render_scale': self.retry_scale,
+            'angle_classifier': False
+        }
+    
+    def _finish_retry(self, units, partial, done, unit, result):
+        """Guarda o resultado de um documento refeito; o bloco fica pronto quando todos voltarem"""
+        unit_id, position = unit
+        if 'error' not in result and 'time_budget' not in result:
+            self.retried += 1
+        if unit_id in self._interrupted:
+            result['timings']['tentativa_interrompida'] = self._interrupted[unit_id]
+        partial[unit_id][position] = result
+        if all(result is not None for result in partial[unit_id]):
+            done[unit_id] = partial.pop(unit_id)
+            self._interrupted.pop(unit_id, None)
+
+def iter_documents(tasks, workers=1, cache_options=None, document_options=None, batch_options=None,
+                   engine_options=None, prefetch=0, memory_options=None, budget_options=None):
+    """Executa o OCR em todos os documentos, em série ou em workers supervisionados.
+
+    `document_options` são repassadas como argumentos nomeados para
+    process_document; com `batch_options` (batch_size, max_wait) as imagens e
+    páginas de vários documentos são agrupadas em micro-batches e
+    `engine_options` escolhe o motor de OCR (padrão: PaddleOCR). Os resultados
+    são gerados um a um, na mesma ordem de `tasks`, de modo que os relatórios
+    são idênticos aos de uma execução serial e quem consome pode gravá-los e
+    descartá-los à medida que chegam. Com `prefetch` (execução em um
+    processo), até esse número de documentos é lido e decodificado por
+    threads de E/S enquanto o OCR trabalha (prefetch_documents). Com
+    `memory_options` (max_documents, max_rss_mb), mesmo com um worker o OCR
+    roda em processos supervisionados (SupervisedPool), que se reciclam e
+    refazem em resolução reduzida os documentos que derrubarem o worker.
+    O pico de RSS de cada documento fica em result['memory']. Com
+    `budget_options` (document_timeout, page_timeout, degraded_max_pages), o
+    OCR também roda em processos supervisionados, que são encerrados quando
+    um documento estoura o orçamento de tempo.
+    """
+    document_options = document_options or {}
+    
+    memory_options = memory_options or {}
+    budget_options = budget_options or {}
+    
+    if (workers > 1 and len(tasks) > 1) or ((memory_options or budget_options) and tasks):
+        print(f"⚙️ Processando {len(tasks)} documentos com {workers} processo(s) supervisionado(s)")
+        # Com micro-batches, cada worker recebe blocos de documentos para formar lotes entre eles
+        pool = SupervisedPool(workers, cache_options, document_options, engine_options, batch_options,
+                              **{**budget_options, **memory_options})
+        yield from pool.run(tasks)
+        return
+    
+    ocr = LazyOCR(engine_options)
+    cache = create_cache(cache_options, engine_options)
+    if batch_options:
+        yield from process_documents_batched(tasks, ocr, cache=cache, prefetch=prefetch, **batch_options,
+                                             **document_options)
+        return
+    for (file_path, json_data, edital_name), source, waited in prefetch_documents(tasks, ocr, cache, prefetch):
+        with PeakRSSMonitor() as memory:
+            result = process_document(file_path, json_data, ocr, edital_name, cache=cache, source=source,
+                                      **document_options)
+        result['memory'] = {'peak_rss_mb': memory.peak_mb}
+        if waited is not None:
+            result['timings']['leitura'] = waited
+        yield result
+
+def run_documents(tasks, workers=1, cache_options=None, document_options=None, batch_options=None,
+                  engine_options=None, prefetch=0, memory_options=None, budget_options=None):
+    """Executa o OCR em todos os documentos e retorna a lista de resultados (ordem de `tasks`)"""
+    return list(iter_documents(tasks, workers, cache_options, document_options, batch_options, engine_options,
+                               prefetch, memory_options, budget_options))
+
+def _json_default(value):
+    """Converte escalares NumPy (confianças do PaddleOCR) para tipos nativos do JSON"""
+    if hasattr(value, 'item'):
+        return value.item()
+    raise TypeError(f"Objeto do tipo {type(value).__name__} não serializável em JSON")
+
+def file_fingerprint(file_path):
+    """Identificação rápida de um arquivo (mtime e tamanho)"""
+    stat = os.stat(file_path)
+    return {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size}
+
+class ProcessingManifest:
+    """Manifesto append-only (JSONL) dos documentos já concluídos.
+
+    Cada linha registra caminho, mtime, tamanho e hash do documento e do JSON
+    de valores esperados, além do resultado completo de process_document. Uma
+    execução interrompida pode ser retomada, e execuções seguintes só
+    processam pares documento/JSON novos ou alterados. Arquivos com mtime
+    diferente, mas mesmo conteúdo (hash), continuam valendo. Cada entrada
+    guarda também a configuração que influencia o texto extraído (motor e
+    opções de processamento, ver text_config_from_args): mudar qualquer uma
+    delas reprocessa o documento, como a chave do cache de OCR.
+
+    Em memória ficam apenas as identificações dos arquivos e a posição de cada
+    linha; o resultado é relido do disco sob demanda (load_result).
+    """
+    
+    def __init__(self, path, reset=False):
+        self.path = path
+        self.entries = {}
+        self.superseded = 0
+        
+        if reset and os.path.exists(path):
+            os.remove(path)
+        self._load()
+    
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb') as f:
+            offset = 0
+            for line in f:
+                line_offset = offset
+                offset += len(line)
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Última linha truncada por uma interrupção: descarta
+                    continue
+                self._index(entry, line_offset, len(line))
+    
+    def _index(self, entry, offset, length):
+        """Guarda só a identificação dos arquivos e a posição da linha no manifesto"""
+        if entry['file_path'] in self.entries:
+            self.superseded += 1
+        self.entries[entry['file_path']] = {
+            'edital': entry['result']['edital'],
+            'threshold': entry['result'].get('threshold', MATCH_THRESHOLD),
+            'config': entry.get('config'),
+            'document': entry['document'],
+            'expected_json': entry['expected_json'],
+            'offset': offset,
+            'length': length
+        }
+    
+    @staticmethod
+    def _same_file(file_path, recorded):
+        """Verifica se o arquivo continua igual ao registrado (mtime/tamanho, ou hash)"""
+        try:
+            fingerprint = file_fingerprint(file_path)
+        except OSError:
+            return False
+        if fingerprint == recorded['fingerprint']:
+            return True
+        if fingerprint['size'] != recorded['fingerprint']['size']:
+            return False
+        return file_sha256(file_path) == recorded['sha256']
+    
+    def has_text(self, file_path, edital_name):
+        """Verifica se o texto extraído registrado ainda vale (documento inalterado; o JSON pode mudar)"""
+        entry = self.entries.get(file_path)
+        if entry is None or entry['edital'] != edital_name:
+            return False
+        return self._same_file(file_path, entry['document'])
+    
+    def is_unchanged(self, file_path, edital_name, threshold=MATCH_THRESHOLD, config=None):
+        """Verifica se documento, JSON, threshold e configuração continuam iguais aos registrados no manifesto"""
+        if not self.has_text(file_path, edital_name) or self.entries[file_path]['threshold'] != threshold:
+            return False
+        if config is not None and self.entries[file_path]['config'] != config:
+            return False
+        return self._same_file(expected_json_path(file_path), self.entries[file_path]['expected_json'])
+    
+    def _read_line(self, entry):
+        with open(self.path, 'rb') as f:
+            f.seek(entry['offset'])
+            return f.read(entry['length'])
+    
+    def load_result(self, file_path):
+        """Relê do disco o resultado registrado de um documento"""
+        return json.loads(self._read_line(self.entries[file_path]))['result']
+    
+    def record(self, result, config=None):
+        """Acrescenta um documento concluído ao manifesto (gravado imediatamente em disco)"""
+        file_path = result['file_path']
+        json_path = expected_json_path(file_path)
+        entry = {
+            'file_path': file_path,
+            'document': {'fingerprint': file_fingerprint(file_path), 'sha256': file_sha256(file_path)},
+            'expected_json': {'fingerprint': file_fingerprint(json_path), 'sha256': file_sha256(json_path)},
+            'config': config,
+            'result': result
+        }
+        line = (json.dumps(entry, ensure_ascii=False, default=_json_default) + '\n').encode('utf-8')
+        
+        with open(self.path, 'ab') as f:
+            offset = f.tell()
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+        
+        self._index(entry, offset, len(line))
+    
+    def compact(self):
+        """Reescreve o manifesto só com a entrada mais recente de cada documento"""
+        if self.superseded == 0:
+            return
+        tmp_path = f"{self.path}.tmp"
+        offset = 0
+        with open(self.path, 'rb') as source, open(tmp_path, 'wb') as target:
+            for entry in self.entries.values():
+                source.seek(entry['offset'])
+                line = source.read(entry['length'])
+                target.write(line)
+                entry['offset'] = offset
+                offset += len(line)
+        os.replace(tmp_path, self.path)
+        self.superseded = 0
 
-# Diretório dos documentos
-input_dir = 'input_docs'
+def split_by_manifest(tasks, manifest, threshold=MATCH_THRESHOLD, config=None):
+    """Separa tarefas já concluídas (registradas no manifesto) das que precisam de OCR.
 
-# Dicionário para armazenar resultados por edital
-results_by_edital = {}
-all_results = []
+    Com `config` (text_config_from_args), documentos registrados com outra
+    configuração também voltam para o OCR. Retorna (conjunto de índices
+    reaproveitados, [(índice, tarefa) pendentes]).
+    """
+    reused = set()
+    pending = []
+    for index, task in enumerate(tasks):
+        file_path, _, edital_name = task
+        if manifest is not None and manifest.is_unchanged(file_path, edital_name, threshold, config):
+            reused.add(index)
+        else:
+            pending.append((index, task))
+    return reused, pending
 
-# Verifica se input_docs tem subpastas (editais) ou arquivos diretos
-has_subdirs = any(os.path.isdir(os.path.join(input_dir, item)) for item in os.listdir(input_dir))
+def group_results_by_edital(edital_names, results):
+    """Agrupa os resultados por edital preservando a ordem de descoberta"""
+    results_by_edital = {edital_name: [] for edital_name in edital_names}
+    for result in results:
+        results_by_edital[result['edital']].append(result)
+    return results_by_edital
 
-if has_subdirs:
-    # Processa por subpastas (editais)
-    for edital_name in os.listdir(input_dir):
-        edital_path = os.path.join(input_dir, edital_name)
-        
-        if os.path.isdir(edital_path):
-            print(f"\n🏛️ Processando Edital: {edital_name}")
-            results_by_edital[edital_name] = []
-            
-            for filename in os.listdir(edital_path):
-                if filename.endswith(('.pdf', '.jpeg', '.jpg', '.png')):
-                    # Encontra o JSON correspondente
-                    json_filename = filename.rsplit('.', 1)[0] + '.json'
-                    json_path = os.path.join(edital_path, json_filename)
-                    
-                    if os.path.exists(json_path):
-                        # Carrega dados do JSON
-                        with open(json_path, 'r', encoding='utf-8') as f:
-                            json_data = json.load(f)
-                        
-                        # Processa o documento
-                        file_path = os.path.join(edital_path, filename)
-                        result = process_document(file_path, json_data, ocr, edital_name)
-                        results_by_edital[edital_name].append(result)
-                        all_results.append(result)
-else:
-    # Modo compatibilidade: processa arquivos diretos em input_docs
-    print("📁 Processando arquivos diretamente em input_docs (modo compatibilidade)")
-    results_by_edital['root'] = []
-    
-    for filename in os.listdir(input_dir):
-        if filename.endswith(('.pdf', '.jpeg', '.jpg', '.png')):
-            # Encontra o JSON correspondente
-            json_filename = filename.rsplit('.', 1)[0] + '.json'
-            json_path = os.path.join(input_dir, json_filename)
-            
-            if os.path.exists(json_path):
-                # Carrega dados do JSON
-                with open(json_path, 'r', encoding='utf-8') as f:
-                    json_data = json.load(f)
-                
-                # Processa o documento
-                file_path = os.path.join(input_dir, filename)
-                result = process_document(file_path, json_data, ocr, 'root')
-                results_by_edital['root'].append(result)
-                all_results.append(result)
-
-# Calcula estatísticas por edital
-edital_stats = calculate_edital_stats(results_by_edital)
-
-# Gera relatório detalhado em TXT
-nome_arquivo_saida = 'resultado_ocr_completo.txt'
-with open(nome_arquivo_saida, 'w', encoding='utf-8') as arquivo:
+def write_txt_header(arquivo, edital_stats, total_documentos):
+    """Escreve o cabeçalho e o resumo por edital do relatório TXT"""
     arquivo.write("=== RESULTADO DO OCR - ANÁLISE COMPLETA POR EDITAL ===\n\n")
     arquivo.write(f"Data do processamento: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}\n")
     arquivo.write(f"Total de editais processados: {len(edital_stats)}\n")
-    arquivo.write(f"Total de documentos processados: {len(all_results)}\n\n")
+    arquivo.write(f"Total de documentos processados: {total_documentos}\n\n")
     
     # Resumo por edital
     arquivo.write("=== RESUMO POR EDITAL ===\n\n")
@@ -498,105 +3455,151 @@ with open(nome_arquivo_saida, 'w', encoding='utf-8') as arquivo:
         arquivo.write(f"  🔍 Campos totais: {stats['total_fields']}\n")
         arquivo.write(f"  ✅ Campos encontrados: {stats['fields_found']}\n")
         arquivo.write(f"  📊 Taxa de sucesso: {stats['success_rate']:.1f}%\n\n")
+
+def write_txt_edital_header(arquivo, edital_name):
+    """Escreve o título da seção de detalhes de um edital no relatório TXT"""
+    display_name = "Arquivos Diretos" if edital_name == 'root' else edital_name
+    arquivo.write(f"\n{'='*60}\n")
+    arquivo.write(f"EDITAL: {display_name}\n")
+    arquivo.write(f"{'='*60}\n\n")
+
+def write_txt_document(arquivo, i, result):
+    """Escreve a seção detalhada de um documento no relatório TXT"""
+    arquivo.write(f"=== DOCUMENTO {i}: {os.path.basename(result['file_path'])} ===\n\n")
+    if 'error' in result:
+        arquivo.write(f"⚠️ ERRO: {result['error']}\n\n")
+    if result.get('time_budget', {}).get('status') == 'degradado':
+        budget = result['time_budget']
+        arquivo.write(f"⏱️ ORÇAMENTO DE TEMPO ESGOTADO: refeito no caminho degradado (até {budget['max_pages']} "
+                      f"página(s), resolução × {budget['render_scale']}, sem classificador de ângulo)\n\n")
     
-    # Detalhes por edital
-    for edital_name, stats in edital_stats.items():
-        display_name = "Arquivos Diretos" if edital_name == 'root' else edital_name
-        arquivo.write(f"\n{'='*60}\n")
-        arquivo.write(f"EDITAL: {display_name}\n")
-        arquivo.write(f"{'='*60}\n\n")
+    # Dados esperados do JSON
+    arquivo.write("DADOS ESPERADOS (JSON):\n")
+    for key, value in result['json_data'].items():
+        arquivo.write(f"  {key}: {value}\n")
+    arquivo.write("\n")
+    
+    # Resultados dos matches
+    arquivo.write("RESULTADOS DOS MATCHES:\n")
+    for field, match_info in result['matches'].items():
+        status = "✅ ENCONTRADO" if match_info['found'] else "❌ NÃO ENCONTRADO"
+        arquivo.write(f"  {field}: {status}\n")
+        arquivo.write(f"    Esperado: {match_info['expected']}\n")
+        if match_info['found']:
+            arquivo.write(f"    Extraído: {match_info['extracted']}\n")
+            arquivo.write(f"    Similaridade: {match_info['similarity']:.2%}\n")
+            arquivo.write(f"    Confiança OCR: {match_info['ocr_confidence']:.2%}\n")
+        arquivo.write("\n")
+    
+    # Todos os textos extraídos
+    arquivo.write("TODOS OS TEXTOS EXTRAÍDOS:\n")
+    for j, text_info in enumerate(result['extracted_texts'], 1):
+        arquivo.write(f"  {j:03d}. {text_info['text']} (Confiança: {text_info['confidence']:.2%})\n")
+    
+    arquivo.write("\n" + "="*50 + "\n\n")
+
+def write_txt_report(edital_stats, all_results, nome_arquivo_saida):
+    """Gera o relatório detalhado em TXT"""
+    with open(nome_arquivo_saida, 'w', encoding='utf-8') as arquivo:
+        write_txt_header(arquivo, edital_stats, len(all_results))
         
-        for i, result in enumerate(stats['results'], 1):
-            arquivo.write(f"=== DOCUMENTO {i}: {os.path.basename(result['file_path'])} ===\n\n")
-            
-            # Dados esperados do JSON
-            arquivo.write("DADOS ESPERADOS (JSON):\n")
-            for key, value in result['json_data'].items():
-                arquivo.write(f"  {key}: {value}\n")
-            arquivo.write("\n")
-            
-            # Resultados dos matches
-            arquivo.write("RESULTADOS DOS MATCHES:\n")
-            for field, match_info in result['matches'].items():
-                status = "✅ ENCONTRADO" if match_info['found'] else "❌ NÃO ENCONTRADO"
-                arquivo.write(f"  {field}: {status}\n")
-                arquivo.write(f"    Esperado: {match_info['expected']}\n")
-                if match_info['found']:
-                    arquivo.write(f"    Extraído: {match_info['extracted']}\n")
-                    arquivo.write(f"    Similaridade: {match_info['similarity']:.2%}\n")
-                    arquivo.write(f"    Confiança OCR: {match_info['ocr_confidence']:.2%}\n")
-                arquivo.write("\n")
-            
-            # Todos os textos extraídos
-            arquivo.write("TODOS OS TEXTOS EXTRAÍDOS:\n")
-            for j, text_info in enumerate(result['extracted_texts'], 1):
-                arquivo.write(f"  {j:03d}. {text_info['text']} (Confiança: {text_info['confidence']:.2%})\n")
-            
-            arquivo.write("\n" + "="*50 + "\n\n")
-
-# Gera arquivos JSON individuais para cada documento
-output_dir = 'resultados_json'
-os.makedirs(output_dir, exist_ok=True)
-
-# Gera JSON consolidado por edital
-edital_consolidado_path = os.path.join(output_dir, 'resumo_por_edital.json')
-edital_consolidado = {
-    "data_processamento": datetime.now().strftime('%d/%m/%Y %H:%M:%S'),
-    "total_editais": len(edital_stats),
-    "total_documentos": len(all_results),
-    "estatisticas_por_edital": {}
-}
-
-for edital_name, stats in edital_stats.items():
-    display_name = "arquivos_diretos" if edital_name == 'root' else edital_name
-    edital_consolidado["estatisticas_por_edital"][display_name] = {
-        "nome_edital": "Arquivos Diretos" if edital_name == 'root' else edital_name,
-        "total_documentos": stats['total_documents'],
-        "total_campos": stats['total_fields'],
-        "campos_encontrados": stats['fields_found'],
-        "taxa_sucesso_percentual": f"{stats['success_rate']:.1f}%",
-        "taxa_sucesso_decimal": round(stats['success_rate'] / 100, 3)
+        # Detalhes por edital
+        for edital_name, stats in edital_stats.items():
+            write_txt_edital_header(arquivo, edital_name)
+            for i, result in enumerate(stats['results'], 1):
+                write_txt_document(arquivo, i, result)
+
+def build_edital_summary(edital_stats, total_documentos):
+    """Monta o JSON consolidado por edital"""
+    edital_consolidado = {
+        "data_processamento": datetime.now().strftime('%d/%m/%Y %H:%M:%S'),
+        "total_editais": len(edital_stats),
+        "total_documentos": total_documentos,
+        "estatisticas_por_edital": {}
     }
+    
+    for edital_name, stats in edital_stats.items():
+        display_name = "arquivos_diretos" if edital_name == 'root' else edital_name
+        edital_consolidado["estatisticas_por_edital"][display_name] = {
+            "nome_edital": "Arquivos Diretos" if edital_name == 'root' else edital_name,
+            "total_documentos": stats['total_documents'],
+            "total_campos": stats['total_fields'],
+            "campos_encontrados": stats['fields_found'],
+            "taxa_sucesso_percentual": f"{stats['success_rate']:.1f}%",
+            "taxa_sucesso_decimal": round(stats['success_rate'] / 100, 3)
+        }
+        if 'orientation' in stats:
+            counters = stats['orientation']
+            edital_consolidado["estatisticas_por_edital"][display_name]["orientacao"] = {
+                "paginas_com_classificador": counters['pages_with_classifier'],
+                "paginas_sem_classificador": counters['pages_without_classifier'],
+                "segundos_ocr_com_classificador": round(counters['seconds_with_classifier'], 3),
+                "segundos_ocr_sem_classificador": round(counters['seconds_without_classifier'], 3),
+                "tempo_economizado_segundos": round(counters['saved_seconds'], 3)
+            }
+    
+    return edital_consolidado
 
-with open(edital_consolidado_path, 'w', encoding='utf-8') as json_file:
-    json.dump(edital_consolidado, json_file, ensure_ascii=False, indent=2)
+def build_sweep_summary(thresholds, stats_by_threshold, total_documentos):
+    """Monta o JSON da varredura: por edital, campos encontrados e taxa de sucesso de cada threshold"""
+    varredura = {
+        "data_processamento": datetime.now().strftime('%d/%m/%Y %H:%M:%S'),
+        "total_documentos": total_documentos,
+        "thresholds": list(thresholds),
+        "estatisticas_por_edital": {}
+    }
+    
+    for edital_name in (stats_by_threshold[0] if stats_by_threshold else {}):
+        display_name = "arquivos_diretos" if edital_name == 'root' else edital_name
+        first = stats_by_threshold[0][edital_name]
+        varredura["estatisticas_por_edital"][display_name] = {
+            "nome_edital": "Arquivos Diretos" if edital_name == 'root' else edital_name,
+            "total_documentos": first['total_documents'],
+            "total_campos": first['total_fields'],
+            "campos_encontrados": [stats[edital_name]['fields_found'] for stats in stats_by_threshold],
+            "taxa_sucesso_decimal": [round(stats[edital_name]['success_rate'] / 100, 3) for stats in stats_by_threshold]
+        }
+    
+    return varredura
 
-print(f"📊 Resumo por edital salvo: {edital_consolidado_path}")
+def write_pdf_report(edital_consolidado, edital_consolidado_path):
+    """Gera o relatório PDF baseado no JSON consolidado"""
+    if pdf_available():
+        try:
+            # Define o caminho do PDF
+            pdf_path = edital_consolidado_path.replace('.json', '_relatorio.pdf')
+            
+            # Gera o PDF
+            generate_pdf_report(edital_consolidado, pdf_path)
+            print(f"📄 Relatório PDF gerado: {pdf_path}")
+            
+            # Exibe informações sobre o arquivo gerado
+            if os.path.exists(pdf_path):
+                file_size = os.path.getsize(pdf_path)
+                print(f"📏 Tamanho do arquivo PDF: {file_size:,} bytes ({file_size/1024:.1f} KB)")
+            
+        except Exception as e:
+            print(f"⚠️ Erro ao gerar PDF: {e}")
+            print("💡 Certifique-se de que as dependências estão instaladas: pip install reportlab")
+    else:
+        print("💡 Para gerar relatório PDF, instale as dependências: pip install reportlab")
 
-# Gera o relatório PDF baseado no JSON consolidado
-if PDF_AVAILABLE:
-    try:
-        # Define o caminho do PDF
-        pdf_path = edital_consolidado_path.replace('.json', '_relatorio.pdf')
-        
-        # Gera o PDF
-        generate_pdf_report(edital_consolidado, pdf_path)
-        print(f"📄 Relatório PDF gerado: {pdf_path}")
-        
-        # Exibe informações sobre o arquivo gerado
-        if os.path.exists(pdf_path):
-            file_size = os.path.getsize(pdf_path)
-            print(f"📏 Tamanho do arquivo PDF: {file_size:,} bytes ({file_size/1024:.1f} KB)")
-        
-    except Exception as e:
-        print(f"⚠️ Erro ao gerar PDF: {e}")
-        print("💡 Certifique-se de que as dependências estão instaladas: pip install reportlab")
-else:
-    print("💡 Para gerar relatório PDF, instale as dependências: pip install reportlab")
-
-# Gera JSONs individuais por documento
-for result in all_results:
+def document_json_filename(result):
+    """Nome do JSON individual de um documento (prefixado pelo edital)"""
     filename = os.path.basename(result['file_path'])
     edital_prefix = "" if result['edital'] == 'root' else f"{result['edital']}_"
-    json_filename = f"{edital_prefix}{filename.rsplit('.', 1)[0]}_resultado.json"
-    json_path = os.path.join(output_dir, json_filename)
+    return f"{edital_prefix}{filename.rsplit('.', 1)[0]}_resultado.json"
+
+def document_json_view(result, processed_at=None):
+    """Monta o conteúdo do JSON individual de um documento (data de processamento padrão: agora)"""
+    filename = os.path.basename(result['file_path'])
     
     # Prepara dados para JSON
     json_data = {
         "arquivo_processado": filename,
         "edital": "Arquivos Diretos" if result['edital'] == 'root' else result['edital'],
         "caminho_completo": result['file_path'],
-        "data_processamento": datetime.now().strftime('%d/%m/%Y %H:%M:%S'),
+        "data_processamento": processed_at or datetime.now().strftime('%d/%m/%Y %H:%M:%S'),
         "dados_esperados": result['json_data'],
         "resumo_matches": {
             "total_campos": len(result['matches']),
@@ -607,6 +3610,69 @@ for result in all_results:
         "todos_textos_extraidos": []
     }
     
+    # Tempo gasto em cada etapa do processamento deste documento
+    if 'timings' in result:
+        json_data["tempos_etapas_segundos"] = {
+            stage: round(seconds, 4) for stage, seconds in result['timings'].items()
+        }
+    
+    # Resolução adaptativa: fator da primeira passagem e onde rodou a segunda
+    if 'adaptive' in result:
+        json_data["resolucao_adaptativa"] = {
+            "fator_reducao": result['adaptive']['downscale'],
+            "segunda_passagem": result['adaptive']['second_pass'],
+            "paginas_segunda_passagem": result['adaptive']['pages'],
+            "campos_por_passagem": {
+                str(number): sum(1 for match in result['matches'].values() if match.get('pass') == number)
+                for number in (1, 2)
+            }
+        }
+    
+    # Modelos de layout: 'modelo' (só as regiões dos campos) ou 'completo' (página inteira)
+    if 'layout' in result:
+        json_data["modelo_layout"] = result['layout']
+    
+    # Memória: pico de RSS do processo durante o documento e nova tentativa em resolução reduzida
+    if 'memory' in result:
+        json_data["memoria"] = {"pico_rss_mb": result['memory']['peak_rss_mb']}
+        if 'render_scale' in result:
+            json_data["memoria"]["nova_tentativa_fator_resolucao"] = result['render_scale']
+    if 'error' in result:
+        json_data["erro"] = result['error']
+    
+    # Orçamento de tempo: documento refeito no caminho degradado ou sem texto (esgotado)
+    if 'time_budget' in result:
+        json_data["orcamento_tempo"] = {"situacao": result['time_budget']['status']}
+        if result['time_budget']['status'] == 'degradado':
+            json_data["orcamento_tempo"].update({
+                "max_paginas": result['time_budget']['max_pages'],
+                "fator_resolucao": result['time_budget']['render_scale'],
+                "classificador_angulo": result['time_budget']['angle_classifier']
+            })
+    
+    # Política de orientação: OCR com ou sem o classificador de ângulo
+    if 'orientation' in result:
+        json_data["orientacao"] = {
+            "classificador_angulo": result['orientation']['classifier'],
+            "paginas": result['orientation']['pages'],
+            "tempo_economizado_segundos": round(result['orientation']['saved_seconds'], 4),
+            "classificador_retomado": result['orientation']['switched_back']
+        }
+    
+    # Triagem de páginas: quantas foram dispensadas do OCR
+    if 'page_screening' in result:
+        json_data["triagem_paginas"] = {
+            "em_branco": result['page_screening']['em_branco'],
+            "duplicadas": result['page_screening']['duplicada']
+        }
+    
+    # Modo streaming: registra quantas páginas passaram pelo OCR
+    if 'pages_processed' in result:
+        json_data["paginas"] = {
+            "paginas_processadas": result['pages_processed'],
+            "total_paginas": result['total_pages']
+        }
+    
     # Adiciona detalhes dos matches
     for field, match_info in result['matches'].items():
         json_data["detalhes_matches"][field] = {
@@ -616,35 +3682,1329 @@ for result in all_results:
             "similaridade_percentual": f"{match_info['similarity']:.1%}",
             "confianca_ocr_percentual": f"{match_info['ocr_confidence']:.1%}",
             "similaridade_decimal": round(match_info['similarity'], 3),
-            "confianca_ocr_decimal": round(match_info['ocr_confidence'], 3)
+            "confianca_ocr_decimal": round(match_info['ocr_confidence'], 3),
+            "metodo_busca": match_info.get('matcher')
         }
+        if 'pass' in match_info:
+            json_data["detalhes_matches"][field]["passagem"] = match_info['pass']
     
     # Adiciona todos os textos extraídos
     for text_info in result['extracted_texts']:
-        json_data["todos_textos_extraidos"].append({
+        text_entry = {
             "texto": text_info['text'],
             "confianca_percentual": f"{text_info['confidence']:.1%}",
             "confianca_decimal": round(text_info['confidence'], 3)
-        })
+        }
+        if 'page' in text_info:
+            text_entry["pagina"] = text_info['page']
+        json_data["todos_textos_extraidos"].append(text_entry)
+    
+    return json_data
+
+def write_document_json(result, output_dir, processed_at=None):
+    """Gera o JSON individual de um documento"""
+    json_path = os.path.join(output_dir, document_json_filename(result))
+    write_json_batch([(json_path, document_json_view(result, processed_at))])
+
+def write_json_batch(batch):
+    """Grava um lote de JSONs individuais já montados: [(caminho, conteúdo)]"""
+    for json_path, json_data in batch:
+        with open(json_path, 'w', encoding='utf-8') as json_file:
+            json.dump(json_data, json_file, ensure_ascii=False, indent=2)
+        
+        print(f"📄 JSON salvo: {json_path}")
+
+def write_document_jsons(all_results, output_dir):
+    """Gera os JSONs individuais por documento"""
+    for result in all_results:
+        write_document_json(result, output_dir)
+
+# Colunas do formato colunar: (nome, typecode do módulo array). As colunas de
+# *_offset/*_start têm um item a mais (início de cada registro e fim do último)
+COLUMNAR_COLUMNS = (
+    ('doc_edital', 'I'), ('doc_line_start', 'Q'), ('doc_match_start', 'Q'),
+    ('doc_meta_offset', 'Q'), ('doc_meta', 'B'),
+    ('line_text_offset', 'Q'), ('line_text', 'B'), ('line_doc', 'I'), ('line_confidence', 'f'),
+    ('line_page', 'i'), ('line_box', 'i'), ('line_pass', 'b'),
+    ('match_doc', 'I'), ('match_field', 'I'), ('match_found', 'B'), ('match_similarity', 'f'),
+    ('match_confidence', 'f'), ('match_text_offset', 'Q'), ('match_text', 'B'), ('match_matcher', 'i'),
+    ('match_page', 'i'), ('match_box', 'i'), ('match_pass', 'b')
+)
+COLUMNAR_MAGIC = b'OCRCOL1\0'
+# Caixa ausente (linha ou match sem 'box')
+COLUMNAR_NO_BOX = (-1, -1, -1, -1)
+
+def _align8(offset):
+    return (offset + 7) // 8 * 8
+
+def _from_float32(value):
+    """Menor decimal que representa o float32 lido (0.8695 volta como 0.8695, não 0.86949998)"""
+    for digits in range(6, 10):
+        candidate = float(f"{value:.{digits}g}")
+        if array.array('f', [candidate])[0] == value:
+            return candidate
+    return value
+
+class ColumnarWriter:
+    """Grava os resultados de todos os documentos em um único arquivo colunar.
+
+    Linhas e matches viram colunas (texto em um único buffer UTF-8 com
+    offsets, confianças e similaridades em float32, ids de documento, edital,
+    campo e método de busca); o restante do resultado (JSON esperado, tempos,
+    páginas...) fica em um JSON compacto por documento. Cada coluna é
+    acumulada em um arquivo temporário à medida que os documentos chegam e o
+    arquivo final é montado em close(): cabeçalho JSON seguido das colunas,
+    alinhadas em 8 bytes, lidas por ColumnarStore com mmap.
+    """
+    
+    def __init__(self, path):
+        self.path = path
+        self.documents = 0
+        self._tables = {'editais': {}, 'campos': {}, 'metodos': {}}
+        self._columns = {name: (typecode, tempfile.TemporaryFile()) for name, typecode in COLUMNAR_COLUMNS}
+        self._counts = Counter()
+        self._ends = Counter()
+        for name in ('doc_line_start', 'doc_match_start', 'doc_meta_offset', 'line_text_offset', 'match_text_offset'):
+            self._append(name, [0])
+    
+    def _append(self, name, values):
+        typecode, spill = self._columns[name]
+        array.array(typecode, values).tofile(spill)
+        self._counts[name] += len(values)
+    
+    def _append_bytes(self, name, offsets_name, texts):
+        """Acrescenta textos ao buffer UTF-8 da coluna e o fim de cada um à coluna de offsets"""
+        ends = []
+        for text in texts:
+            data = text.encode('utf-8')
+            self._columns[name][1].write(data)
+            self._counts[name] += len(data)
+            ends.append(self._counts[name])
+        self._append(offsets_name, ends)
     
-    # Salva o JSON
-    with open(json_path, 'w', encoding='utf-8') as json_file:
-        json.dump(json_data, json_file, ensure_ascii=False, indent=2)
+    def _id(self, table, value):
+        return self._tables[table].setdefault(value, len(self._tables[table]))
     
-    print(f"📄 JSON salvo: {json_path}")
+    def add(self, result, processed_at=None):
+        """Acrescenta um documento (mesmo formato de process_document)"""
+        doc = self.documents
+        texts = result['extracted_texts']
+        matches = result['matches']
+        
+        self._append('doc_edital', [self._id('editais', result['edital'])])
+        self._append_bytes('line_text', 'line_text_offset', [text_info['text'] for text_info in texts])
+        self._append('line_doc', [doc] * len(texts))
+        self._append('line_confidence', [float(text_info['confidence']) for text_info in texts])
+        self._append('line_page', [text_info.get('page') or -1 for text_info in texts])
+        self._append('line_box', [value for text_info in texts for value in (text_info.get('box') or COLUMNAR_NO_BOX)])
+        self._append('line_pass', [text_info.get('pass', 0) for text_info in texts])
+        
+        self._append('match_doc', [doc] * len(matches))
+        self._append('match_field', [self._id('campos', field) for field in matches])
+        self._append('match_found', [int(match['found']) for match in matches.values()])
+        self._append('match_similarity', [float(match['similarity']) for match in matches.values()])
+        self._append('match_confidence', [float(match['ocr_confidence']) for match in matches.values()])
+        self._append_bytes('match_text', 'match_text_offset', [match['extracted'] or '' for match in matches.values()])
+        self._append('match_matcher', [-1 if match['matcher'] is None else self._id('metodos', match['matcher'])
+                                       for match in matches.values()])
+        self._append('match_page', [match.get('page') or -1 for match in matches.values()])
+        self._append('match_box', [value for match in matches.values() for value in (match.get('box') or COLUMNAR_NO_BOX)])
+        self._append('match_pass', [match.get('pass', 0) for match in matches.values()])
+        
+        # Demais chaves do resultado (JSON esperado, tempos, modos...) em JSON compacto
+        meta = {key: value for key, value in result.items() if key not in ('extracted_texts', 'matches', 'edital')}
+        meta['data_processamento'] = processed_at or datetime.now().strftime('%d/%m/%Y %H:%M:%S')
+        self._append_bytes('doc_meta', 'doc_meta_offset',
+                           [json.dumps(meta, ensure_ascii=False, separators=(',', ':'), default=_json_default)])
+        self._append('doc_line_start', [self._counts['line_doc']])
+        self._append('doc_match_start', [self._counts['match_doc']])
+        self.documents += 1
+    
+    def close(self):
+        """Monta o arquivo final (gravado em um temporário e renomeado) e retorna o caminho"""
+        columns = {}
+        offset = 0
+        for name, typecode in COLUMNAR_COLUMNS:
+            columns[name] = {'tipo': typecode, 'offset': offset, 'itens': self._counts[name]}
+            offset = _align8(offset + self._counts[name] * array.array(typecode).itemsize)
+        header = json.dumps({
+            'versao': 1,
+            'byteorder': sys.byteorder,
+            'documentos': self.documents,
+            **{table: list(values) for table, values in self._tables.items()},
+            'colunas': columns
+        }, ensure_ascii=False).encode('utf-8')
+        
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(COLUMNAR_MAGIC + len(header).to_bytes(8, 'little') + header)
+            f.write(b'\0' * (_align8(f.tell()) - f.tell()))
+            data_start = f.tell()
+            for name, _ in COLUMNAR_COLUMNS:
+                spill = self._columns[name][1]
+                f.write(b'\0' * (data_start + columns[name]['offset'] - f.tell()))
+                spill.seek(0)
+                shutil.copyfileobj(spill, f)
+                spill.close()
+        os.replace(tmp_path, self.path)
+        return self.path
 
-# Relatório resumido no console
-print(f"\n=== RELATÓRIO RESUMIDO POR EDITAL ===")
-print(f"Total de editais: {len(edital_stats)}")
-print(f"Total de documentos: {len(all_results)}")
+class ColumnarStore:
+    """Leitura de um arquivo gravado por ColumnarWriter, com mmap.
 
-for edital_name, stats in edital_stats.items():
-    display_name = "Arquivos Diretos" if edital_name == 'root' else edital_name
-    print(f"\n🏛️ {display_name}:")
-    print(f"  📄 Documentos: {stats['total_documents']}")
-    print(f"  ✅ Taxa de sucesso: {stats['success_rate']:.1f}%")
-    print(f"  🔍 Campos: {stats['fields_found']}/{stats['total_fields']}")
-
-print(f"\n📊 Relatório detalhado salvo em: {nome_arquivo_saida}")
-print(f"📊 Resumo por edital salvo em: {edital_consolidado_path}")
-print(f"🔍 Processamento concluído com sucesso!")
\ No newline at end of file
+    As colunas são memoryviews sobre o arquivo mapeado (nada é copiado até
+    ser acessado); result(i) reconstrói o resultado do documento i no formato
+    de process_document, a partir do qual document_json_view gera o JSON
+    individual. Confianças e similaridades voltam em float32.
+    """
+    
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:8] != COLUMNAR_MAGIC:
+            self.close()
+            raise ValueError(f"Arquivo colunar inválido: {path}")
+        header_length = int.from_bytes(self._map[8:16], 'little')
+        self.header = json.loads(self._map[16:16 + header_length])
+        if self.header['byteorder'] != sys.byteorder:
+            self.close()
+            raise ValueError(f"Arquivo colunar gravado com outra ordem de bytes ({self.header['byteorder']}): {path}")
+        
+        data_start = _align8(16 + header_length)
+        self._view = memoryview(self._map)
+        self.columns = {}
+        for name, column in self.header['colunas'].items():
+            start = data_start + column['offset']
+            size = column['itens'] * array.array(column['tipo']).itemsize
+            self.columns[name] = self._view[start:start + size].cast(column['tipo'])
+    
+    def __len__(self):
+        return self.header['documentos']
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+    
+    def close(self):
+        for column in getattr(self, 'columns', {}).values():
+            column.release()
+        if getattr(self, '_view', None) is not None:
+            self._view.release()
+            self._view = None
+        self._map.close()
+        self._file.close()
+    
+    def _text(self, name, index):
+        offsets = self.columns[f"{name}_offset"]
+        return bytes(self.columns[name][offsets[index]:offsets[index + 1]]).decode('utf-8')
+    
+    def meta(self, index):
+        """Chaves do resultado do documento `index` fora das colunas (file_path, json_data, timings...)"""
+        return json.loads(self._text('doc_meta', index))
+    
+    def edital(self, index):
+        return self.header['editais'][self.columns['doc_edital'][index]]
+    
+    def result(self, index):
+        """Retorna (resultado, data de processamento) do documento `index` (ordem de gravação)"""
+        columns = self.columns
+        meta = self.meta(index)
+        processed_at = meta.pop('data_processamento')
+        
+        extracted_texts = []
+        for line in range(columns['doc_line_start'][index], columns['doc_line_start'][index + 1]):
+            text_info = {'text': self._text('line_text', line),
+                         'confidence': _from_float32(columns['line_confidence'][line])}
+            if columns['line_box'][4 * line] != -1:
+                text_info['box'] = list(columns['line_box'][4 * line:4 * line + 4])
+            if columns['line_page'][line] != -1:
+                text_info['page'] = columns['line_page'][line]
+            if columns['line_pass'][line]:
+                text_info['pass'] = columns['line_pass'][line]
+            extracted_texts.append(text_info)
+        
+        matches = {}
+        for row in range(columns['doc_match_start'][index], columns['doc_match_start'][index + 1]):
+            field = self.header['campos'][columns['match_field'][row]]
+            found = bool(columns['match_found'][row])
+            matcher = columns['match_matcher'][row]
+            match = {
+                'found': found,
+                'expected': meta['json_data'][field],
+                'extracted': self._text('match_text', row) if found else None,
+                'similarity': _from_float32(columns['match_similarity'][row]),
+                'ocr_confidence': _from_float32(columns['match_confidence'][row]),
+                'matcher': None if matcher == -1 else self.header['metodos'][matcher]
+            }
+            if columns['match_box'][4 * row] != -1:
+                match['box'] = list(columns['match_box'][4 * row:4 * row + 4])
+            if columns['match_page'][row] != -1:
+                match['page'] = columns['match_page'][row]
+            if columns['match_pass'][row]:
+                match['pass'] = columns['match_pass'][row]
+            matches[field] = match
+        
+        result = {
+            **meta,
+            'edital': self.edital(index),
+            'extracted_texts': extracted_texts,
+            'matches': matches
+        }
+        return result, processed_at
+    
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self.result(index)
+
+class StreamingReportWriter:
+    """Grava os relatórios à medida que cada documento é concluído.
+
+    A seção detalhada de cada documento vai para um arquivo parcial e o JSON
+    individual é montado na hora e gravado em lotes de JSON_WRITE_BATCH por
+    threads de E/S; do lote inteiro só ficam em memória os contadores por
+    edital (e os poucos lotes ainda não gravados). Ao final, o TXT é montado com o cabeçalho (que
+    depende dos totais) seguido do conteúdo parcial. Os resultados devem
+    chegar na ordem de descoberta, como os gera iter_documents. Com
+    output_format 'colunar', os resultados vão para um único arquivo
+    colunar (ColumnarWriter) em vez dos JSONs individuais.
+    """
+    
+    def __init__(self, txt_path, output_dir, edital_names, output_format='json'):
+        self.txt_path = txt_path
+        self.output_dir = output_dir
+        self._columnar = None
+        self._json_executor = None
+        if output_format == 'colunar':
+            self._columnar = ColumnarWriter(os.path.join(output_dir, COLUMNAR_FILENAME))
+        else:
+            self._json_executor = ThreadPoolExecutor(max_workers=IO_THREADS)
+        self._json_batch = []
+        self._json_writes = deque()
+        self.edital_names = list(edital_names)
+        self.edital_stats = new_edital_stats(self.edital_names)
+        self.total_documents = 0
+        self._body_path = f"{txt_path}.parcial"
+        self._body = open(self._body_path, 'w', encoding='utf-8')
+        self._positions = {edital_name: i for i, edital_name in enumerate(self.edital_names)}
+        self._next_edital = 0
+    
+    def _open_editais_until(self, stop):
+        """Escreve os títulos dos editais anteriores à posição `stop` (inclusive os sem documentos)"""
+        while self._next_edital < stop:
+            write_txt_edital_header(self._body, self.edital_names[self._next_edital])
+            self._next_edital += 1
+    
+    def add(self, result):
+        """Grava a seção TXT e o JSON individual de um documento e atualiza os contadores"""
+        edital_name = result['edital']
+        position = self._positions[edital_name]
+        if position >= self._next_edital:
+            self._open_editais_until(position + 1)
+        
+        add_result_to_stats(self.edital_stats, result)
+        self.total_documents += 1
+        write_txt_document(self._body, self.edital_stats[edital_name]['total_documents'], result)
+        if self._columnar is not None:
+            self._columnar.add(result)
+        else:
+            # O conteúdo é montado agora: o resultado pode mudar depois de entregue
+            json_path = os.path.join(self.output_dir, document_json_filename(result))
+            self._json_batch.append((json_path, document_json_view(result)))
+            if len(self._json_batch) >= JSON_WRITE_BATCH:
+                self._flush_jsons(IO_THREADS)
+    
+    def _flush_jsons(self, max_pending):
+        """Envia o lote atual às threads de E/S e espera até restarem no máximo `max_pending` lotes"""
+        if self._json_batch:
+            self._json_writes.append(self._json_executor.submit(write_json_batch, self._json_batch))
+            self._json_batch = []
+        while len(self._json_writes) > max_pending:
+            self._json_writes.popleft().result()
+    
+    def close(self):
+        """Finaliza o TXT e retorna as estatísticas por edital"""
+        self._open_editais_until(len(self.edital_names))
+        self._body.close()
+        if self._json_executor is not None:
+            self._flush_jsons(0)
+            self._json_executor.shutdown()
+        
+        with open(self.txt_path, 'w', encoding='utf-8') as arquivo:
+            write_txt_header(arquivo, self.edital_stats, self.total_documents)
+            with open(self._body_path, 'r', encoding='utf-8') as body:
+                shutil.copyfileobj(body, arquivo)
+        os.remove(self._body_path)
+        
+        if self._columnar is not None:
+            columnar_path = self._columnar.close()
+            print(f"🗜️ Resultados de {self._columnar.documents} documento(s) salvos em formato colunar: {columnar_path}")
+        return self.edital_stats
+
+def percentile(sorted_values, quantile):
+    """Percentil pelo método nearest-rank (lista já ordenada)"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(quantile * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+def _prometheus_label(value):
+    """Escapa um valor de label no formato texto do Prometheus"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+class RunMetrics:
+    """Tempos por etapa de cada documento, agregados por edital.
+
+    Cada documento traz em result['timings'] os segundos gastos por etapa
+    (cache, rasterizacao, ocr, matching, escrita...). Ao final são calculados
+    p50/p95/p99 por etapa e documentos/segundo por edital, exportados em JSON
+    e no formato texto do Prometheus. Etapas da execução como um todo
+    (descoberta, relatórios) ficam em `run_timings`; páginas dispensadas pela
+    triagem (--screen-pages) são somadas em `skipped_pages` e o maior pico de
+    memória de um documento fica em `peak_rss_mb`. Os desfechos do orçamento
+    de tempo são contados em `time_budget` e os SLOWEST_DOCUMENTS documentos
+    mais lentos ficam guardados para o resumo.
+    """
+    
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.run_timings = {}
+        self.skipped_pages = Counter()
+        self.time_budget = Counter()
+        self.peak_rss_mb = None
+        self.peak_rss_document = None
+        self._stages_by_edital = defaultdict(lambda: defaultdict(list))
+        # Heap mínimo (segundos, caminho, desfecho do orçamento) dos documentos mais lentos
+        self._slowest = []
+    
+    def add(self, result):
+        stages = self._stages_by_edital[result['edital']]
+        timings = result.get('timings', {})
+        for stage, seconds in timings.items():
+            stages[stage].append(seconds)
+        total = sum(timings.values())
+        stages['total'].append(total)
+        self.skipped_pages.update(result.get('page_screening', {}))
+        status = result.get('time_budget', {}).get('status')
+        if status is not None:
+            self.time_budget[status] += 1
+        entry = (total, result['file_path'], status)
+        if len(self._slowest) < SLOWEST_DOCUMENTS:
+            heapq.heappush(self._slowest, entry)
+        else:
+            heapq.heappushpop(self._slowest, entry)
+        peak = result.get('memory', {}).get('peak_rss_mb')
+        if peak is not None and (self.peak_rss_mb is None or peak > self.peak_rss_mb):
+            self.peak_rss_mb = peak
+            self.peak_rss_document = result['file_path']
+    
+    def slowest(self):
+        """Documentos mais lentos, do mais lento para o mais rápido: [(segundos, caminho, desfecho do orçamento)]"""
+        return sorted(self._slowest, reverse=True)
+    
+    def summary(self):
+        """Monta o dicionário de métricas (o mesmo gravado em metrics.json)"""
+        elapsed = time.perf_counter() - self.started
+        total_documents = 0
+        editais = {}
+        
+        for edital_name, stages in self._stages_by_edital.items():
+            documents = len(stages['total'])
+            busy = sum(stages['total'])
+            total_documents += documents
+            editais[edital_name] = {
+                'documentos': documents,
+                'tempo_total_segundos': round(busy, 4),
+                # Vazão de um worker: documentos por segundo de processamento efetivo
+                'documentos_por_segundo': round(documents / busy, 4) if busy > 0 else None,
+                'etapas': {
+                    stage: {
+                        'count': len(values),
+                        'soma_segundos': round(sum(values), 4),
+                        **{f"p{int(q * 100)}": round(percentile(sorted(values), q), 4) for q in METRICS_QUANTILES}
+                    }
+                    for stage, values in stages.items()
+                }
+            }
+        
+        return {
+            'data_processamento': datetime.now().strftime('%d/%m/%Y %H:%M:%S'),
+            'tempo_execucao_segundos': round(elapsed, 4),
+            'total_documentos': total_documents,
+            'documentos_por_segundo': round(total_documents / elapsed, 4) if elapsed > 0 else None,
+            'etapas_execucao_segundos': {stage: round(seconds, 4) for stage, seconds in self.run_timings.items()},
+            'paginas_em_branco': self.skipped_pages['em_branco'],
+            'paginas_duplicadas': self.skipped_pages['duplicada'],
+            # Documento com o maior pico de memória (RSS do processo de OCR)
+            'pico_rss_mb': self.peak_rss_mb,
+            'documento_pico_rss': self.peak_rss_document,
+            # Orçamento de tempo: documentos refeitos no caminho degradado e os que ficaram sem texto
+            'documentos_degradados': self.time_budget['degradado'],
+            'documentos_orcamento_esgotado': self.time_budget['esgotado'],
+            'documentos_mais_lentos': [
+                {'arquivo': file_path, 'segundos': round(seconds, 4), 'orcamento_tempo': status}
+                for seconds, file_path, status in self.slowest()
+            ],
+            'editais': editais
+        }
+    
+    def write(self, output_dir):
+        """Grava metrics.json e metrics.prom em output_dir e retorna os caminhos"""
+        summary = self.summary()
+        json_path = os.path.join(output_dir, METRICS_JSON_FILENAME)
+        with open(json_path, 'w', encoding='utf-8') as json_file:
+            json.dump(summary, json_file, ensure_ascii=False, indent=2)
+        
+        lines = [
+            '# HELP ocr_stage_seconds Tempo por documento em cada etapa do processamento',
+            '# TYPE ocr_stage_seconds summary'
+        ]
+        for edital_name, edital in summary['editais'].items():
+            for stage, values in edital['etapas'].items():
+                labels = f'edital="{_prometheus_label(edital_name)}",stage="{_prometheus_label(stage)}"'
+                for q in METRICS_QUANTILES:
+                    lines.append(f'ocr_stage_seconds{{{labels},quantile="{q}"}} {values[f"p{int(q * 100)}"]}')
+                lines.append(f'ocr_stage_seconds_sum{{{labels}}} {values["soma_segundos"]}')
+                lines.append(f'ocr_stage_seconds_count{{{labels}}} {values["count"]}')
+        
+        lines += [
+            '# HELP ocr_edital_documents_per_second Documentos por segundo de processamento efetivo, por edital',
+            '# TYPE ocr_edital_documents_per_second gauge'
+        ]
+        for edital_name, edital in summary['editais'].items():
+            if edital['documentos_por_segundo'] is not None:
+                lines.append(f'ocr_edital_documents_per_second{{edital="{_prometheus_label(edital_name)}"}} '
+                             f'{edital["documentos_por_segundo"]}')
+        
+        lines += [
+            '# HELP ocr_run_seconds Tempo de cada etapa da execução',
+            '# TYPE ocr_run_seconds gauge'
+        ]
+        for stage, seconds in summary['etapas_execucao_segundos'].items():
+            lines.append(f'ocr_run_seconds{{stage="{_prometheus_label(stage)}"}} {seconds}')
+        lines += [
+            '# HELP ocr_run_documents_per_second Documentos por segundo na execução inteira',
+            '# TYPE ocr_run_documents_per_second gauge',
+            f'ocr_run_documents_per_second {summary["documentos_por_segundo"] or 0}',
+            '# HELP ocr_pages_skipped_total Páginas dispensadas do OCR pela triagem',
+            '# TYPE ocr_pages_skipped_total counter',
+            f'ocr_pages_skipped_total{{motivo="em_branco"}} {summary["paginas_em_branco"]}',
+            f'ocr_pages_skipped_total{{motivo="duplicada"}} {summary["paginas_duplicadas"]}',
+            '# HELP ocr_document_peak_rss_megabytes Maior pico de RSS do processo de OCR em um documento',
+            '# TYPE ocr_document_peak_rss_megabytes gauge',
+            f'ocr_document_peak_rss_megabytes {summary["pico_rss_mb"] or 0}',
+            '# HELP ocr_documents_time_budget_total Documentos que estouraram o orçamento de tempo, por desfecho',
+            '# TYPE ocr_documents_time_budget_total counter',
+            f'ocr_documents_time_budget_total{{situacao="degradado"}} {summary["documentos_degradados"]}',
+            f'ocr_documents_time_budget_total{{situacao="esgotado"}} {summary["documentos_orcamento_esgotado"]}'
+        ]
+        
+        prom_path = os.path.join(output_dir, METRICS_PROM_FILENAME)
+        with open(prom_path, 'w', encoding='utf-8') as prom_file:
+            prom_file.write('\n'.join(lines) + '\n')
+        
+        return json_path, prom_path
+
+def profile_document(file_path, output_dir, profiler='cprofile', document_options=None, engine_options=None):
+    """Processa um único documento sob um profiler e grava o perfil em output_dir"""
+    json_path = expected_json_path(file_path)
+    with open(json_path, 'r', encoding='utf-8') as f:
+        json_data = json.load(f)
+    edital_name = os.path.basename(os.path.dirname(file_path)) or 'root'
+    
+    # O modelo é carregado fora do perfil: interessa o custo do documento
+    ocr = create_ocr(engine_options)
+    ocr.load()
+    base_name = os.path.basename(file_path).rsplit('.', 1)[0]
+    
+    if profiler == 'pyinstrument':
+        from pyinstrument import Profiler
+        
+        profile = Profiler()
+        profile.start()
+        process_document(file_path, json_data, ocr, edital_name, **(document_options or {}))
+        profile.stop()
+        profile_path = os.path.join(output_dir, f"perfil_{base_name}.html")
+        with open(profile_path, 'w', encoding='utf-8') as f:
+            f.write(profile.output_html())
+        print(profile.output_text(unicode=True, color=False))
+    else:
+        profile = cProfile.Profile()
+        profile.enable()
+        process_document(file_path, json_data, ocr, edital_name, **(document_options or {}))
+        profile.disable()
+        profile_path = os.path.join(output_dir, f"perfil_{base_name}.prof")
+        profile.dump_stats(profile_path)
+        pstats.Stats(profile).sort_stats('cumulative').print_stats(25)
+    
+    print(f"🔬 Perfil salvo em: {profile_path}")
+    return profile_path
+
+class ServiceBusy(Exception):
+    """Fila do serviço cheia: o cliente deve tentar novamente mais tarde"""
+
+class OCRService:
+    """Workers com o modelo de OCR já carregado consumindo uma fila limitada.
+
+    Cada worker é uma thread com a sua própria instância do OCR (criada na
+    inicialização, antes de aceitar pedidos) e o seu próprio cache. Quando a
+    fila está cheia, submit recusa o pedido com ServiceBusy em vez de
+    acumular memória: é a contrapressão repassada ao cliente (HTTP 503).
+    """
+    
+    def __init__(self, workers=1, queue_size=SERVICE_QUEUE_SIZE, engine_options=None,
+                 cache_options=None, document_options=None):
+        self.document_options = document_options or {}
+        self._jobs = queue.Queue(maxsize=queue_size)
+        self._threads = []
+        self.processed = 0
+        self.failed = 0
+        self._lock = threading.Lock()
+        
+        for i in range(workers):
+            print(f"🔥 Carregando OCR do worker {i + 1}/{workers}")
+            ocr = create_ocr(engine_options)
+            ocr.load()
+            thread = threading.Thread(target=self._work, args=(ocr, create_cache(cache_options, engine_options)),
+                                      name=f"ocr-worker-{i + 1}", daemon=True)
+            self._threads.append(thread)
+        for thread in self._threads:
+            thread.start()
+    
+    def _work(self, ocr, cache):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                break
+            future, file_path, json_data, edital_name, submitted = job
+            waited = time.perf_counter() - submitted
+            try:
+                result = process_document(file_path, json_data, ocr, edital_name, cache=cache,
+                                          **self.document_options)
+                result['timings']['fila'] = waited
+                future.set_result(result)
+                with self._lock:
+                    self.processed += 1
+            except Exception as e:
+                future.set_exception(e)
+                with self._lock:
+                    self.failed += 1
+    
+    def submit(self, file_path, json_data, edital_name='root'):
+        """Enfileira um documento e retorna um Future com o resultado de process_document"""
+        future = Future()
+        try:
+            self._jobs.put_nowait((future, file_path, json_data, edital_name, time.perf_counter()))
+        except queue.Full:
+            raise ServiceBusy(f"Fila cheia ({self._jobs.maxsize} pedidos aguardando)")
+        return future
+    
+    def status(self):
+        return {
+            'workers': len(self._threads),
+            'fila': self._jobs.qsize(),
+            'fila_maxima': self._jobs.maxsize,
+            'processados': self.processed,
+            'falhas': self.failed
+        }
+    
+    def close(self):
+        """Encerra os workers depois dos pedidos já enfileirados"""
+        for _ in self._threads:
+            self._jobs.put(None)
+        for thread in self._threads:
+            thread.join()
+
+class OCRRequestHandler(BaseHTTPRequestHandler):
+    """API HTTP do serviço.
+
+    GET /health: estado da fila. POST /process com JSON
+    {"file_path": ..., "json_data": {...}, "edital": ...}, ou com o documento
+    enviado em "document_base64" + "filename" no lugar de file_path. Responde
+    com o resultado de process_document, 503 se a fila estiver cheia.
+    """
+    
+    service = None
+    
+    def address_string(self):
+        # Em socket Unix o endereço do cliente é uma string vazia
+        return self.client_address[0] if isinstance(self.client_address, tuple) else 'unix'
+    
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload, ensure_ascii=False, default=_json_default).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def do_GET(self):
+        if self.path == '/health':
+            self._send_json(200, self.service.status())
+        else:
+            self._send_json(404, {'erro': f"Rota desconhecida: {self.path}"})
+    
+    def do_POST(self):
+        if self.path != '/process':
+            self._send_json(404, {'erro': f"Rota desconhecida: {self.path}"})
+            return
+        
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            request = json.loads(self.rfile.read(length))
+            json_data = request['json_data']
+            edital_name = request.get('edital', 'root')
+            # Tipos conferidos antes de enfileirar: um pedido malformado não chega a ocupar o OCR
+            if not isinstance(json_data, dict):
+                raise TypeError("json_data deve ser um objeto")
+            if not isinstance(edital_name, str):
+                raise TypeError("edital deve ser um texto")
+            if 'document_base64' not in request and not isinstance(request['file_path'], str):
+                raise TypeError("file_path deve ser um texto")
+        except (ValueError, KeyError, TypeError) as e:
+            self._send_json(400, {'erro': f"Pedido inválido: {e}"})
+            return
+        
+        temp_path = None
+        try:
+            if 'document_base64' in request:
+                suffix = os.path.splitext(request.get('filename', ''))[1] or '.png'
+                with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as f:
+                    f.write(base64.b64decode(request['document_base64']))
+                    temp_path = f.name
+                file_path = temp_path
+            else:
+                file_path = request['file_path']
+                if not os.path.exists(file_path):
+                    self._send_json(404, {'erro': f"Documento não encontrado: {file_path}"})
+                    return
+            
+            try:
+                future = self.service.submit(file_path, json_data, edital_name)
+            except ServiceBusy as e:
+                self._send_json(503, {'erro': str(e)}, headers={'Retry-After': '1'})
+                return
+            
+            try:
+                self._send_json(200, future.result())
+            except Exception as e:
+                self._send_json(500, {'erro': f"Falha no processamento: {e}"})
+        except (ValueError, KeyError, TypeError) as e:
+            self._send_json(400, {'erro': f"Pedido inválido: {e}"})
+        finally:
+            if temp_path is not None:
+                os.remove(temp_path)
+
+class UnixHTTPServer(ThreadingUnixStreamServer):
+    """Servidor HTTP em socket Unix (uma thread por conexão)"""
+    daemon_threads = True
+
+def run_service(service, host=SERVICE_HOST, port=SERVICE_PORT, socket_path=None):
+    """Atende pedidos HTTP em host:port ou no socket Unix até Ctrl+C"""
+    handler = type('BoundOCRRequestHandler', (OCRRequestHandler,), {'service': service})
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        server = UnixHTTPServer(socket_path, handler)
+        print(f"🛰️ Serviço de OCR ouvindo em unix:{socket_path}")
+    else:
+        server = ThreadingHTTPServer((host, port), handler)
+        print(f"🛰️ Serviço de OCR ouvindo em http://{host}:{port}")
+    
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n🛑 Encerrando o serviço")
+    finally:
+        server.server_close()
+        service.close()
+        if socket_path and os.path.exists(socket_path):
+            os.remove(socket_path)
+
+def print_console_summary(edital_stats, total_documentos):
+    """Exibe o relatório resumido no console"""
+    print(f"\n=== RELATÓRIO RESUMIDO POR EDITAL ===")
+    print(f"Total de editais: {len(edital_stats)}")
+    print(f"Total de documentos: {total_documentos}")
+    
+    for edital_name, stats in edital_stats.items():
+        display_name = "Arquivos Diretos" if edital_name == 'root' else edital_name
+        print(f"\n🏛️ {display_name}:")
+        print(f"  📄 Documentos: {stats['total_documents']}")
+        print(f"  ✅ Taxa de sucesso: {stats['success_rate']:.1f}%")
+        print(f"  🔍 Campos: {stats['fields_found']}/{stats['total_fields']}")
+        if stats.get('orientation', {}).get('pages_without_classifier'):
+            print(f"  🧭 Sem classificador de ângulo: {stats['orientation']['pages_without_classifier']} página(s), "
+                  f"~{stats['orientation']['saved_seconds']:.1f}s economizados")
+
+def print_sweep_table(thresholds, stats_by_threshold):
+    """Exibe a taxa de sucesso de cada edital (colunas) para cada threshold (linhas)"""
+    edital_names = list(stats_by_threshold[0]) if stats_by_threshold else []
+    display_names = ["Arquivos Diretos" if edital_name == 'root' else edital_name for edital_name in edital_names]
+    widths = [max(len(display_name), 7) for display_name in display_names]
+    
+    print("\n=== VARREDURA DE THRESHOLDS ===")
+    print("threshold  " + "  ".join(display_name.rjust(width) for display_name, width in zip(display_names, widths)))
+    for threshold, stats in zip(thresholds, stats_by_threshold):
+        rates = (f"{stats[edital_name]['success_rate']:.1f}%".rjust(width)
+                 for edital_name, width in zip(edital_names, widths))
+        print(f"{threshold:>9.3g}  " + "  ".join(rates))
+
+def print_slowest_documents(slowest):
+    """Exibe os documentos mais lentos da execução: [(segundos, caminho, desfecho do orçamento)]"""
+    if not slowest:
+        return
+    print("\n🐢 Documentos mais lentos:")
+    for seconds, file_path, status in slowest:
+        print(f"  {seconds:8.2f}s  {file_path}" + (f" (orçamento de tempo: {status})" if status else ""))
+
+def add_common_args(parser, input_dir=True, threshold=True):
+    """Argumentos compartilhados pelos subcomandos ocr e match"""
+    if input_dir:
+        parser.add_argument('--input-dir', default='input_docs',
+                            help="Diretório com os documentos (padrão: input_docs)")
+        parser.add_argument('--shard', type=parse_shard, metavar='i/N',
+                            help=f"Processa só a parte i de N (hash do edital e do caminho); resultados parciais em "
+                                 f"{OUTPUT_DIR}/{SHARD_DIR_FORMAT.format(index='i', total='N')}, juntados pelo subcomando merge")
+    if threshold:
+        parser.add_argument('--threshold', type=float, default=MATCH_THRESHOLD,
+                            help=f"Similaridade mínima para considerar um campo encontrado (padrão: {MATCH_THRESHOLD})")
+
+def add_output_args(parser):
+    """Formato dos resultados por documento (subcomandos que geram relatórios)"""
+    parser.add_argument('--output-format', choices=OUTPUT_FORMATS, default='json',
+                        help=f"json: um JSON por documento; colunar: um único arquivo compacto "
+                             f"({COLUMNAR_FILENAME}), convertido em JSON pelo subcomando convert (padrão: json)")
+
+def add_processing_args(parser):
+    """Argumentos de motor, cache e renderização compartilhados pelos subcomandos ocr e serve"""
+    parser.add_argument('--engine', choices=sorted(OCR_ENGINES), default=PaddleOCREngine.name,
+                        help=f"Motor de OCR; 'stub' é falso e determinístico, para benchmarks (padrão: {PaddleOCREngine.name})")
+    parser.add_argument('--stub-latency', type=float, default=0.0,
+                        help="Latência simulada (s) por entrada do motor stub (padrão: 0)")
+    parser.add_argument('--stub-replay-cache', metavar='DIR',
+                        help="Motor stub: devolve o texto que o PaddleOCR gravou neste cache, quando houver")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="Desativa o cache de OCR em disco")
+    parser.add_argument('--refresh-cache', action='store_true',
+                        help="Ignora o cache existente, refaz o OCR e regrava as entradas")
+    parser.add_argument('--cache-dir', default=CACHE_DIR,
+                        help=f"Diretório do cache de OCR (padrão: {CACHE_DIR})")
+    parser.add_argument('--cache-max-mb', type=int, default=CACHE_MAX_MB,
+                        help=f"Tamanho máximo do cache em MB (padrão: {CACHE_MAX_MB})")
+    parser.add_argument('--stream-pages', action='store_true',
+                        help="Processa PDFs página a página e para quando todos os campos forem encontrados")
+    parser.add_argument('--pdf-dpi', type=int, default=PDF_RENDER_DPI,
+                        help=f"Resolução da renderização de PDFs nos modos --stream-pages e --adaptive (padrão: {PDF_RENDER_DPI})")
+    parser.add_argument('--adaptive', action='store_true',
+                        help="OCR em duas passagens: resolução reduzida e original só para campos faltantes ou incertos")
+    parser.add_argument('--adaptive-downscale', type=float, default=ADAPTIVE_DOWNSCALE,
+                        help=f"Fator de redução da primeira passagem (padrão: {ADAPTIVE_DOWNSCALE})")
+    parser.add_argument('--adaptive-min-confidence', type=float, default=ADAPTIVE_MIN_CONFIDENCE,
+                        help=f"Confiança do OCR abaixo da qual o campo vai para a segunda passagem "
+                             f"(padrão: {ADAPTIVE_MIN_CONFIDENCE})")
+    parser.add_argument('--screen-pages', action='store_true',
+                        help="Pula o OCR de páginas em branco e reusa o texto de páginas idênticas (pixel a pixel) já lidas")
+
+def parse_args(argv=None):
+    """Lê os argumentos de linha de comando (sem subcomando, assume ocr)"""
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if not argv or argv[0] not in COMMANDS + ('-h', '--help'):
+        argv = ['ocr'] + argv
+    
+    parser = argparse.ArgumentParser(description="OCR de documentos com PaddleOCR e comparação com valores esperados")
+    subparsers = parser.add_subparsers(dest='command')
+    
+    ocr_parser = subparsers.add_parser('ocr', help="Executa o OCR, a busca dos campos e gera os relatórios (padrão)")
+    add_common_args(ocr_parser)
+    add_output_args(ocr_parser)
+    ocr_parser.add_argument('--workers', type=int, default=1,
+                            help="Número de processos de OCR em paralelo (padrão: 1, execução serial)")
+    ocr_parser.add_argument('--worker-max-documents', type=int, default=WORKER_MAX_DOCUMENTS,
+                            help="Recicla o processo de OCR a cada N documentos (ativa os workers supervisionados; "
+                                 "padrão: sem limite)")
+    ocr_parser.add_argument('--worker-max-rss-mb', type=int, default=WORKER_MAX_RSS_MB,
+                            help="Recicla o processo de OCR quando o RSS passar deste valor (MB) após um documento "
+                                 "(ativa os workers supervisionados; padrão: sem limite)")
+    ocr_parser.add_argument('--retry-render-scale', type=float, default=RETRY_RENDER_SCALE,
+                            help=f"Fator da resolução na nova tentativa de um documento que derrubou o worker "
+                                 f"(padrão: {RETRY_RENDER_SCALE})")
+    ocr_parser.add_argument('--document-timeout', type=float, default=DOCUMENT_TIMEOUT,
+                            help="Orçamento de tempo (s) do OCR de cada documento; quem estoura é refeito no caminho "
+                                 "degradado (ativa os workers supervisionados; padrão: sem limite)")
+    ocr_parser.add_argument('--page-timeout', type=float, default=PAGE_TIMEOUT,
+                            help="Orçamento de tempo (s) por página; com --document-timeout, vale o menor "
+                                 "(ativa os workers supervisionados; padrão: sem limite)")
+    ocr_parser.add_argument('--degraded-max-pages', type=int, default=DEGRADED_MAX_PAGES,
+                            help=f"Páginas reconhecidas no caminho degradado, em resolução × --retry-render-scale e "
+                                 f"sem classificador de ângulo (padrão: {DEGRADED_MAX_PAGES})")
+    ocr_parser.add_argument('--prefetch', type=int, default=PREFETCH_DEPTH,
+                            help=f"Documentos lidos e decodificados à frente do OCR em threads de E/S; 0 desativa "
+                                 f"(padrão: {PREFETCH_DEPTH})")
+    add_processing_args(ocr_parser)
+    ocr_parser.add_argument('--layout-templates', action='store_true',
+                            help=f"Aprende o layout de cada edital e reconhece só as regiões dos campos nas imagens "
+                                 f"seguintes (modelos em {OUTPUT_DIR}/{LAYOUTS_FILENAME})")
+    ocr_parser.add_argument('--orientation-policy', action='store_true',
+                            help=f"Amostra as primeiras páginas de cada edital com o classificador de ângulo e, se "
+                                 f"estiverem em pé, segue sem ele (decisões em {OUTPUT_DIR}/{ORIENTATION_FILENAME})")
+    ocr_parser.add_argument('--orientation-sample-pages', type=int, default=ORIENTATION_SAMPLE_PAGES,
+                            help=f"Páginas amostradas por edital com --orientation-policy "
+                                 f"(padrão: {ORIENTATION_SAMPLE_PAGES})")
+    ocr_parser.add_argument('--orientation-min-confidence', type=float, default=ORIENTATION_MIN_CONFIDENCE,
+                            help=f"Confiança média dos campos abaixo da qual o documento é refeito com o "
+                                 f"classificador e o edital volta a usá-lo (padrão: {ORIENTATION_MIN_CONFIDENCE})")
+    ocr_parser.add_argument('--no-resume', action='store_true',
+                            help=f"Ignora o manifesto ({MANIFEST_FILENAME}) e reprocessa todos os documentos")
+    ocr_parser.add_argument('--profile-document', metavar='ARQUIVO',
+                            help=f"Processa apenas este documento sob um profiler e grava o perfil em {OUTPUT_DIR}/")
+    ocr_parser.add_argument('--profiler', choices=('cprofile', 'pyinstrument'), default='cprofile',
+                            help="Profiler usado com --profile-document (padrão: cprofile)")
+    ocr_parser.add_argument('--batch-size', type=int, default=1,
+                            help=f"Imagens/páginas por chamada ao OCR; acima de 1 ativa os micro-batches (sugestão: {OCR_BATCH_SIZE})")
+    ocr_parser.add_argument('--batch-max-wait', type=float, default=OCR_BATCH_MAX_WAIT,
+                            help=f"Espera máxima (s) para completar um micro-batch (padrão: {OCR_BATCH_MAX_WAIT})")
+    
+    match_parser = subparsers.add_parser('match', help="Refaz a busca dos campos sobre o texto já extraído (sem OCR)")
+    add_common_args(match_parser)
+    add_output_args(match_parser)
+    
+    report_parser = subparsers.add_parser('report', help="Regera os relatórios a partir do manifesto (sem OCR nem busca)")
+    report_parser.add_argument('--pdf-only', action='store_true',
+                               help="Regera apenas o PDF a partir de resumo_por_edital.json")
+    report_parser.add_argument('--input-dir', default='input_docs',
+                               help="Diretório com os documentos, usado só para a ordem dos editais e documentos "
+                                    "(padrão: input_docs)")
+    add_output_args(report_parser)
+    
+    serve_parser = subparsers.add_parser('serve', help="Serviço HTTP local com o OCR carregado e fila de pedidos")
+    add_common_args(serve_parser, input_dir=False)
+    serve_parser.add_argument('--host', default=SERVICE_HOST,
+                              help=f"Endereço de escuta (padrão: {SERVICE_HOST})")
+    serve_parser.add_argument('--port', type=int, default=SERVICE_PORT,
+                              help=f"Porta de escuta (padrão: {SERVICE_PORT})")
+    serve_parser.add_argument('--socket', metavar='CAMINHO',
+                              help="Escuta em um socket Unix em vez de host:porta")
+    serve_parser.add_argument('--workers', type=int, default=1,
+                              help="Instâncias do OCR atendendo a fila em paralelo (padrão: 1)")
+    serve_parser.add_argument('--queue-size', type=int, default=SERVICE_QUEUE_SIZE,
+                              help=f"Pedidos aguardando na fila antes de responder 503 (padrão: {SERVICE_QUEUE_SIZE})")
+    add_processing_args(serve_parser)
+    
+    merge_parser = subparsers.add_parser('merge', help="Junta os resultados parciais das partes (--shard) nos relatórios")
+    merge_parser.add_argument('shard_dirs', nargs='*', metavar='PASTA',
+                              help=f"Pastas das partes (padrão: as pastas com {SHARD_INFO_FILENAME} em {OUTPUT_DIR})")
+    add_output_args(merge_parser)
+    
+    convert_parser = subparsers.add_parser('convert', help=f"Gera os JSONs individuais a partir de {COLUMNAR_FILENAME}")
+    convert_parser.add_argument('documents', nargs='*', metavar='DOCUMENTO',
+                                help="Caminhos ou nomes dos documentos a converter (padrão: todos)")
+    convert_parser.add_argument('--edital', action='append', default=[],
+                                help="Converte só os documentos deste edital (pode repetir)")
+    convert_parser.add_argument('--store', metavar='ARQUIVO',
+                                help=f"Arquivo colunar (padrão: {OUTPUT_DIR}/{COLUMNAR_FILENAME})")
+    
+    sweep_parser = subparsers.add_parser('sweep', help="Taxas de sucesso por edital de vários thresholds de uma vez "
+                                                       "sobre o texto já extraído (sem OCR)")
+    add_common_args(sweep_parser, threshold=False)
+    sweep_parser.add_argument('--thresholds', type=parse_thresholds, default=parse_thresholds(SWEEP_THRESHOLDS),
+                              help=f"Thresholds avaliados: lista separada por vírgulas e/ou intervalos "
+                                   f"início:fim:passo (padrão: {SWEEP_THRESHOLDS}); resultado em "
+                                   f"{OUTPUT_DIR}/{SWEEP_FILENAME}")
+    
+    return parser.parse_args(argv)
+
+def batch_options_from_args(args):
+    """Converte os argumentos de micro-batch em opções para process_documents_batched (None desativa)"""
+    if args.batch_size <= 1:
+        return None
+    return {
+        'batch_size': args.batch_size,
+        'max_wait': args.batch_max_wait
+    }
+
+def memory_options_from_args(args):
+    """Converte os argumentos da guarda de memória em opções para SupervisedPool (None desativa)"""
+    if not args.worker_max_documents and not args.worker_max_rss_mb:
+        return None
+    return {
+        'max_documents': args.worker_max_documents,
+        'max_rss_mb': args.worker_max_rss_mb,
+        'retry_scale': args.retry_render_scale
+    }
+
+def budget_options_from_args(args):
+    """Converte os argumentos do orçamento de tempo em opções para SupervisedPool (None desativa)"""
+    if not args.document_timeout and not args.page_timeout:
+        return None
+    return {
+        'document_timeout': args.document_timeout,
+        'page_timeout': args.page_timeout,
+        'degraded_max_pages': args.degraded_max_pages,
+        'retry_scale': args.retry_render_scale
+    }
+
+def document_options_from_args(args):
+    """Converte os argumentos de processamento em opções para process_document"""
+    return {
+        'stream_pages': args.stream_pages,
+        'pdf_dpi': args.pdf_dpi,
+        'threshold': args.threshold,
+        'adaptive': args.adaptive,
+        'downscale': args.adaptive_downscale,
+        'min_confidence': args.adaptive_min_confidence,
+        'screener': PageScreener() if args.screen_pages else None
+    }
+
+def text_config_from_args(args):
+    """Configuração que influencia o texto extraído: motor e opções de processamento (registrada no manifesto)"""
+    config = {
+        'engine': engine_config(engine_options_from_args(args)),
+        'stream_pages': args.stream_pages,
+        'pdf_dpi': args.pdf_dpi,
+        'adaptive': args.adaptive,
+        'layout_templates': args.layout_templates,
+        'screen_pages': args.screen_pages,
+        'orientation_policy': args.orientation_policy
+    }
+    if args.adaptive:
+        config.update(downscale=args.adaptive_downscale, min_confidence=args.adaptive_min_confidence)
+    if args.orientation_policy:
+        config.update(orientation_sample_pages=args.orientation_sample_pages,
+                      orientation_min_confidence=args.orientation_min_confidence)
+    return config
+
+def engine_options_from_args(args):
+    """Converte os argumentos do motor em opções para create_ocr"""
+    if args.engine == StubEngine.name:
+        return {'engine': StubEngine.name, 'latency': args.stub_latency, 'replay_cache_dir': args.stub_replay_cache}
+    return {'engine': args.engine}
+
+def cache_options_from_args(args):
+    """Converte os argumentos de cache em opções para OCRCache"""
+    if args.no_cache:
+        return None
+    return {
+        'cache_dir': args.cache_dir,
+        'max_bytes': args.cache_max_mb * 1024 * 1024,
+        'refresh': args.refresh_cache
+    }
+
+def write_summary_reports(edital_stats, total_documentos, output_dir):
+    """Grava resumo_por_edital.json e o relatório PDF; retorna o caminho do resumo"""
+    edital_consolidado_path = os.path.join(output_dir, 'resumo_por_edital.json')
+    edital_consolidado = build_edital_summary(edital_stats, total_documentos)
+    
+    with open(edital_consolidado_path, 'w', encoding='utf-8') as json_file:
+        json.dump(edital_consolidado, json_file, ensure_ascii=False, indent=2)
+    
+    print(f"📊 Resumo por edital salvo: {edital_consolidado_path}")
+    
+    write_pdf_report(edital_consolidado, edital_consolidado_path)
+    return edital_consolidado_path
+
+def report_txt_path(output_dir):
+    """TXT detalhado: na pasta atual para a saída completa, dentro da pasta da parte com --shard"""
+    return TXT_REPORT_PATH if output_dir == OUTPUT_DIR else os.path.join(output_dir, TXT_REPORT_PATH)
+
+def print_final_messages(edital_stats, total_documentos, edital_consolidado_path, txt_path=TXT_REPORT_PATH):
+    """Exibe o resumo no console e onde ficaram os relatórios"""
+    print_console_summary(edital_stats, total_documentos)
+    
+    print(f"\n📊 Relatório detalhado salvo em: {txt_path}")
+    print(f"📊 Resumo por edital salvo em: {edital_consolidado_path}")
+    print(f"🔍 Processamento concluído com sucesso!")
+
+def run_ocr(args, output_dir):
+    """Subcomando ocr: OCR dos documentos novos ou alterados, busca dos campos e relatórios"""
+    if args.profile_document:
+        profile_document(args.profile_document, output_dir, args.profiler, document_options_from_args(args),
+                         engine_options_from_args(args))
+        return
+    
+    metrics = RunMetrics()
+    
+    # Manifesto dos documentos concluídos: permite retomar e processar só o que mudou
+    manifest = ProcessingManifest(os.path.join(output_dir, MANIFEST_FILENAME), reset=args.no_resume)
+    
+    # Descobre os documentos e executa o OCR só nos novos ou alterados
+    with timed(metrics.run_timings, 'descoberta'):
+        edital_names, tasks = discover_documents(args.input_dir)
+        if args.shard:
+            tasks = select_shard(tasks, edital_names, args.shard, args.input_dir, output_dir)
+        text_config = text_config_from_args(args)
+        reused, pending = split_by_manifest(tasks, manifest, args.threshold, text_config)
+    if reused:
+        print(f"⏭️ {len(reused)} documento(s) inalterado(s) reaproveitado(s) do manifesto")
+    
+    # Modelos de layout por edital, aprendidos com os documentos processados por completo
+    document_options = document_options_from_args(args)
+    layouts = None
+    if args.layout_templates:
+        layouts = LayoutTemplates(os.path.join(output_dir, LAYOUTS_FILENAME))
+        document_options['layouts'] = layouts
+    
+    # Política de orientação por edital: dispensa o classificador de ângulo nos editais em pé
+    orientation = None
+    if args.orientation_policy:
+        orientation = OrientationPolicy(os.path.join(output_dir, ORIENTATION_FILENAME), engine_options_from_args(args),
+                                        sample_pages=args.orientation_sample_pages,
+                                        min_confidence=args.orientation_min_confidence)
+        document_options['orientation'] = orientation
+    
+    new_results = iter_documents([task for _, task in pending], workers=args.workers,
+                                 cache_options=cache_options_from_args(args),
+                                 document_options=document_options,
+                                 batch_options=batch_options_from_args(args),
+                                 engine_options=engine_options_from_args(args),
+                                 prefetch=args.prefetch,
+                                 memory_options=memory_options_from_args(args),
+                                 budget_options=budget_options_from_args(args))
+    
+    # Cada documento é gravado (manifesto, TXT, JSON individual) assim que fica pronto,
+    # na ordem de descoberta; só os contadores por edital permanecem em memória
+    txt_path = report_txt_path(output_dir)
+    writer = StreamingReportWriter(txt_path, output_dir, edital_names, args.output_format)
+    try:
+        for index, (file_path, _, _) in enumerate(tasks):
+            if index in reused:
+                # Documento reaproveitado: só conta o tempo de leitura do manifesto
+                timings = {}
+                with timed(timings, 'leitura_manifesto'):
+                    result = manifest.load_result(file_path)
+                result['timings'] = timings
+                # Páginas dispensadas e memória medidas numa execução anterior não contam nesta
+                result.pop('page_screening', None)
+                result.pop('memory', None)
+                result.pop('orientation', None)
+            else:
+                result = next(new_results)
+            
+            with timed(result.setdefault('timings', {}), 'escrita'):
+                # Documentos com falha, do caminho degradado ou refeitos em resolução reduzida ficam fora
+                # do manifesto: a próxima execução tenta de novo com a qualidade completa
+                if index not in reused and not any(key in result for key in ('error', 'time_budget', 'render_scale')):
+                    manifest.record(result, text_config)
+                writer.add(result)
+            metrics.add(result)
+            
+            # Com workers, cada processo aprende sozinho; aqui o modelo salvo reúne todos
+            if layouts is not None and 'error' not in result:
+                layouts.learn(result)
+            if orientation is not None and 'error' not in result:
+                orientation.learn(result)
+    finally:
+        new_results.close()
+        if layouts is not None:
+            layouts.save()
+        if orientation is not None:
+            orientation.save()
+    
+    with timed(metrics.run_timings, 'relatorios'):
+        edital_stats = writer.close()
+        manifest.compact()
+        edital_consolidado_path = write_summary_reports(edital_stats, writer.total_documents, output_dir)
+    
+    metrics_json_path, metrics_prom_path = metrics.write(output_dir)
+    print(f"⏱️ Métricas de desempenho salvas: {metrics_json_path}, {metrics_prom_path}")
+    if args.screen_pages:
+        print(f"📄 Triagem de páginas: {metrics.skipped_pages['em_branco']} em branco e "
+              f"{metrics.skipped_pages['duplicada']} repetida(s) dispensadas do OCR")
+    if args.document_timeout or args.page_timeout:
+        print(f"⏱️ Orçamento de tempo: {metrics.time_budget['degradado']} documento(s) no caminho degradado, "
+              f"{metrics.time_budget['esgotado']} sem texto")
+    print_slowest_documents(metrics.slowest())
+    
+    print_final_messages(edital_stats, writer.total_documents, edital_consolidado_path, txt_path)
+
+def run_match(args, output_dir):
+    """Subcomando match: refaz a busca com os JSONs e o threshold atuais sobre o texto do manifesto"""
+    metrics = RunMetrics()
+    manifest = ProcessingManifest(os.path.join(output_dir, MANIFEST_FILENAME))
+    
+    with timed(metrics.run_timings, 'descoberta'):
+        edital_names, tasks = discover_documents(args.input_dir)
+        if args.shard:
+            tasks = select_shard(tasks, edital_names, args.shard, args.input_dir, output_dir)
+    
+    txt_path = report_txt_path(output_dir)
+    writer = StreamingReportWriter(txt_path, output_dir, edital_names, args.output_format)
+    missing = 0
+    for file_path, json_data, edital_name in tasks:
+        if not manifest.has_text(file_path, edital_name):
+            # Documento novo ou alterado: o texto só existe depois do subcomando ocr
+            missing += 1
+            print(f"⚠️ Sem texto extraído válido no manifesto, ignorado: {file_path}")
+            continue
+        
+        print(f"\n=== Buscando campos: {file_path} (Edital: {edital_name}) ===")
+        timings = {}
+        with timed(timings, 'leitura_manifesto'):
+            saved = manifest.load_result(file_path)
+        result = make_document_result(file_path, json_data, edital_name, saved['extracted_texts'], timings,
+                                      args.threshold)
+        # O texto continua o mesmo: páginas processadas (streaming), caminho degradado, nova tentativa em
+        # resolução reduzida, modelo de layout e resolução adaptativa seguem registrados no resultado
+        for key in ('pages_processed', 'total_pages', 'time_budget', 'render_scale', 'layout', 'adaptive'):
+            if key in saved:
+                result[key] = saved[key]
+        
+        with timed(timings, 'escrita'):
+            # O texto continua o do OCR registrado: a configuração dele é mantida
+            manifest.record(result, manifest.entries[file_path]['config'])
+            writer.add(result)
+        metrics.add(result)
+    
+    with timed(metrics.run_timings, 'relatorios'):
+        edital_stats = writer.close()
+        manifest.compact()
+        edital_consolidado_path = write_summary_reports(edital_stats, writer.total_documents, output_dir)
+    metrics.write(output_dir)
+    
+    if missing:
+        print(f"💡 {missing} documento(s) sem texto extraído; execute o subcomando ocr para processá-los")
+    print_final_messages(edital_stats, writer.total_documents, edital_consolidado_path, txt_path)
+
+def run_sweep(args, output_dir):
+    """Subcomando sweep: taxas por edital de vários thresholds sobre o texto do manifesto, sem OCR"""
+    manifest = ProcessingManifest(os.path.join(output_dir, MANIFEST_FILENAME))
+    edital_names, tasks = discover_documents(args.input_dir)
+    if args.shard:
+        tasks = select_shard(tasks, edital_names, args.shard, args.input_dir, output_dir)
+    
+    # Os scores de cada campo são calculados uma vez por documento, para todos os thresholds
+    start = time.perf_counter()
+    sweep = ThresholdSweep(edital_names)
+    missing = 0
+    for file_path, json_data, edital_name in tasks:
+        if not manifest.has_text(file_path, edital_name):
+            missing += 1
+            print(f"⚠️ Sem texto extraído válido no manifesto, ignorado: {file_path}")
+            continue
+        sweep.add(edital_name, manifest.load_result(file_path)['extracted_texts'], json_data)
+    scoring_time = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    stats_by_threshold = sweep.evaluate(args.thresholds)
+    sweep_time = time.perf_counter() - start
+    
+    total_documentos = sum(sweep.documents)
+    print_sweep_table(args.thresholds, stats_by_threshold)
+    print(f"\n⏱️ Scores de {total_documentos} documento(s) em {scoring_time:.2f}s; "
+          f"{len(args.thresholds)} threshold(s) avaliado(s) em {sweep_time:.3f}s")
+    
+    sweep_path = os.path.join(output_dir, SWEEP_FILENAME)
+    with open(sweep_path, 'w', encoding='utf-8') as json_file:
+        json.dump(build_sweep_summary(args.thresholds, stats_by_threshold, total_documentos), json_file,
+                  ensure_ascii=False, indent=2)
+    print(f"📊 Varredura salva em: {sweep_path}")
+    if missing:
+        print(f"💡 {missing} documento(s) sem texto extraído; execute o subcomando ocr para processá-los")
+
+def run_report(args, output_dir):
+    """Subcomando report: regera TXT, JSONs, resumo e PDF só com os resultados do manifesto"""
+    if args.pdf_only:
+        edital_consolidado_path = os.path.join(output_dir, 'resumo_por_edital.json')
+        with open(edital_consolidado_path, 'r', encoding='utf-8') as f:
+            edital_consolidado = json.load(f)
+        write_pdf_report(edital_consolidado, edital_consolidado_path)
+        return
+    
+    manifest = ProcessingManifest(os.path.join(output_dir, MANIFEST_FILENAME))
+    if not manifest.entries:
+        print(f"❌ Manifesto vazio ou inexistente: {manifest.path}. Execute o subcomando ocr primeiro")
+        return
+    
+    # Editais e documentos na ordem de descoberta, como no subcomando ocr (o manifesto fica na ordem de
+    # conclusão); os que não estão mais em input_dir vêm depois, na ordem do manifesto
+    edital_names, tasks = [], []
+    if os.path.isdir(args.input_dir):
+        edital_names, tasks = discover_documents(args.input_dir)
+    else:
+        print(f"⚠️ {args.input_dir} não encontrado: editais e documentos na ordem do manifesto")
+    positions = {file_path: i for i, (file_path, _, _) in enumerate(tasks)}
+    file_paths_by_edital = {edital_name: [] for edital_name in edital_names}
+    for file_path, entry in manifest.entries.items():
+        file_paths_by_edital.setdefault(entry['edital'], []).append(file_path)
+    for file_paths in file_paths_by_edital.values():
+        file_paths.sort(key=lambda file_path: positions.get(file_path, len(positions)))
+    
+    writer = StreamingReportWriter(TXT_REPORT_PATH, output_dir, file_paths_by_edital, args.output_format)
+    for file_paths in file_paths_by_edital.values():
+        for file_path in file_paths:
+            writer.add(manifest.load_result(file_path))
+    
+    edital_stats = writer.close()
+    edital_consolidado_path = write_summary_reports(edital_stats, writer.total_documents, output_dir)
+    print_final_messages(edital_stats, writer.total_documents, edital_consolidado_path)
+
+def run_merge(args, output_dir):
+    """Subcomando merge: junta os resultados parciais das partes (--shard) nos relatórios completos"""
+    shard_dirs = args.shard_dirs or find_shard_dirs(output_dir)
+    try:
+        edital_names, documents, missing = merge_shards(shard_dirs)
+    except ValueError as e:
+        print(f"❌ {e}. Copie as pastas {SHARD_DIR_FORMAT.format(index='i', total='N')} de todas as partes "
+              f"para {output_dir} ou informe-as no comando")
+        return
+    
+    print(f"🧩 Juntando {len(shard_dirs)} parte(s): {len(documents)} documento(s)")
+    if missing:
+        print(f"⚠️ {len(missing)} documento(s) sem resultado no manifesto da sua parte (execução interrompida?)")
+    
+    # Mesma ordem e mesmos contadores de uma execução em uma única máquina
+    writer = StreamingReportWriter(TXT_REPORT_PATH, output_dir, edital_names, args.output_format)
+    for manifest, file_path in documents:
+        writer.add(manifest.load_result(file_path))
+    
+    edital_stats = writer.close()
+    edital_consolidado_path = write_summary_reports(edital_stats, writer.total_documents, output_dir)
+    print_final_messages(edital_stats, writer.total_documents, edital_consolidado_path)
+
+def run_convert(args, output_dir):
+    """Subcomando convert: gera os JSONs individuais a partir do arquivo colunar"""
+    store_path = args.store or os.path.join(output_dir, COLUMNAR_FILENAME)
+    if not os.path.exists(store_path):
+        print(f"❌ Arquivo colunar inexistente: {store_path}. Execute o subcomando ocr com --output-format colunar")
+        return
+    
+    wanted = set(args.documents)
+    converted = 0
+    with ColumnarStore(store_path) as store:
+        for index in range(len(store)):
+            # Filtra pelo edital e pelo caminho antes de reconstruir as linhas
+            if args.edital and store.edital(index) not in args.edital:
+                continue
+            file_path = store.meta(index)['file_path']
+            if wanted and file_path not in wanted and os.path.basename(file_path) not in wanted:
+                continue
+            result, processed_at = store.result(index)
+            write_document_json(result, output_dir, processed_at)
+            converted += 1
+    
+    print(f"🔄 {converted} de {len(store)} documento(s) convertido(s) para JSON em {output_dir}")
+
+def run_serve(args, output_dir):
+    """Subcomando serve: mantém o OCR carregado e atende documentos por HTTP"""
+    service = OCRService(workers=args.workers, queue_size=args.queue_size, engine_options=engine_options_from_args(args),
+                         cache_options=cache_options_from_args(args),
+                         document_options=document_options_from_args(args))
+    run_service(service, args.host, args.port, args.socket)
+
+def main(argv=None):
+    args = parse_args(argv)
+    
+    # Com --shard, cada parte grava seus resultados parciais em uma pasta própria
+    output_dir = shard_output_dir(args.shard) if getattr(args, 'shard', None) else OUTPUT_DIR
+    os.makedirs(output_dir, exist_ok=True)
+    
+    handlers = {'ocr': run_ocr, 'match': run_match, 'report': run_report, 'serve': run_serve, 'merge': run_merge,
+                'convert': run_convert, 'sweep': run_sweep}
+    handlers[args.command](args, output_dir)
+
+if __name__ == '__main__':
+    main()
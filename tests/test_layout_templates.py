@@ -0,0 +1,36 @@
+import copy
+
+import teste_ocr
+
+
+def full_result(file_path, box):
+    return {
+        'file_path': file_path,
+        'edital': 'edital_001',
+        'image_size': [1000, 2000],
+        'matches': {'cnpj': {'found': True, 'box': box}},
+    }
+
+
+def test_learn_stops_after_learn_documents(tmp_path):
+    layouts = teste_ocr.LayoutTemplates(str(tmp_path / 'layouts.json'), learn_documents=3)
+    for i in range(3):
+        layouts.learn(full_result(f"doc_{i}.png", [100 + i, 200, 400, 240]))
+    learned = copy.deepcopy(layouts.templates)
+    
+    # Documentos refeitos por completo depois do aprendizado (campo fora das regiões)
+    for i in range(3, 8):
+        layouts.learn(full_result(f"doc_{i}.png", [10, 1500, 900, 1600]))
+    
+    assert layouts.templates == learned
+    assert len(layouts.templates['edital_001']['documents']) == 3
+    assert layouts.regions('edital_001', {'cnpj': '12.345.678/0001-90'}, (1000, 2000)) is not None
+
+
+def test_learn_ignores_repeated_document(tmp_path):
+    layouts = teste_ocr.LayoutTemplates(learn_documents=3)
+    layouts.learn(full_result('doc_0.png', [100, 200, 400, 240]))
+    layouts.learn(full_result('doc_0.png', [10, 1500, 900, 1600]))
+    
+    assert layouts.templates['edital_001']['documents'] == ['doc_0.png']
+    assert layouts.templates['edital_001']['fields']['cnpj'] == [0.1, 0.1, 0.4, 0.12]
@@ -0,0 +1,50 @@
+import teste_ocr
+
+
+def lines(*texts):
+    return [{'text': text, 'confidence': 0.95} for text in texts]
+
+
+def test_number_matches_without_leading_zeros():
+    matches = teste_ocr.find_matches_in_text(lines('Nota Fiscal', 'NF 123456'), {'numero_nota': '000123456'})
+    
+    assert matches['numero_nota']['found']
+    assert matches['numero_nota']['matcher'] == 'numero'
+    assert matches['numero_nota']['extracted'] == 'NF 123456'
+
+
+def test_short_number_does_not_match_unrelated_digits():
+    texts = lines('Página 12 de 30', 'CEP 01310 012', 'Rua das Flores, 12')
+    
+    matches = teste_ocr.find_matches_in_text(texts, {'numero_nota': '0012'})
+    
+    assert not matches['numero_nota']['found']
+
+
+def test_second_pass_does_not_duplicate_lines(tmp_path):
+    json_data = {'cnpj': '12.345.678/0001-90', 'razao_social': 'Empresa Exemplo LTDA'}
+    document = tmp_path / 'doc.png'
+    document.write_bytes(b'imagem')
+    # O motor stub escreve no texto os valores do JSON ao lado do documento
+    (tmp_path / 'doc.json').write_text(teste_ocr.json.dumps(json_data), encoding='utf-8')
+    ocr = teste_ocr.StubEngine(num_lines=10)
+    
+    # Confiança mínima inalcançável: todos os campos vão para a segunda passagem
+    extracted_texts, matches, summary = teste_ocr.ocr_adaptive(str(document), json_data, ocr, min_confidence=1.01)
+    
+    assert summary['second_pass'] is not None
+    assert any(text_info.get('pass') == 2 for text_info in extracted_texts)
+    lines = [(text_info['text'], tuple(text_info['box'])) for text_info in extracted_texts]
+    assert len(lines) == len(set(lines))
+    assert all(match['found'] for match in matches.values())
+
+
+def test_second_pass_keeps_the_better_matching_text():
+    matches = {'razao_social': {'found': True, 'similarity': 1.0, 'ocr_confidence': 0.80,
+                                'extracted': 'Empresa Exemplo LTDA'}}
+    second = {'razao_social': {'found': True, 'similarity': 0.75, 'ocr_confidence': 0.99,
+                               'extracted': 'Empresa Exemplar SA'}}
+    
+    teste_ocr.merge_second_pass(matches, second)
+    
+    assert matches['razao_social']['extracted'] == 'Empresa Exemplo LTDA'
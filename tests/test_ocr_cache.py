@@ -0,0 +1,23 @@
+import teste_ocr
+
+
+def test_page_key_depends_on_dpi_and_differs_from_document_key(tmp_path):
+    pdf_path = tmp_path / 'documento.pdf'
+    pdf_path.write_bytes(b'%PDF-1.4 conteudo')
+    cache = teste_ocr.OCRCache(str(tmp_path / 'cache'), config={'engine': 'stub'})
+    
+    keys = {
+        cache.document_key(str(pdf_path)),
+        cache.make_key(str(pdf_path), page=1, dpi=72),
+        cache.make_key(str(pdf_path), page=1, dpi=200),
+    }
+    assert len(keys) == 3
+
+
+def test_put_keeps_page_numbers(tmp_path):
+    cache = teste_ocr.OCRCache(str(tmp_path / 'cache'), config={'engine': 'stub'})
+    texts = [{'text': 'CNPJ 12.345.678/0001-90', 'confidence': 0.9, 'box': [0, 0, 10, 10], 'page': 2}]
+    
+    cache.put('ab' * 32, texts)
+    
+    assert cache.get('ab' * 32) == texts
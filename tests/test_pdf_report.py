@@ -0,0 +1,51 @@
+import threading
+
+import pytest
+
+import teste_ocr
+
+pytest.importorskip('reportlab')
+pytest.importorskip('pypdfium2')
+
+
+def edital_summary(num_editais):
+    stats = {
+        f"edital_{i:02d}": {'total_documents': 2, 'total_fields': 4, 'fields_found': 3, 'success_rate': 75.0}
+        for i in range(num_editais)
+    }
+    return teste_ocr.build_edital_summary(stats, 2 * num_editais)
+
+
+def test_parallel_report_renders_all_parts(tmp_path):
+    output_path = str(tmp_path / 'relatorio.pdf')
+    
+    assert teste_ocr.generate_pdf_report(edital_summary(5), output_path, workers=2, chunk_editais=2) == output_path
+    
+    import pypdfium2 as pdfium
+    pdf = pdfium.PdfDocument(output_path)
+    # Resumo, um edital por página e conclusões
+    assert len(pdf) >= 7
+    pdf.close()
+
+
+def test_parallel_report_raises_when_a_part_fails(tmp_path):
+    summary = edital_summary(6)
+    # Marcação inválida: o reportlab rejeita o parágrafo com o nome do edital
+    summary['estatisticas_por_edital']['edital_03']['nome_edital'] = 'Edital <b>quebrado'
+    
+    # Numa thread à parte: se o relatório travar, o teste falha em vez de esperar para sempre
+    outcome = {}
+    
+    def render():
+        try:
+            teste_ocr.generate_pdf_report(summary, str(tmp_path / 'relatorio.pdf'), workers=2, chunk_editais=1)
+        except Exception as e:
+            outcome['error'] = e
+    
+    thread = threading.Thread(target=render, daemon=True)
+    thread.start()
+    thread.join(timeout=60)
+    
+    assert not thread.is_alive(), "o relatório PDF paralelo travou quando uma parte falhou"
+    assert isinstance(outcome.get('error'), ValueError)
+    assert 'quebrado' in str(outcome['error'])
@@ -0,0 +1,56 @@
+import http.client
+import json
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+import teste_ocr
+
+
+@pytest.fixture
+def service_url():
+    service = teste_ocr.OCRService(workers=1, engine_options={'engine': teste_ocr.StubEngine.name})
+    handler = type('BoundOCRRequestHandler', (teste_ocr.OCRRequestHandler,), {'service': service})
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server.server_address
+    server.shutdown()
+    server.server_close()
+    service.close()
+
+
+def post_process(address, body):
+    connection = http.client.HTTPConnection(*address, timeout=30)
+    connection.request('POST', '/process', body=json.dumps(body))
+    response = connection.getresponse()
+    payload = json.loads(response.read())
+    connection.close()
+    return response.status, payload
+
+
+@pytest.mark.parametrize('body, message', [
+    ({'file_path': 'doc.png', 'json_data': [1]}, 'json_data'),
+    ({'file_path': 'doc.png', 'json_data': 'cnpj'}, 'json_data'),
+    ({'file_path': 5, 'json_data': {'cnpj': '1'}}, 'file_path'),
+    ({'file_path': 'doc.png', 'json_data': {'cnpj': '1'}, 'edital': 3}, 'edital'),
+])
+def test_malformed_request_is_rejected(service_url, body, message):
+    status, payload = post_process(service_url, body)
+    
+    assert status == 400
+    assert message in payload['erro']
+
+
+def test_valid_request_is_processed(service_url, tmp_path):
+    json_data = {'cnpj': '12.345.678/0001-90'}
+    document = tmp_path / 'doc.png'
+    document.write_bytes(b'imagem')
+    # O motor stub escreve no texto os valores do JSON ao lado do documento
+    (tmp_path / 'doc.json').write_text(json.dumps(json_data), encoding='utf-8')
+    
+    status, payload = post_process(service_url, {'file_path': str(document), 'json_data': json_data})
+    
+    assert status == 200
+    assert payload['matches']['cnpj']['found']